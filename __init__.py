@@ -1,38 +1,142 @@
+from collections.abc import Mapping
 from datetime import timedelta
 import logging
+from typing import Any
+
+import voluptuous as vol
 
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.helpers.storage import Store
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.exceptions import ConfigEntryError
 
-from .http import ChirpstackHttpView
+from .http import (
+    ChirpstackBatchView,
+    ChirpstackHttpView,
+    async_get_router,
+    make_value_converter,
+)
+from .ingest import IngestPlanCache
+from .coalescer import StateWriteCoalescer
+from .filters import ChangeFilter
+from .ingest_queue import IngestQueue
+from .persistence import DeviceStore, async_remove_legacy_store
+from .availability import AvailabilityTracker
+from .dedup import UplinkDeduplicator
+from .decoders import PayloadDecoders
+from .downsampler import RATE_LIMITS_SCHEMA, Downsampler, parse_rate_limits
+from .limits import EntityLimits, IdleDeviceEvictor
+from .registrar import EntityRegistrar
+from .link_quality import LinkQualityTracker
+from .metrics import PipelineMetrics
+from .schema import SchemaTable, merge_schemas
+from .series import SeriesImporter
 from .const import (
     DOMAIN,
     SENSORS_KEY,
     BINARY_SENSORS_KEY,
     DEVICES_KEY,
+    DEVICE_METADATA_KEY,
+    INGEST_PLANS_KEY,
+    COALESCER_KEY,
+    CHANGE_FILTER_KEY,
+    INGEST_QUEUE_KEY,
+    DEDUP_KEY,
+    DOWNSAMPLER_KEY,
+    LINK_QUALITY_KEY,
+    LEGACY_STORE_REMOVED_KEY,
+    METRICS_KEY,
+    ROUTER_KEY,
+    SCHEMA_TABLE_KEY,
+    SERIES_IMPORTER_KEY,
+    AVAILABILITY_KEY,
+    LIMITS_KEY,
+    REGISTRAR_KEY,
+    IDLE_EVICTOR_KEY,
+    YAML_SCHEMAS_KEY,
+    YAML_DECODERS_KEY,
+    YAML_RATE_LIMITS_KEY,
+    PAYLOAD_DECODERS_KEY,
     PENDING_SENSORS_KEY,
     PENDING_BINARY_SENSORS_KEY,
     STORE_KEY,
-    STORAGE_KEY,
     API_URL_SUFFIX_KEY,
     API_HEADER_NAME_KEY,
     API_HEADER_VALUE_KEY,
+    PAYLOAD_ENCODING_KEY,
+    MAX_BODY_SIZE_KEY,
+    MAX_BODY_SIZE_DEFAULT,
+    PAYLOAD_ENCODING_AUTO,
+    STATE_WRITE_WINDOW_KEY,
+    STATE_WRITE_WINDOW_DEFAULT,
+    REGISTRATION_WINDOW_KEY,
+    REGISTRATION_WINDOW_DEFAULT,
+    DEADBANDS_KEY,
+    DEADBANDS_DEFAULT,
+    HEARTBEAT_INTERVAL_KEY,
+    HEARTBEAT_INTERVAL_DEFAULT,
+    QUEUE_ENABLED_KEY,
+    QUEUE_SIZE_KEY,
+    QUEUE_SIZE_DEFAULT,
+    QUEUE_OVERFLOW_KEY,
+    QUEUE_OVERFLOW_REJECT,
+    DEDUP_ENABLED_KEY,
+    DEDUP_WINDOW_KEY,
+    DEDUP_WINDOW_DEFAULT,
+    DEDUP_MAX_DEVICES_KEY,
+    DEDUP_MAX_DEVICES_DEFAULT,
+    DEDUP_USE_DEDUPLICATION_ID_KEY,
+    LINK_QUALITY_ENABLED_KEY,
+    LINK_QUALITY_WINDOW_KEY,
+    LINK_QUALITY_WINDOW_DEFAULT,
+    RATE_LIMITS_KEY,
+    SCHEMAS_KEY,
+    DECODERS_KEY,
+    AVAILABILITY_FACTOR_KEY,
+    AVAILABILITY_FACTOR_DEFAULT,
+    AVAILABILITY_MIN_TIMEOUT_KEY,
+    AVAILABILITY_MIN_TIMEOUT_DEFAULT,
+    MAX_DEVICES_KEY,
+    MAX_DEVICES_DEFAULT,
+    MAX_KEYS_PER_DEVICE_KEY,
+    MAX_KEYS_PER_DEVICE_DEFAULT,
+    MAX_FLATTEN_DEPTH_KEY,
+    MAX_FLATTEN_DEPTH_DEFAULT,
+    DEVICE_IDLE_TTL_KEY,
+    DEVICE_IDLE_TTL_DEFAULT,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = [Platform.SENSOR, Platform.BINARY_SENSOR]
-STORAGE_VERSION = 1
-SAVE_INTERVAL = timedelta(minutes=15)  # How often to save state
+
+# Device profile schemas, decoders and rate limits can also be provided in
+# configuration.yaml
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.Schema(
+            {
+                vol.Optional(SCHEMAS_KEY, default={}): {str: dict},
+                vol.Optional(DECODERS_KEY, default={}): {str: vol.Any(str, dict)},
+                vol.Optional(RATE_LIMITS_KEY, default={}): RATE_LIMITS_SCHEMA,
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
 
 # https://developers.home-assistant.io/docs/config_entries_index/
 
 
 async def async_setup(hass, config):
     """Set up the ChirpStack HTTP component."""
+    hass.data.setdefault(DOMAIN, {})[YAML_SCHEMAS_KEY] = config.get(DOMAIN, {}).get(
+        SCHEMAS_KEY, {}
+    )
+    hass.data[DOMAIN][YAML_DECODERS_KEY] = config.get(DOMAIN, {}).get(DECODERS_KEY, {})
+    hass.data[DOMAIN][YAML_RATE_LIMITS_KEY] = config.get(DOMAIN, {}).get(
+        RATE_LIMITS_KEY, {}
+    )
     return True
 
 
@@ -40,46 +144,260 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry):
     entry_id = config_entry.entry_id
     hass.data.setdefault(DOMAIN, {})
 
-    # Set up storage for device states
-    store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
-    stored_states = await store.async_load() or {}
+    # Earlier versions kept all entries in one store, drop it once
+    if not hass.data[DOMAIN].get(LEGACY_STORE_REMOVED_KEY):
+        hass.data[DOMAIN][LEGACY_STORE_REMOVED_KEY] = True
+        await async_remove_legacy_store(hass)
+
+    # Build the pipeline and load the stored device metadata and last values
+    hass_data = build_entry_data(hass, entry_id, config_entry.options)
+    await hass_data[STORE_KEY].async_load()
+    hass.data[DOMAIN][entry_id] = hass_data
+
+    # Start the timers of the availability tracker and the idle evictor
+    for key in (AVAILABILITY_KEY, IDLE_EVICTOR_KEY):
+        if hass_data.get(key) is not None:
+            config_entry.async_on_unload(hass_data[key].async_start())
+
+    # Route the URL suffix of the entry to its views
+    url_suffix = config_entry.data[API_URL_SUFFIX_KEY]
+    view, batch_view = build_views(
+        hass, entry_id, config_entry.data, config_entry.options
+    )
+    try:
+        async_get_router(hass).register(url_suffix, view, batch_view)
+    except ValueError as e:
+        hass.data[DOMAIN].pop(entry_id)
+        raise ConfigEntryError(str(e)) from e
+
+    # Optionally acknowledge events right away and process them in the worker
+    ingest_queue = build_ingest_queue(view, config_entry.options)
+    if ingest_queue is not None:
+        hass_data[INGEST_QUEUE_KEY] = ingest_queue
+        # A single worker keeps the events of a device in order
+        config_entry.async_create_background_task(
+            hass, ingest_queue.run_worker(), f"{DOMAIN} ingest worker"
+        )
+
+    # Set up platforms - this trigger async_setup_entry in the sensors
+    # https://developers.home-assistant.io/docs/creating_component_generic_discovery
+    await hass.config_entries.async_forward_entry_setups(config_entry, PLATFORMS)
+
+    # Restored devices that stay silent become unavailable as well
+    availability = hass_data.get(AVAILABILITY_KEY)
+    if availability is not None:
+        for dev_eui in list(hass_data[DEVICES_KEY]):
+            availability.restore(dev_eui)
+
+    # Apply changed options without a restart
+    config_entry.async_on_unload(config_entry.add_update_listener(async_reload_entry))
+
+    return True
+
+
+def build_entry_data(
+    hass: HomeAssistant, entry_id: str, options: Mapping[str, Any]
+) -> dict:
+    """Build the processing pipeline of an entry from its options.
+
+    Shared with the load test, so both wire the pipeline the same way. The
+    device store is not loaded and the timers are not started yet.
+    """
+    # Set up storage for device metadata and last values
+    devices: dict = {}
+    device_store = DeviceStore(hass, entry_id, devices)
+
+    # Batch state writes of uplinks arriving within the same window
+    write_window = timedelta(
+        milliseconds=options.get(STATE_WRITE_WINDOW_KEY, STATE_WRITE_WINDOW_DEFAULT)
+    )
+
+    # Skip writes of unchanged values, but write at least once per heartbeat
+    change_filter = ChangeFilter(
+        {
+            **DEADBANDS_DEFAULT,
+            **options.get(DEADBANDS_KEY, {}),
+        },
+        timedelta(
+            minutes=options.get(HEARTBEAT_INTERVAL_KEY, HEARTBEAT_INTERVAL_DEFAULT)
+        ),
+    )
+
+    metrics = PipelineMetrics()
 
-    hass.data[DOMAIN][entry_id] = {
+    # Compile the device profile schemas, the options override the YAML
+    schemas = SchemaTable(
+        merge_schemas(
+            hass.data[DOMAIN].get(YAML_SCHEMAS_KEY),
+            options.get(SCHEMAS_KEY),
+        )
+    )
+
+    hass_data = {
         SENSORS_KEY: [],
         BINARY_SENSORS_KEY: [],
-        DEVICES_KEY: stored_states.get(entry_id, {}),
+        DEVICES_KEY: devices,
+        DEVICE_METADATA_KEY: {},
+        INGEST_PLANS_KEY: IngestPlanCache(make_value_converter, schemas),
+        SCHEMA_TABLE_KEY: schemas,
+        COALESCER_KEY: StateWriteCoalescer(
+            hass, write_window, device_store.mark_entities_dirty, metrics
+        ),
+        CHANGE_FILTER_KEY: change_filter,
         PENDING_SENSORS_KEY: [],
         PENDING_BINARY_SENSORS_KEY: [],
-        STORE_KEY: store,
+        STORE_KEY: device_store,
+        METRICS_KEY: metrics,
     }
 
-    # Set up periodic saving of device states
-    async def _save_states(_now=None):
-        all_states = await store.async_load() or {}
-        all_states[entry_id] = hass.data[DOMAIN][entry_id][DEVICES_KEY]
-        await store.async_save(all_states)
+    # Register the entities of devices joining at the same time together
+    hass_data[REGISTRAR_KEY] = EntityRegistrar(
+        hass,
+        hass_data,
+        timedelta(
+            milliseconds=options.get(
+                REGISTRATION_WINDOW_KEY, REGISTRATION_WINDOW_DEFAULT
+            )
+        ),
+        metrics,
+    )
+
+    # Decode the raw payload of uplinks without object, the options override
+    # the YAML per device profile
+    decoders = {
+        **hass.data[DOMAIN].get(YAML_DECODERS_KEY, {}),
+        **options.get(DECODERS_KEY, {}),
+    }
+    if decoders:
+        hass_data[PAYLOAD_DECODERS_KEY] = PayloadDecoders(decoders)
+
+    # Drop uplinks that were already processed
+    if options.get(DEDUP_ENABLED_KEY, True):
+        hass_data[DEDUP_KEY] = UplinkDeduplicator(
+            options.get(DEDUP_WINDOW_KEY, DEDUP_WINDOW_DEFAULT),
+            options.get(DEDUP_MAX_DEVICES_KEY, DEDUP_MAX_DEVICES_DEFAULT),
+            options.get(DEDUP_USE_DEDUPLICATION_ID_KEY, False),
+        )
+
+    # Optionally keep rolling link statistics of the receiving gateways
+    if options.get(LINK_QUALITY_ENABLED_KEY, False):
+        hass_data[LINK_QUALITY_KEY] = LinkQualityTracker(
+            options.get(LINK_QUALITY_WINDOW_KEY, LINK_QUALITY_WINDOW_DEFAULT)
+        )
 
-    hass.data[DOMAIN][entry_id]["cancel_save_interval"] = async_track_time_interval(
-        hass, _save_states, SAVE_INTERVAL
+    # Import arrays of samples as statistics if there is a recorder
+    if "recorder" in hass.config.components:
+        hass_data[SERIES_IMPORTER_KEY] = SeriesImporter(hass)
+
+    # Mark the entities of silent devices unavailable, 0 disables it
+    availability_factor = options.get(
+        AVAILABILITY_FACTOR_KEY, AVAILABILITY_FACTOR_DEFAULT
     )
+    if availability_factor > 0:
+        hass_data[AVAILABILITY_KEY] = AvailabilityTracker(
+            hass,
+            devices,
+            availability_factor,
+            options.get(AVAILABILITY_MIN_TIMEOUT_KEY, AVAILABILITY_MIN_TIMEOUT_DEFAULT),
+        )
 
-    # Register the view
-    url_suffix = config_entry.data[API_URL_SUFFIX_KEY]
-    header_name = config_entry.data.get(API_HEADER_NAME_KEY)
-    header_value = config_entry.data.get(API_HEADER_VALUE_KEY)
-    hass.http.register_view(
-        ChirpstackHttpView(hass, entry_id, url_suffix, header_name, header_value)
+    # Bound the devices and entities a misbehaving codec can create
+    limits = EntityLimits(
+        options.get(MAX_DEVICES_KEY, MAX_DEVICES_DEFAULT),
+        options.get(MAX_KEYS_PER_DEVICE_KEY, MAX_KEYS_PER_DEVICE_DEFAULT),
+        options.get(MAX_FLATTEN_DEPTH_KEY, MAX_FLATTEN_DEPTH_DEFAULT),
     )
+    hass_data[LIMITS_KEY] = limits
 
-    # Set up platforms - this trigger async_setup_entry in the sensors
-    # https://developers.home-assistant.io/docs/creating_component_generic_discovery
-    await hass.config_entries.async_forward_entry_setups(config_entry, PLATFORMS)
+    # Evict devices that have been idle for too long, 0 disables it
+    idle_ttl = options.get(DEVICE_IDLE_TTL_KEY, DEVICE_IDLE_TTL_DEFAULT)
+    if idle_ttl > 0:
+        hass_data[IDLE_EVICTOR_KEY] = IdleDeviceEvictor(
+            hass, hass_data, limits, timedelta(days=idle_ttl)
+        )
 
-    return True
+    # Limit how often the sensors of chatty devices are written, the options
+    # override the YAML per devEui or device profile
+    rate_limits = parse_rate_limits(
+        {
+            **hass.data[DOMAIN].get(YAML_RATE_LIMITS_KEY, {}),
+            **options.get(RATE_LIMITS_KEY, {}),
+        }
+    )
+    if rate_limits:
+        hass_data[DOWNSAMPLER_KEY] = Downsampler(hass, rate_limits)
+
+    return hass_data
+
+
+def build_views(
+    hass: HomeAssistant,
+    entry_id: str,
+    data: Mapping[str, Any],
+    options: Mapping[str, Any],
+) -> tuple[ChirpstackHttpView, ChirpstackBatchView]:
+    """Build the webhook and batch views of an entry."""
+    url_suffix = data[API_URL_SUFFIX_KEY]
+    header_name = data.get(API_HEADER_NAME_KEY)
+    header_value = data.get(API_HEADER_VALUE_KEY)
+    payload_encoding = options.get(PAYLOAD_ENCODING_KEY, PAYLOAD_ENCODING_AUTO)
+    max_body_size = options.get(MAX_BODY_SIZE_KEY, MAX_BODY_SIZE_DEFAULT) * 1024
+    view = ChirpstackHttpView(
+        hass,
+        entry_id,
+        url_suffix,
+        header_name,
+        header_value,
+        payload_encoding,
+        max_body_size,
+    )
+    batch_view = ChirpstackBatchView(
+        hass,
+        entry_id,
+        url_suffix,
+        header_name,
+        header_value,
+        payload_encoding,
+        max_body_size,
+    )
+    return view, batch_view
+
+
+def build_ingest_queue(
+    view: ChirpstackHttpView, options: Mapping[str, Any]
+) -> IngestQueue | None:
+    """Build the ingest queue of an entry, None if it is disabled."""
+    if not options.get(QUEUE_ENABLED_KEY, False):
+        return None
+    return IngestQueue(
+        view.process_queued,
+        options.get(QUEUE_SIZE_KEY, QUEUE_SIZE_DEFAULT),
+        options.get(QUEUE_OVERFLOW_KEY, QUEUE_OVERFLOW_REJECT),
+    )
+
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload an entry after its options or connection settings changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    # Write out pending states while the entities still exist
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    entry_data[REGISTRAR_KEY].async_flush()
+    if entry_data.get(DOWNSAMPLER_KEY) is not None:
+        entry_data[DOWNSAMPLER_KEY].async_flush()
+    entry_data[COALESCER_KEY].async_flush()
+
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        # Stop accepting requests for this entry
+        hass.data[DOMAIN][ROUTER_KEY].unregister(entry.entry_id)
+        entry_data = hass.data[DOMAIN].pop(entry.entry_id)
+        await entry_data[STORE_KEY].async_flush()
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await DeviceStore(hass, entry.entry_id, {}).async_remove()
+    await async_remove_legacy_store(hass)
@@ -0,0 +1,189 @@
+"""Availability of silent devices for the ChirpStack HTTP integration.
+
+The uplink interval of every device is learned from the gaps between its
+uplinks. A device that stays silent for `availability_factor` times that
+interval (but at least `availability_min_timeout`) has all of its entities
+marked unavailable, until it is heard from again.
+
+The interval is learned from the `time` of the uplinks, not from when they
+are processed, so replayed or queued backlogs neither shrink it nor mark
+devices available whose last uplink is already overdue. Devices restored at
+startup get `availability_min_timeout` to be heard from again.
+
+Deadlines are kept in a timer wheel: a dict of slots of
+AVAILABILITY_RESOLUTION seconds, each with the devices due in it. One
+shared timer advances the wheel once per slot, so the cost of an uplink is
+moving its device between two slots, whatever the number of entities.
+"""
+
+from datetime import timedelta
+import logging
+import time
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds per slot of the timer wheel
+AVAILABILITY_RESOLUTION = 30
+# Weight of the newest gap in the learned uplink interval
+INTERVAL_SMOOTHING = 0.25
+
+
+class _DeviceAvailability:
+    """Learned uplink interval and deadline slot of one device."""
+
+    __slots__ = ("last_seen", "interval", "slot", "available")
+
+    def __init__(self, last_seen: float | None):
+        # POSIX time of the newest uplink, None for restored devices
+        self.last_seen = last_seen
+        self.interval: float | None = None
+        self.slot: int | None = None
+        self.available = True
+
+
+class AvailabilityTracker:
+    """Mark the entities of devices unavailable once they fall silent."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        devices: dict[str, dict],
+        factor: float,
+        min_timeout: float,
+        resolution: float = AVAILABILITY_RESOLUTION,
+    ):
+        self.hass = hass
+        # devEui -> key -> entity, shared with the webhook view
+        self._entities = devices
+        self.factor = factor
+        self.min_timeout = min_timeout
+        self.resolution = resolution
+
+        self._devices: dict[str, _DeviceAvailability] = {}
+        self._wheel: dict[int, set[str]] = {}
+        self._cursor = self._slot(time.monotonic())
+
+        # metrics
+        self.ticks = 0
+        self.marked_unavailable = 0
+        self.marked_available = 0
+
+    def _slot(self, timestamp: float) -> int:
+        return int(timestamp // self.resolution)
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Start the shared timer, returning the callback that stops it."""
+        return async_track_time_interval(
+            self.hass, self._async_tick, timedelta(seconds=self.resolution)
+        )
+
+    @callback
+    def seen(self, dev_eui: str, event_time: float | None = None):
+        """Record an uplink of a device and move its deadline.
+
+        event_time is the POSIX time the uplink was received by ChirpStack,
+        None for now.
+        """
+        wall_now = time.time()
+        at = wall_now if event_time is None else min(event_time, wall_now)
+        device = self._devices.get(dev_eui)
+        if device is None:
+            device = self._devices[dev_eui] = _DeviceAvailability(at)
+        elif device.last_seen is None:
+            # restored at startup, the gap since the last uplink is unknown
+            device.last_seen = at
+        elif at <= device.last_seen:
+            # replayed or reordered uplink, older than what is known
+            return
+        elif device.available:
+            gap = at - device.last_seen
+            if device.interval is None:
+                device.interval = gap
+            else:
+                device.interval += INTERVAL_SMOOTHING * (gap - device.interval)
+            device.last_seen = at
+        else:
+            # the silence says nothing about the regular interval
+            device.last_seen = at
+
+        timeout = self.min_timeout
+        if device.interval is not None:
+            timeout = max(self.factor * device.interval, timeout)
+        # the deadline on the monotonic clock of the wheel
+        now = time.monotonic()
+        deadline = now - (wall_now - at) + timeout
+        if deadline <= now:
+            if not device.available:
+                return
+            # already overdue, e.g. a replayed backlog, the next tick marks it
+            slot = self._cursor + 1
+        else:
+            if not device.available:
+                device.available = True
+                self._set_available(dev_eui, True)
+            slot = self._slot(deadline) + 1
+        if slot != device.slot:
+            if device.slot is not None:
+                self._wheel[device.slot].discard(dev_eui)
+            self._wheel.setdefault(slot, set()).add(dev_eui)
+            device.slot = slot
+
+    @callback
+    def restore(self, dev_eui: str):
+        """Schedule a device restored at startup, before it is heard from."""
+        if dev_eui in self._devices:
+            return
+        device = self._devices[dev_eui] = _DeviceAvailability(None)
+        device.slot = self._slot(time.monotonic() + self.min_timeout) + 1
+        self._wheel.setdefault(device.slot, set()).add(dev_eui)
+
+    @callback
+    def _async_tick(self, _now=None):
+        """Advance the wheel, marking the devices of all passed slots stale."""
+        self.ticks += 1
+        current = self._slot(time.monotonic())
+        stale: list[str] = []
+        while self._cursor < current:
+            self._cursor += 1
+            stale.extend(self._wheel.pop(self._cursor, ()))
+
+        for dev_eui in stale:
+            device = self._devices[dev_eui]
+            device.slot = None
+            device.available = False
+            self._set_available(dev_eui, False)
+
+        if stale:
+            _LOGGER.info(f"Marked {len(stale)} silent devices unavailable")
+
+    def _set_available(self, dev_eui: str, available: bool):
+        # the entities' writes end up in the same coalesced flush
+        for entity in self._entities.get(dev_eui, {}).values():
+            entity.set_available(available)
+        if available:
+            self.marked_available += 1
+        else:
+            self.marked_unavailable += 1
+
+    def forget(self, dev_eui: str):
+        """Stop tracking an evicted device."""
+        device = self._devices.pop(dev_eui, None)
+        if device is not None and device.slot is not None:
+            self._wheel[device.slot].discard(dev_eui)
+
+    def stats(self) -> dict[str, int | float]:
+        """Return tracker counters."""
+        return {
+            "devices": len(self._devices),
+            "unavailable": sum(1 for d in self._devices.values() if not d.available),
+            "scheduled": sum(len(slot) for slot in self._wheel.values()),
+            "slots": len(self._wheel),
+            "resolution_s": self.resolution,
+            "ticks": self.ticks,
+            "marked_unavailable": self.marked_unavailable,
+            "marked_available": self.marked_available,
+        }
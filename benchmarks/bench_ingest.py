@@ -0,0 +1,252 @@
+"""Microbenchmarks of the ingest helpers.
+
+Measures flatten_dict, sanitize_value and the sensor and binary sensor
+detectors on a corpus of realistic payloads (see corpus.py). Before timing
+anything, the results are checked against the original implementations in
+reference.py, so an optimization that changes the output fails loudly.
+
+Needs the homeassistant package for the device classes and units, but no
+running instance:
+
+    python benchmarks/bench_ingest.py
+    python benchmarks/bench_ingest.py --save benchmarks/baseline.json
+    python benchmarks/bench_ingest.py --compare benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+
+import corpus
+import reference
+from integration import load_module
+
+http = load_module("http")
+helpers = load_module("helpers")
+ingest = load_module("ingest")
+
+FLAT_PAYLOADS = {name: http.flatten_dict(p) for name, p in corpus.PAYLOADS.items()}
+ITEMS = [item for flat in FLAT_PAYLOADS.values() for item in flat.items()]
+HINTS = {
+    key: hint
+    for payload in corpus.PAYLOADS.values()
+    for key, hint in payload.get("type_ref", {}).items()
+}
+KEYS = list(dict.fromkeys([key for key, _ in ITEMS] + list(corpus.EXTRA_KEYS)))
+KEY_ARGS = [(HINTS.get(key), key) for key in KEYS] + [
+    (hint,) for hint in HINTS.values()
+]
+TRICKY_VALUES = (0, 1, 1.0, 0.0, -3, "1", "0", "On", "no", "12", " 7 ", "1e3", None)
+
+
+def _outcome(func, *args):
+    """Return the result of a call, or the type of the exception it raised."""
+    try:
+        result = func(*args)
+    except Exception as err:  # noqa: BLE001 - the exception is the outcome
+        return ("raises", type(err).__name__)
+    if isinstance(result, list):
+        result = tuple(result)
+    return ("ok", type(result).__name__, result)
+
+
+def check_correctness():
+    """Assert that the optimized helpers match the reference implementations."""
+    sensor_map = helpers.SENSOR_DETECTION_MAP
+    binary_map = helpers.BINARY_SENSOR_DETECTION_MAP
+    checks = 0
+
+    for name, payload in corpus.PAYLOADS.items():
+        expected = list(reference.flatten_dict(payload).items())
+        assert list(http.flatten_dict(payload).items()) == expected, name
+
+        values = []
+        shape = ingest.split_payload(payload, values)
+        assert list(zip(ingest._flat_keys(shape), values)) == expected, name
+        checks += 2
+
+    for key, value in ITEMS + [(k, v) for k in KEYS for v in TRICKY_VALUES]:
+        expected = _outcome(reference.sanitize_value, value, key, binary_map)
+        assert _outcome(http.sanitize_value, value, key) == expected, (key, value)
+        converter = http.make_value_converter(key)
+        assert _outcome(converter, value) == expected, (key, value)
+        checks += 2
+
+    # Twice, so the cached results are checked as well
+    for _ in range(2):
+        for args in KEY_ARGS:
+            expected = _outcome(reference.detect_sensor_unit, sensor_map, *args)
+            assert _outcome(helpers.detect_sensor_unit, *args) == expected, args
+
+            expected = _outcome(
+                reference.detect_binary_sensor_device_class, binary_map, *args
+            )
+            actual = _outcome(helpers.detect_binary_sensor_device_class, *args)
+            assert actual == expected, args
+            checks += 2
+
+    return checks
+
+
+def _sensor_unit_cold():
+    helpers.clear_classification_cache()
+    for args in KEY_ARGS:
+        helpers.detect_sensor_unit(*args)
+
+
+def _sensor_unit_warm():
+    for args in KEY_ARGS:
+        helpers.detect_sensor_unit(*args)
+
+
+def _binary_class_cold():
+    helpers.clear_classification_cache()
+    for args in KEY_ARGS:
+        helpers.detect_binary_sensor_device_class(*args)
+
+
+def _binary_class_warm():
+    for args in KEY_ARGS:
+        helpers.detect_binary_sensor_device_class(*args)
+
+
+def _sanitize_all():
+    for key, value in ITEMS:
+        http.sanitize_value(value, key)
+
+
+CONVERTERS = [(http.make_value_converter(key), value) for key, value in ITEMS]
+
+
+def _convert_all():
+    for convert, value in CONVERTERS:
+        convert(value)
+
+
+def _split(payload):
+    def run():
+        ingest.split_payload(payload, [])
+
+    return run
+
+
+def _flatten(payload):
+    def run():
+        http.flatten_dict(payload)
+
+    return run
+
+
+def benchmarks() -> dict[str, tuple]:
+    """Return name -> (callable, operations per call)."""
+    cases = {}
+    for name, payload in corpus.PAYLOADS.items():
+        cases[f"flatten_dict[{name}]"] = (_flatten(payload), 1)
+        cases[f"split_payload[{name}]"] = (_split(payload), 1)
+    cases["sanitize_value"] = (_sanitize_all, len(ITEMS))
+    cases["value_converter"] = (_convert_all, len(CONVERTERS))
+    cases["detect_sensor_unit[cold]"] = (_sensor_unit_cold, len(KEY_ARGS))
+    cases["detect_sensor_unit[warm]"] = (_sensor_unit_warm, len(KEY_ARGS))
+    cases["detect_binary_sensor_device_class[cold]"] = (
+        _binary_class_cold,
+        len(KEY_ARGS),
+    )
+    cases["detect_binary_sensor_device_class[warm]"] = (
+        _binary_class_warm,
+        len(KEY_ARGS),
+    )
+    return cases
+
+
+def _allocated_bytes(func) -> int:
+    """Peak memory allocated by a single call."""
+    func()  # warm up caches and lazily created objects
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run(selected: str | None = None, repeat: int = 5) -> dict:
+    """Run the benchmarks, optionally only those containing `selected`."""
+    results = {}
+    for name, (func, ops) in benchmarks().items():
+        if selected and selected not in name:
+            continue
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+        results[name] = {
+            "ops_per_sec": round(ops / seconds),
+            "us_per_op": round(seconds / ops * 1e6, 3),
+            "alloc_bytes_per_op": round(_allocated_bytes(func) / ops),
+        }
+        print(
+            f"{name:<42} {results[name]['us_per_op']:10.3f} us/op "
+            f"{results[name]['ops_per_sec']:12d} ops/s "
+            f"{results[name]['alloc_bytes_per_op']:8d} B/op"
+        )
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print the change against a baseline and return the regressed benchmarks."""
+    regressions = []
+    print(f"\ncompared to baseline from {baseline.get('python', '?')}:")
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<42} {'new':>10}")
+            continue
+        ratio = result["ops_per_sec"] / base["ops_per_sec"]
+        flag = ""
+        if ratio < 1 - threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<42} {ratio:9.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="selected", help="only run matching benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", type=Path, help="write the results to a file")
+    parser.add_argument("--compare", type=Path, help="compare with saved results")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="slowdown that counts as a regression (default 0.1 = 10%%)",
+    )
+    args = parser.parse_args()
+
+    checks = check_correctness()
+    print(f"correctness: {checks} checks passed\n")
+
+    results = run(args.selected, args.repeat)
+
+    if args.save:
+        args.save.write_text(
+            json.dumps(
+                {"python": platform.python_version(), "results": results}, indent=2
+            )
+            + "\n"
+        )
+        print(f"\nsaved results to {args.save}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Memory benchmark of the per-device metadata.
+
+Compares the memory held for the name, tenant and profile of N devices with
+K entities each:
+
+- per_entity: every entity owns a DeviceInfo built from the deviceInfo of
+  the event that created it, as before the metadata was shared
+- shared: one DeviceMetadata per device with interned strings, referenced
+  by all entities of the device
+
+The deviceInfo is decoded from JSON for every entity, like it is for every
+event, so the strings are separate objects unless interned.
+
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --devices 5000 --entities 20
+"""
+
+import argparse
+import json
+import tracemalloc
+
+from integration import load_module
+
+const = load_module("const")
+device_metadata = load_module("device_metadata")
+DeviceInfo = device_metadata.DeviceInfo
+
+TENANTS = 3
+PROFILES = 12
+
+
+def device_info_json(index: int) -> str:
+    return json.dumps(
+        {
+            const.CS_DEVICE_EUI_KEY: f"{index:016x}",
+            const.CS_DEVICE_NAME_KEY: f"sensor-{index:05d}",
+            const.CS_TENANT_NAME_KEY: f"Tenant {index % TENANTS}",
+            const.CS_DEVICE_PROFILE_NAME_KEY: f"Profile {index % PROFILES}",
+        }
+    )
+
+
+def per_entity(events: list[str], entities: int) -> list:
+    """Build one DeviceInfo per entity, as the entities did before."""
+    held = []
+    for event in events:
+        for _ in range(entities):
+            raw = json.loads(event)
+            held.append(
+                DeviceInfo(
+                    identifiers={(const.DOMAIN, raw[const.CS_DEVICE_EUI_KEY])},
+                    name=raw[const.CS_DEVICE_NAME_KEY],
+                    manufacturer=raw[const.CS_TENANT_NAME_KEY],
+                    model=raw[const.CS_DEVICE_PROFILE_NAME_KEY],
+                )
+            )
+    return held
+
+
+def shared(events: list[str], entities: int) -> list:
+    """Build one DeviceMetadata per device, updated by every further event."""
+    devices = {}
+    held = []
+    for event in events:
+        for _ in range(entities):
+            raw = json.loads(event)
+            dev_eui = raw[const.CS_DEVICE_EUI_KEY]
+            device = devices.get(dev_eui)
+            if device is None:
+                device = devices[dev_eui] = device_metadata.DeviceMetadata(dev_eui, raw)
+            else:
+                device.update(raw)
+            held.append(device)
+    return held
+
+
+def measure(build, events: list[str], entities: int) -> int:
+    """Return the bytes still allocated once build has returned."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        held = build(events, entities)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del held
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--entities", type=int, default=10)
+    args = parser.parse_args()
+
+    events = [device_info_json(index) for index in range(args.devices)]
+    total_entities = args.devices * args.entities
+    results = {}
+    for name, build in (("per_entity", per_entity), ("shared", shared)):
+        size = measure(build, events, args.entities)
+        results[name] = {
+            "bytes": size,
+            "bytes_per_device": round(size / args.devices),
+            "bytes_per_entity": round(size / total_entities),
+        }
+    results["saved_percent"] = round(
+        100 * (1 - results["shared"]["bytes"] / results["per_entity"]["bytes"]), 1
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
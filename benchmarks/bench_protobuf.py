@@ -0,0 +1,143 @@
+"""Compare the parse cost of Protobuf and JSON encoded uplink events.
+
+Runs without Home Assistant: the Protobuf decoder has no dependencies and
+is loaded straight from its file.
+
+    python benchmarks/bench_protobuf.py
+"""
+
+import importlib.util
+import json
+import struct
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_spec = importlib.util.spec_from_file_location("protobuf", ROOT / "protobuf.py")
+protobuf = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(protobuf)
+
+try:
+    import orjson
+except ImportError:  # HA ships orjson, plain json is the fallback
+    orjson = None
+
+
+def _varint(value: int) -> bytes:
+    if value < 0:
+        value += 1 << 64
+    out = bytearray()
+    while True:
+        b = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _field(number: int, wire_type: int, payload: bytes) -> bytes:
+    return _varint(number << 3 | wire_type) + payload
+
+
+def _len(number: int, payload: bytes) -> bytes:
+    return _field(number, 2, _varint(len(payload)) + payload)
+
+
+def _string(number: int, value: str) -> bytes:
+    return _len(number, value.encode())
+
+
+def _value(value) -> bytes:
+    if isinstance(value, bool):
+        return _field(4, 0, _varint(int(value)))
+    if isinstance(value, (int, float)):
+        return _field(2, 1, struct.pack("<d", value))
+    if isinstance(value, str):
+        return _string(3, value)
+    if isinstance(value, dict):
+        return _len(5, _struct(value))
+    raise TypeError(value)
+
+
+def _struct(obj: dict) -> bytes:
+    return b"".join(
+        _len(1, _string(1, key) + _len(2, _value(value))) for key, value in obj.items()
+    )
+
+
+def encode_uplink_event(event: dict) -> bytes:
+    """Encode the subset of UplinkEvent used by the sample events."""
+    info = event["deviceInfo"]
+    device_info = (
+        _string(2, info["tenantName"])
+        + _string(6, info["deviceProfileName"])
+        + _string(7, info["deviceName"])
+        + _string(8, info["devEui"])
+    )
+    rx_infos = b"".join(
+        _len(
+            12,
+            _string(1, rx["gatewayId"])
+            + _field(6, 0, _varint(rx["rssi"]))
+            + _field(7, 5, struct.pack("<f", rx["snr"])),
+        )
+        for rx in event["rxInfo"]
+    )
+    return (
+        _string(1, event["deduplicationId"])
+        + _len(3, device_info)
+        + _field(7, 0, _varint(event["fCnt"]))
+        + _field(8, 0, _varint(event["fPort"]))
+        + _len(11, _struct(event["object"]))
+        + rx_infos
+    )
+
+
+SAMPLE_EVENT = {
+    "deduplicationId": "3ac7e3c4-4401-4b8d-9386-a5c902f9202d",
+    "deviceInfo": {
+        "tenantName": "ChirpStack",
+        "deviceProfileName": "Environment sensor",
+        "deviceName": "greenhouse-1",
+        "devEui": "0101010101010101",
+    },
+    "fCnt": 10,
+    "fPort": 1,
+    "object": {
+        "temperature": 21.5,
+        "humidity": 48.0,
+        "battery": 97.0,
+        "door_open": False,
+        "status": "ok",
+        "nested": {"pressure": 1013.25, "voltage": 3.6},
+    },
+    "rxInfo": [{"gatewayId": "0016c001ff10d3f6", "rssi": -57, "snr": 10.5}],
+}
+
+
+def main(number: int = 20000):
+    pb_payload = encode_uplink_event(SAMPLE_EVENT)
+    json_payload = json.dumps(SAMPLE_EVENT).encode()
+
+    decoded = protobuf.decode_uplink_event(pb_payload)
+    assert decoded == SAMPLE_EVENT, decoded
+
+    parsers = {"protobuf": lambda: protobuf.decode_uplink_event(pb_payload)}
+    parsers["json"] = lambda: json.loads(json_payload)
+    if orjson is not None:
+        parsers["orjson"] = lambda: orjson.loads(json_payload)
+
+    print(f"payload size: protobuf {len(pb_payload)} B, json {len(json_payload)} B")
+    for name, parse in parsers.items():
+        seconds = min(timeit.repeat(parse, number=number, repeat=5))
+        print(
+            f"{name:>8}: {seconds / number * 1e6:8.2f} us/op "
+            f"{number / seconds:12.0f} ops/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
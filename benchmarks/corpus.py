@@ -0,0 +1,95 @@
+"""Corpus of realistic ChirpStack payloads for the benchmarks.
+
+Every entry is the decoded `object` of an uplink event as produced by a
+device profile codec.
+"""
+
+
+def _wide_object(width: int = 100) -> dict:
+    """A flat object as sent by multi-channel loggers."""
+    kinds = ("temperature", "humidity", "pressure", "voltage", "counter")
+    return {f"ch{i:02d}_{kinds[i % len(kinds)]}": 20.0 + i / 10 for i in range(width)}
+
+
+ENVIRONMENT = {
+    "temperature": 21.5,
+    "humidity": 48.0,
+    "pressure": 1013.25,
+    "battery": 97,
+    "co2": 612,
+    "light": 240,
+}
+
+DOOR = {
+    "door_open": True,
+    "tamper": False,
+    "open_count": 12,
+    "battery_voltage": 3.61,
+}
+
+# Codecs that decode into nested structures
+NESTED = {
+    "sensors": {
+        "air": {"temperature": 22.1, "humidity": 51.2, "baro": 1009.8},
+        "soil": {"temperature": 14.2, "moisture": 33.0, "ec": 1.2},
+    },
+    "power": {"battery": 88, "voltage": 3.3, "external": False},
+    "status": {"motion": 1.0, "occupancy": 0, "water_leak": "false"},
+    "meta": {"fw": "1.4.2", "uptime": 86400},
+}
+
+# Codecs that send numbers and booleans as strings
+STRING_NUMBERS = {
+    "temperature": "21.75",
+    "humidity": "45",
+    "battery": "100",
+    "rssi": "-97",
+    "snr": "7.25",
+    "presence": "on",
+    "motion": "off",
+    "state": "idle",
+    "counter": "000123",
+    "level": "1e3",
+}
+
+# Codecs that add explicit "device class,unit" hints next to the values
+TYPE_REF = {
+    "t1": 19.5,
+    "h1": 62.0,
+    "flow": 3.2,
+    "distance": 1.75,
+    "type_ref": {
+        "t1": "TEMPERATURE,°C",
+        "h1": "HUMIDITY,%",
+        "flow": "VOLUME_FLOW_RATE,m³/h",
+        "distance": "DISTANCE, m",
+    },
+}
+
+WIDE = _wide_object()
+
+PAYLOADS = {
+    "environment": ENVIRONMENT,
+    "door": DOOR,
+    "nested": NESTED,
+    "string_numbers": STRING_NUMBERS,
+    "type_ref": TYPE_REF,
+    "wide": WIDE,
+}
+
+# Keys that are classified, including type hints and keys that match nothing
+EXTRA_KEYS = (
+    "TEMPERATURE,°C",
+    "BATTERY,%",
+    "SIGNAL_STRENGTH,dB",
+    "unknown_hint,xyz",
+    "Rssi",
+    "electrical conductivity",
+    "device ec",
+    "ApparentPower",
+    "power_factor",
+    "closed",
+    "window",
+    "frost_alarm",
+    "",
+)
@@ -0,0 +1,27 @@
+"""Import the integration straight from the repository for the benchmarks."""
+
+import importlib
+import importlib.util
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = "chirpstack_http"
+
+
+def load_integration():
+    """Import the repository as the chirpstack_http package."""
+    if PACKAGE not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            PACKAGE, ROOT / "__init__.py", submodule_search_locations=[str(ROOT)]
+        )
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[PACKAGE] = module
+        spec.loader.exec_module(module)
+    return sys.modules[PACKAGE]
+
+
+def load_module(name: str):
+    """Import a module of the integration, e.g. "http"."""
+    load_integration()
+    return importlib.import_module(f"{PACKAGE}.{name}")
@@ -0,0 +1,464 @@
+"""End-to-end load test of the ChirpStack webhook.
+
+Runs ChirpstackHttpView on a local aiohttp server with a stubbed `hass`
+(state machine, entity platform callbacks and Store) and replays simulated
+devices against it:
+
+    python benchmarks/load_test.py --devices 500 --rate 200 --duration 30
+    python benchmarks/load_test.py --rate 0 --save benchmarks/load.json
+    python benchmarks/load_test.py --rate 0 --compare benchmarks/load.json
+
+With --rate 0 every client sends its next uplink as soon as the previous one
+was answered, which measures the maximum throughput. Otherwise uplinks are
+sent at the given total rate regardless of how fast they are answered, so
+latency grows once the server cannot keep up.
+
+The server runs on its own event loop in a background thread, the event loop
+lag is measured on that loop. Needs the homeassistant package, but no
+running instance.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import UTC, datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import corpus
+from integration import load_integration, load_module
+
+chirpstack_http = load_integration()
+const = load_module("const")
+http = load_module("http")
+metrics = load_module("metrics")
+persistence = load_module("persistence")
+binary_sensor = load_module("binary_sensor")
+
+ENTRY_ID = "load_test"
+URL_SUFFIX = "load"
+LAG_INTERVAL = 0.01  # seconds between event loop lag probes
+
+
+def percentile(samples: list[float], percent: float) -> float | None:
+    """Return the nearest-rank percentile of the samples."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class FakeStates:
+    """Minimal state machine that keeps the last state of every entity."""
+
+    def __init__(self):
+        self.states: dict[str, object] = {}
+        self.writes = 0
+
+    def write(self, entity):
+        if isinstance(entity, binary_sensor.ChirpstackBinarySensor):
+            state = entity.is_on
+        else:
+            state = entity.native_value
+        self.states[entity.entity_id] = state
+        self.writes += 1
+
+
+class FakeStore:
+    """Stands in for the Store of the DeviceStore, counting saves."""
+
+    def __init__(self, *args, **kwargs):
+        self.delayed_saves = 0
+        self.saves = 0
+
+    async def async_load(self):
+        return None
+
+    def async_delay_save(self, data_func, delay):
+        self.delayed_saves += 1
+
+    async def async_save(self, data):
+        self.saves += 1
+
+    async def async_remove(self):
+        pass
+
+
+# The device store writes through the fake store instead of to disk
+persistence.Store = FakeStore
+
+
+class FakeHass:
+    """Just enough of HomeAssistant for the view, the entities and timers."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.data: dict = {}
+        # no recorder, arrays of samples are not imported as statistics
+        self.config = SimpleNamespace(components=set())
+        self.states = FakeStates()
+        self.entities_added = 0
+        self.background_tasks: set[asyncio.Task] = set()
+
+    def async_run_hass_job(self, job, *args, **kwargs):
+        # used by async_call_later
+        return job.target(*args)
+
+    def add_entities(self, entities):
+        """Entity platform callback: bind the entities and write their state."""
+        for entity in entities:
+            entity.hass = self
+            domain = (
+                "binary_sensor"
+                if isinstance(entity, binary_sensor.ChirpstackBinarySensor)
+                else "sensor"
+            )
+            entity.entity_id = f"{domain}.{entity.unique_id}"
+            entity.async_write_ha_state = lambda entity=entity: self.states.write(
+                entity
+            )
+            entity.async_write_ha_state()
+            self.entities_added += 1
+
+
+def setup_entry(hass: FakeHass, options: dict) -> http.ChirpstackHttpView:
+    """Build the entry with the integration's own wiring and return the view."""
+    entry_options = {
+        const.STATE_WRITE_WINDOW_KEY: options["write_window_ms"],
+        const.REGISTRATION_WINDOW_KEY: options["registration_window_ms"],
+        const.DEDUP_ENABLED_KEY: options["dedup"],
+        const.QUEUE_ENABLED_KEY: options["queue"],
+        # any number of simulated devices
+        const.MAX_DEVICES_KEY: 0,
+    }
+    hass.data.setdefault(const.DOMAIN, {})
+    hass_data = chirpstack_http.build_entry_data(hass, ENTRY_ID, entry_options)
+    hass_data[const.ADD_SENSOR_ENTITIES_FUNC_KEY] = hass.add_entities
+    hass_data[const.ADD_BINARY_SENSOR_ENTITIES_FUNC_KEY] = hass.add_entities
+    hass.data[const.DOMAIN][ENTRY_ID] = hass_data
+
+    view, _ = chirpstack_http.build_views(
+        hass, ENTRY_ID, {const.API_URL_SUFFIX_KEY: URL_SUFFIX}, entry_options
+    )
+    queue = chirpstack_http.build_ingest_queue(view, entry_options)
+    if queue is not None:
+        hass_data[const.INGEST_QUEUE_KEY] = queue
+        hass.background_tasks.add(hass.loop.create_task(queue.run_worker()))
+    return view
+
+
+def _jitter(value, rng: random.Random):
+    """Return a slightly changed copy of a decoded object."""
+    if isinstance(value, dict):
+        return {k: _jitter(v, rng) for k, v in value.items()}
+    if isinstance(value, bool):
+        return not value if rng.random() < 0.1 else value
+    if isinstance(value, float):
+        return round(value + rng.gauss(0, 0.5), 2)
+    return value
+
+
+class SimulatedDevice:
+    """A device of a profile that sends uplinks with increasing frame counters."""
+
+    def __init__(self, index: int, profile: str):
+        self.dev_eui = f"{index:016x}"
+        self.profile = profile
+        self.f_cnt = 0
+
+    def _event(self) -> dict:
+        return {
+            "deduplicationId": str(uuid.uuid4()),
+            "time": datetime.now(UTC).isoformat(),
+            "deviceInfo": {
+                "tenantName": "Load test",
+                "deviceProfileName": self.profile,
+                "deviceName": f"{self.profile}-{self.dev_eui[-6:]}",
+                "devEui": self.dev_eui,
+            },
+        }
+
+    def uplink(self, rng: random.Random) -> tuple[str, bytes]:
+        self.f_cnt += 1
+        event = self._event()
+        event["fCnt"] = self.f_cnt
+        event["fPort"] = 1
+        event["object"] = _jitter(corpus.PAYLOADS[self.profile], rng)
+        event["rxInfo"] = [
+            {
+                "gatewayId": "0016c001ff10d3f6",
+                "rssi": rng.randint(-120, -40),
+                "snr": round(rng.uniform(-10, 12), 1),
+            }
+        ]
+        return const.CS_EVENT_UP, json.dumps(event).encode()
+
+    def join(self) -> tuple[str, bytes]:
+        self.f_cnt = 0
+        event = self._event()
+        event["devAddr"] = self.dev_eui[-8:]
+        return const.CS_EVENT_JOIN, json.dumps(event).encode()
+
+
+class Fleet:
+    """Picks the next requests: uplinks of known devices or new device joins."""
+
+    def __init__(self, devices: int, mix: dict[str, float], join_share: float):
+        self._rng = random.Random(0)
+        self._profiles = list(mix)
+        self._weights = list(mix.values())
+        self._join_share = join_share
+        self.devices = [self._new_device(index) for index in range(devices)]
+
+    def _new_device(self, index: int) -> SimulatedDevice:
+        profile = self._rng.choices(self._profiles, self._weights)[0]
+        return SimulatedDevice(index, profile)
+
+    def next_requests(self) -> list[tuple[str, bytes]]:
+        """Return the events to send in order, a join is followed by an uplink."""
+        if self._rng.random() < self._join_share:
+            device = self._new_device(len(self.devices))
+            self.devices.append(device)
+            return [device.join(), device.uplink(self._rng)]
+        return [self._rng.choice(self.devices).uplink(self._rng)]
+
+
+class ServerThread(threading.Thread):
+    """Runs the view on an aiohttp test server with its own event loop."""
+
+    def __init__(self, options: dict):
+        super().__init__(daemon=True)
+        self.options = options
+        self.ready = threading.Event()
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.hass: FakeHass | None = None
+        self.url = ""
+        self.lag: list[float] = []
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._start())
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def _start(self):
+        self.hass = FakeHass(self.loop)
+        view = setup_entry(self.hass, self.options)
+        app = web.Application()
+        app.router.add_post(view.url, view.post)
+        self._server = TestServer(app)
+        await self._server.start_server()
+        self.url = str(self._server.make_url(view.url))
+        self._lag_task = self.loop.create_task(self._measure_lag())
+
+    async def _measure_lag(self):
+        while True:
+            start = self.loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.lag.append(max(0.0, self.loop.time() - start - LAG_INTERVAL))
+
+    async def _async_stop(self):
+        for task in (self._lag_task, *self.hass.background_tasks):
+            task.cancel()
+        hass_data = self.hass.data[const.DOMAIN][ENTRY_ID]
+        hass_data[const.REGISTRAR_KEY].async_flush()
+        hass_data[const.COALESCER_KEY].async_flush()
+        await self._server.close()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._async_stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.join()
+
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+async def _send(session, url, requests, latencies, statuses):
+    for event_type, body in requests:
+        start = time.perf_counter()
+        async with session.post(
+            url, params={"event": event_type}, data=body, headers=JSON_HEADERS
+        ) as response:
+            await response.read()
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+
+
+async def generate_load(url: str, fleet: Fleet, args) -> dict:
+    """Send uplinks for the configured duration, return client side results."""
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + args.duration
+
+        if args.rate <= 0:
+            # closed loop: each client sends as soon as it got its response
+            async def client():
+                while loop.time() < deadline:
+                    await _send(
+                        session, url, fleet.next_requests(), latencies, statuses
+                    )
+
+            await asyncio.gather(*(client() for _ in range(args.concurrency)))
+        else:
+            # open loop: send at the given rate, however slow the responses are
+            tasks = set()
+            sent = 0
+            while (now := loop.time()) < deadline:
+                due = int((now - start) * args.rate) + 1
+                for _ in range(due - sent):
+                    task = loop.create_task(
+                        _send(session, url, fleet.next_requests(), latencies, statuses)
+                    )
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                sent = max(sent, due)
+                await asyncio.sleep(1 / args.rate)
+            await asyncio.gather(*tasks)
+
+        elapsed = loop.time() - start
+
+    return {
+        "requests": len(latencies),
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "elapsed_s": round(elapsed, 3),
+        "latencies": latencies,
+    }
+
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def run(args) -> dict:
+    """Run one load test and return the results."""
+    server = ServerThread(
+        {
+            "write_window_ms": args.write_window,
+            "registration_window_ms": args.registration_window,
+            "dedup": not args.no_dedup,
+            "queue": args.queue,
+        }
+    )
+    server.start()
+    server.ready.wait()
+
+    mix = dict(
+        (name, float(weight))
+        for name, weight in (item.split("=") for item in args.mix.split(","))
+    )
+    fleet = Fleet(args.devices, mix, args.join_share)
+    server.lag.clear()
+    client = asyncio.run(generate_load(server.url, fleet, args))
+    server.stop()
+
+    hass_data = server.hass.data[const.DOMAIN][ENTRY_ID]
+    latencies = client.pop("latencies")
+    total = hass_data[const.METRICS_KEY].stages[metrics.STAGE_TOTAL]
+    return {
+        **client,
+        "throughput_rps": round(client["requests"] / client["elapsed_s"], 1),
+        "latency_ms": {
+            "p50": _ms(percentile(latencies, 50)),
+            "p99": _ms(percentile(latencies, 99)),
+            "max": _ms(max(latencies, default=None)),
+        },
+        "server_latency_ms": {"p50": total.percentile(50), "p99": total.percentile(99)},
+        "loop_lag_ms": {
+            "p50": _ms(percentile(server.lag, 50)),
+            "p99": _ms(percentile(server.lag, 99)),
+            "max": _ms(max(server.lag, default=None)),
+        },
+        "devices": len(hass_data[const.DEVICES_KEY]),
+        "entities": server.hass.entities_added,
+        "state_writes": server.hass.states.writes,
+        "registration": hass_data[const.REGISTRAR_KEY].stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0,
+        help="uplinks/s in total, 0 = as fast as possible",
+    )
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--concurrency", type=int, default=16, help="connections")
+    parser.add_argument(
+        "--mix",
+        default="environment=4,door=2,nested=1,string_numbers=1,type_ref=1,wide=1",
+        help="payload mix as profile=weight pairs, see corpus.py",
+    )
+    parser.add_argument(
+        "--join-share", type=float, default=0.01, help="share of new device joins"
+    )
+    parser.add_argument(
+        "--write-window",
+        type=float,
+        default=const.STATE_WRITE_WINDOW_DEFAULT,
+        help="state write window in ms",
+    )
+    parser.add_argument(
+        "--registration-window",
+        type=float,
+        default=const.REGISTRATION_WINDOW_DEFAULT,
+        help="new entity registration window in ms",
+    )
+    parser.add_argument("--no-dedup", action="store_true")
+    parser.add_argument("--queue", action="store_true", help="enable the ingest queue")
+    parser.add_argument("--save", type=Path, help="write the results to a file")
+    parser.add_argument("--compare", type=Path, help="compare with saved results")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="throughput drop that counts as a regression (default 0.1 = 10%%)",
+    )
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        args.save.write_text(
+            json.dumps(
+                {"python": platform.python_version(), "args": vars(args), **results},
+                indent=2,
+                default=str,
+            )
+            + "\n"
+        )
+        print(f"saved results to {args.save}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        ratio = results["throughput_rps"] / baseline["throughput_rps"]
+        print(
+            f"throughput {results['throughput_rps']} rps, "
+            f"{ratio:.2f}x of baseline {baseline['throughput_rps']} rps"
+        )
+        if ratio < 1 - args.threshold:
+            print("REGRESSION: throughput dropped below the baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
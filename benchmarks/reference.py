@@ -0,0 +1,100 @@
+"""Reference implementations the optimized ingest helpers must match.
+
+These are the original, straightforward versions of the helpers. The
+benchmarks assert that the optimized versions return identical output for
+the whole corpus.
+"""
+
+import re
+
+from homeassistant.components.binary_sensor import BinarySensorDeviceClass
+from homeassistant.components.sensor import SensorDeviceClass
+
+
+def flatten_dict(d, parent_key="", sep="_"):
+    """Flatten a nested dictionary."""
+    items = []
+    for k, v in d.items():
+        new_key = f"{parent_key}{sep}{k}" if parent_key else k
+        if isinstance(v, dict):
+            items.extend(flatten_dict(v, new_key, sep=sep).items())
+        else:
+            items.append((new_key, v))
+    return dict(items)
+
+
+def sanitize_value(value, key=None, binary_detection_map=None):
+    """Convert value to proper type and format."""
+    if isinstance(value, bool):
+        return value
+
+    if isinstance(value, str):
+        if value.lower() in ["true", "1", "yes", "y", "on"]:
+            return True
+        elif value.lower() in ["false", "0", "no", "n", "off"]:
+            return False
+
+    if isinstance(value, (int, float)):
+        if detect_binary_sensor_device_class(binary_detection_map, key):
+            return value != 0.0
+        return value
+
+    if isinstance(value, str):
+        try:
+            if value.isdigit():
+                return int(value)
+            return float(value)
+        except (ValueError, TypeError):
+            pass
+
+    return value
+
+
+def detect_sensor_unit(detection_map, *args):
+    """Detect unit of measurement based on key name."""
+    for key in args:
+        found_class = None
+        found_unit = None
+
+        if key is None:
+            continue
+
+        if "," in key:
+            found_class, found_unit = key.split(",")
+
+        if found_class or found_unit:
+            found_class = found_class.strip()
+            found_unit = found_unit.strip()
+            if found_class.upper() in SensorDeviceClass.__dict__:
+                return [found_unit, SensorDeviceClass.__dict__[found_class]]
+            else:
+                return [found_unit, None]
+
+        key_l = key.lower()
+        for pattern, device_class, unit in detection_map:
+            if re.search(pattern, key_l):
+                return [unit, device_class]
+
+        key_u = key.upper()
+        if key_u in SensorDeviceClass.__dict__:
+            return [None, SensorDeviceClass.__dict__[key_u]]
+
+    return [None, None]
+
+
+def detect_binary_sensor_device_class(detection_map, *args):
+    """Detect the binary sensor device class based on key name."""
+    for key in args:
+        if key is None:
+            continue
+        key_l = key.lower()
+        key_u = key.upper()
+
+        for pattern, device_class in detection_map:
+            if re.search(pattern, key_l):
+                return device_class
+
+        if key_u in BinarySensorDeviceClass.__dict__:
+            return BinarySensorDeviceClass.__dict__[key_u]
+
+    return None
@@ -1,26 +1,36 @@
 """Binary sensor platform for the ChirpStack HTTP integration."""
 
 import logging
+import time
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.components.binary_sensor import (
     BinarySensorEntity,
     BinarySensorDeviceClass,
 )
+from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 from homeassistant.helpers.restore_state import RestoreEntity
 
+from .coalescer import StateWriteCoalescer
+from .device_metadata import DeviceMetadata
+from .filters import ChangeFilter
 from .const import (
+    ATTR_EVENT_TIME,
+    CHANGE_FILTER_KEY,
+    COALESCER_KEY,
+    DEVICES_KEY,
+    DEVICE_METADATA_KEY,
     DOMAIN,
+    STORE_KEY,
     PENDING_BINARY_SENSORS_KEY,
     ADD_BINARY_SENSOR_ENTITIES_FUNC_KEY,
-    CS_DEVICE_NAME_KEY,
-    CS_TENANT_NAME_KEY,
-    CS_TENANT_NAME_DEFAULT,
-    CS_DEVICE_PROFILE_NAME_KEY,
-    CS_DEVICE_PROFILE_NAME_DEFAULT,
+    RECORD_DEVICE_CLASS_KEY,
+    RECORD_NAME_KEY,
+    RECORD_PLATFORM_KEY,
+    RECORD_STATE_KEY,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -32,20 +42,62 @@ async def async_setup_entry(
     async_add_entities: AddConfigEntryEntitiesCallback,
 ):
     """Set up the binary sensor platform."""
+    start = time.perf_counter()
     entry_id = entry.entry_id
     _LOGGER.debug(f"Setting up ChirpStack binary sensor platform for entry {entry_id}")
+    hass_data: dict = hass.data[DOMAIN][entry_id]
 
     # Store the add_entities function
-    hass.data[DOMAIN][entry_id][
-        ADD_BINARY_SENSOR_ENTITIES_FUNC_KEY
-    ] = async_add_entities
-
-    # Add any pending sensors
-    pending_sensors = hass.data[DOMAIN][entry_id].get(PENDING_BINARY_SENSORS_KEY, [])
-    if pending_sensors:
-        _LOGGER.debug(f"Adding {len(pending_sensors)} pending binary sensors")
-        async_add_entities(pending_sensors)
-        hass.data[DOMAIN][entry_id][PENDING_BINARY_SENSORS_KEY] = []
+    hass_data[ADD_BINARY_SENSOR_ENTITIES_FUNC_KEY] = async_add_entities
+
+    # Rebuild all known binary sensors and add them with any pending ones in one go
+    pending_sensors = hass_data.get(PENDING_BINARY_SENSORS_KEY, [])
+    hass_data[PENDING_BINARY_SENSORS_KEY] = []
+    restored_sensors = restore_binary_sensors(hass_data)
+    if pending_sensors or restored_sensors:
+        async_add_entities([*pending_sensors, *restored_sensors])
+
+    _LOGGER.info(
+        f"Binary sensor platform ready in "
+        f"{(time.perf_counter() - start) * 1000:.1f} ms: "
+        f"{len(restored_sensors)} restored, {len(pending_sensors)} pending"
+    )
+
+
+def restore_binary_sensors(hass_data: dict) -> list["ChirpstackBinarySensor"]:
+    """Rebuild the binary sensors of all persisted devices with their last values."""
+    devices: dict = hass_data[DEVICES_KEY]
+    devices_metadata: dict[str, DeviceMetadata] = hass_data[DEVICE_METADATA_KEY]
+    restored: list[ChirpstackBinarySensor] = []
+    for device_id, device_info, key, record in hass_data[STORE_KEY].iter_records(
+        Platform.BINARY_SENSOR
+    ):
+        # An uplink may have created the entity before the platform was set up
+        if key in devices.get(device_id, {}):
+            continue
+
+        try:
+            device_class = BinarySensorDeviceClass(record.get(RECORD_DEVICE_CLASS_KEY))
+        except ValueError:
+            device_class = None
+
+        device = devices_metadata.get(device_id)
+        if device is None:
+            device = DeviceMetadata(device_id, device_info)
+            devices_metadata[device_id] = device
+
+        entity = ChirpstackBinarySensor(
+            device,
+            f"{device_id}_{key}",
+            record.get(RECORD_NAME_KEY),
+            device_class,
+            hass_data[COALESCER_KEY],
+            hass_data[CHANGE_FILTER_KEY],
+        )
+        entity.set_initial_state(record.get(RECORD_STATE_KEY))
+        devices.setdefault(device_id, {})[key] = entity
+        restored.append(entity)
+    return restored
 
 
 class ChirpstackBinarySensor(BinarySensorEntity, RestoreEntity):
@@ -53,35 +105,37 @@ class ChirpstackBinarySensor(BinarySensorEntity, RestoreEntity):
 
     def __init__(
         self,
-        device_id: str,
+        device: DeviceMetadata,
         unique_id: str,
         name: str,
         device_class: BinarySensorDeviceClass,
-        device_info: dict[str, str],
+        coalescer: StateWriteCoalescer | None = None,
+        change_filter: ChangeFilter | None = None,
     ):
         """Initialize the binary sensor."""
-        self._device_id = device_id
-
-        # common entity properties
+        self._device = device
+        self._coalescer = coalescer
+        self._change_filter = change_filter
+        self._last_write: float | None = None
+        self._event_time: str | None = None
+
+        # common entity properties, states are pushed by the webhook
+        self._attr_should_poll = False
         self._attr_unique_id = unique_id
         self._attr_name = name
         self._attr_device_class = device_class
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, device_id)},
-            name=device_info.get(CS_DEVICE_NAME_KEY, f"Device {device_id}"),
-            manufacturer=device_info.get(CS_TENANT_NAME_KEY, CS_TENANT_NAME_DEFAULT),
-            model=device_info.get(
-                CS_DEVICE_PROFILE_NAME_KEY, CS_DEVICE_PROFILE_NAME_DEFAULT
-            ),
-        )
 
-        _LOGGER.debug(f"Created binary sensor: {name}")
+        _LOGGER.debug("Created binary sensor: %s", name)
 
     # https://developers.home-assistant.io/docs/core/entity/#async_added_to_hass
     async def async_added_to_hass(self):
         """Handle entity which will be added."""
         await super().async_added_to_hass()
 
+        # Entities rebuilt from the device store already have their last state
+        if self._attr_is_on is not None:
+            return
+
         # Restore the last known state
         last_state = await self.async_get_last_state()
         if last_state is not None:
@@ -91,15 +145,90 @@ class ChirpstackBinarySensor(BinarySensorEntity, RestoreEntity):
         else:
             _LOGGER.debug(f"No previous state found for {self.name}")
 
-    def set_initial_state(self, state: bool):
+    def set_initial_state(self, state: bool, event_time: str | None = None):
         """Set the state without triggering a state update"""
-        _LOGGER.debug(f"Setting initial state for {self.name}: {state}")
+        _LOGGER.debug("Setting initial state for %s: %s", self._attr_name, state)
 
         self._attr_is_on = state  # binary sensor entity property
+        self.set_event_time(event_time)
+        self._last_write = time.monotonic()
 
-    def update_state(self, state: bool):
-        """Update the binary sensor state."""
-        _LOGGER.debug(f"Updating binary sensor '{self.name}' with state: {state}")
+    def update_state(self, state: bool, event_time: str | None = None):
+        """Update the binary sensor state, event_time is set for replayed events."""
+        _LOGGER.debug(
+            "Updating binary sensor '%s' with state: %s", self._attr_name, state
+        )
+
+        if not self.should_write(state):
+            return
 
         self._attr_is_on = state  # binary sensor entity property
-        self.async_write_ha_state()
+        self.set_event_time(event_time)
+        self.write_state()
+
+    def should_write(self, state) -> bool:
+        """Check the change filter, skipping unchanged or insignificant states."""
+        if self._change_filter is None:
+            return True
+        if not self._change_filter.should_write(
+            self._attr_device_class, self._attr_is_on, self._last_write, state
+        ):
+            return False
+        # Force heartbeat writes of an unchanged state, so last_updated moves
+        self._attr_force_update = (
+            type(state) is type(self._attr_is_on) and state == self._attr_is_on
+        )
+        self._last_write = time.monotonic()
+        return True
+
+    @property
+    def last_write(self) -> float | None:
+        """Return the monotonic time the state was last written."""
+        return self._last_write
+
+    @property
+    def device_id(self) -> str:
+        """Return the devEui of the device this entity belongs to."""
+        return self._device.device_id
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info, kept up to date by the device metadata."""
+        return self._device.device_info
+
+    def to_record(self) -> dict:
+        """Return the plain data needed to persist and rebuild this entity."""
+        return {
+            RECORD_PLATFORM_KEY: Platform.BINARY_SENSOR,
+            RECORD_NAME_KEY: self._attr_name,
+            RECORD_DEVICE_CLASS_KEY: self._attr_device_class,
+            RECORD_STATE_KEY: self._attr_is_on,
+        }
+
+    def set_event_time(self, event_time: str | None):
+        """Attach the time of the replayed event the state originates from."""
+        if event_time == self._event_time:
+            return
+        self._event_time = event_time
+        self._attr_extra_state_attributes = (
+            {ATTR_EVENT_TIME: event_time} if event_time is not None else {}
+        )
+
+    def rename_device(self, old_name: str, new_name: str):
+        """Follow a rename of the device, the name starts with the device's."""
+        if not self._attr_name.startswith(old_name):
+            return
+        self._attr_name = f"{new_name}{self._attr_name[len(old_name):]}"
+        self.write_state()
+
+    def set_available(self, available: bool):
+        """Mark the entity (un)available, e.g. when its device falls silent."""
+        self._attr_available = available
+        self.write_state()
+
+    def write_state(self):
+        """Write the state now or hand it to the write coalescer."""
+        if self._coalescer is not None:
+            self._coalescer.mark_dirty(self)
+        else:
+            self.async_write_ha_state()
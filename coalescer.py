@@ -0,0 +1,103 @@
+"""Coalesced state writes for the ChirpStack HTTP integration."""
+
+import logging
+import time
+from collections.abc import Callable
+from datetime import timedelta
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_call_later
+
+from .metrics import STAGE_STATE_WRITE, PipelineMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StateWriteCoalescer:
+    """Collect dirty entities and write their state in one scheduled callback.
+
+    Every entity updated by an uplink (and by uplinks arriving within the
+    window) is written once when the window closes, no matter how often its
+    state changed in between.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        window: timedelta,
+        on_flush: Callable[[list[Entity]], None] | None = None,
+        metrics: PipelineMetrics | None = None,
+    ):
+        self.hass = hass
+        self.window = window
+        # called with the entities whose state was written
+        self._on_flush = on_flush
+        self._metrics = metrics
+        self._dirty: dict[Entity, None] = {}
+        self._cancel_flush: CALLBACK_TYPE | None = None
+
+        # metrics
+        self.writes_requested = 0
+        self.writes_flushed = 0
+        self.flushes = 0
+
+    @callback
+    def mark_dirty(self, entity: Entity):
+        """Queue a state write for an entity."""
+        self.writes_requested += 1
+        self._dirty[entity] = None
+        if self._cancel_flush is None:
+            self._cancel_flush = async_call_later(
+                self.hass, self.window, self._async_scheduled_flush
+            )
+
+    @callback
+    def _async_scheduled_flush(self, _now=None):
+        self._cancel_flush = None
+        self.async_flush()
+
+    @callback
+    def async_flush(self):
+        """Write the state of all dirty entities now."""
+        if self._cancel_flush is not None:
+            self._cancel_flush()
+            self._cancel_flush = None
+
+        dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return
+
+        self.flushes += 1
+        start = time.perf_counter()
+        written = []
+        for entity in dirty:
+            # Entities not yet added write their state when they are added
+            if entity.hass is None:
+                continue
+            entity.async_write_ha_state()
+            written.append(entity)
+        self.writes_flushed += len(written)
+        if self._metrics is not None:
+            self._metrics.observe(STAGE_STATE_WRITE, time.perf_counter() - start)
+
+        if self._on_flush is not None:
+            self._on_flush(written)
+
+        _LOGGER.debug("Flushed %d coalesced state writes", len(written))
+
+    @property
+    def writes_saved(self) -> int:
+        """Number of state writes avoided by coalescing."""
+        return self.writes_requested - self.writes_flushed - len(self._dirty)
+
+    def stats(self) -> dict[str, int | float]:
+        """Return coalescer counters."""
+        return {
+            "window_ms": self.window.total_seconds() * 1000,
+            "pending": len(self._dirty),
+            "writes_requested": self.writes_requested,
+            "writes_flushed": self.writes_flushed,
+            "writes_saved": self.writes_saved,
+            "flushes": self.flushes,
+        }
@@ -1,7 +1,17 @@
 from typing import Any
 import voluptuous as vol
 
-from homeassistant.config_entries import ConfigFlow, ConfigFlowResult
+from homeassistant.config_entries import (
+    ConfigEntry,
+    ConfigFlow,
+    ConfigFlowResult,
+    OptionsFlow,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.selector import ObjectSelector
+
+from .downsampler import RATE_LIMITS_SCHEMA
+from .filters import DEADBANDS_SCHEMA
 
 from .const import (
     DOMAIN,
@@ -10,13 +20,74 @@ from .const import (
     API_URL_SUFFIX_DEFAULT,
     API_HEADER_NAME_KEY,
     API_HEADER_VALUE_KEY,
+    PAYLOAD_ENCODING_KEY,
+    PAYLOAD_ENCODING_AUTO,
+    PAYLOAD_ENCODING_JSON,
+    PAYLOAD_ENCODING_PROTOBUF,
+    STATE_WRITE_WINDOW_KEY,
+    STATE_WRITE_WINDOW_DEFAULT,
+    MAX_BODY_SIZE_KEY,
+    MAX_BODY_SIZE_DEFAULT,
+    REGISTRATION_WINDOW_KEY,
+    REGISTRATION_WINDOW_DEFAULT,
+    HEARTBEAT_INTERVAL_KEY,
+    HEARTBEAT_INTERVAL_DEFAULT,
+    DEADBANDS_KEY,
+    DEADBANDS_DEFAULT,
+    QUEUE_ENABLED_KEY,
+    QUEUE_SIZE_KEY,
+    QUEUE_SIZE_DEFAULT,
+    QUEUE_OVERFLOW_KEY,
+    QUEUE_OVERFLOW_POLICIES,
+    QUEUE_OVERFLOW_REJECT,
+    DEDUP_ENABLED_KEY,
+    DEDUP_WINDOW_KEY,
+    DEDUP_WINDOW_DEFAULT,
+    DEDUP_MAX_DEVICES_KEY,
+    DEDUP_MAX_DEVICES_DEFAULT,
+    DEDUP_USE_DEDUPLICATION_ID_KEY,
+    LINK_QUALITY_ENABLED_KEY,
+    LINK_QUALITY_WINDOW_KEY,
+    LINK_QUALITY_WINDOW_DEFAULT,
+    DIAGNOSTIC_SENSORS_KEY,
+    SCHEMAS_KEY,
+    DECODERS_KEY,
+    RATE_LIMITS_KEY,
+    AVAILABILITY_FACTOR_KEY,
+    AVAILABILITY_FACTOR_DEFAULT,
+    AVAILABILITY_MIN_TIMEOUT_KEY,
+    AVAILABILITY_MIN_TIMEOUT_DEFAULT,
+    MAX_DEVICES_KEY,
+    MAX_DEVICES_DEFAULT,
+    MAX_KEYS_PER_DEVICE_KEY,
+    MAX_KEYS_PER_DEVICE_DEFAULT,
+    MAX_FLATTEN_DEPTH_KEY,
+    MAX_FLATTEN_DEPTH_DEFAULT,
+    DEVICE_IDLE_TTL_KEY,
+    DEVICE_IDLE_TTL_DEFAULT,
 )
 
 
+def url_suffix_in_use(
+    hass: HomeAssistant, url_suffix: str, entry_id: str | None = None
+) -> bool:
+    """Check if another config entry already uses the URL suffix."""
+    return any(
+        entry.data.get(API_URL_SUFFIX_KEY) == url_suffix
+        for entry in hass.config_entries.async_entries(DOMAIN)
+        if entry.entry_id != entry_id
+    )
+
+
 # https://developers.home-assistant.io/docs/config_entries_config_flow_handler/
 class ChirpstackHttpConfigFlow(ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        return ChirpstackHttpOptionsFlow()
+
     # default step
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
@@ -28,15 +99,18 @@ class ChirpstackHttpConfigFlow(ConfigFlow, domain=DOMAIN):
             header_name = user_input.get(API_HEADER_NAME_KEY, "")
             header_value = user_input.get(API_HEADER_VALUE_KEY, "")
 
-            # Create entry with user input data
-            return self.async_create_entry(
-                title=f"{API_URL_PREFIX}/{url_suffix}",
-                data={
-                    API_URL_SUFFIX_KEY: url_suffix,
-                    API_HEADER_NAME_KEY: header_name,
-                    API_HEADER_VALUE_KEY: header_value,
-                },
-            )
+            if url_suffix_in_use(self.hass, url_suffix):
+                errors[API_URL_SUFFIX_KEY] = "already_configured"
+            else:
+                # Create entry with user input data
+                return self.async_create_entry(
+                    title=f"{API_URL_PREFIX}/{url_suffix}",
+                    data={
+                        API_URL_SUFFIX_KEY: url_suffix,
+                        API_HEADER_NAME_KEY: header_name,
+                        API_HEADER_VALUE_KEY: header_value,
+                    },
+                )
 
         # Show configuration form
         schema = vol.Schema(
@@ -52,3 +126,193 @@ class ChirpstackHttpConfigFlow(ConfigFlow, domain=DOMAIN):
         )
 
         return self.async_show_form(step_id="user", data_schema=schema, errors=errors)
+
+
+# https://developers.home-assistant.io/docs/config_entries_options_flow_handler/
+class ChirpstackHttpOptionsFlow(OptionsFlow):
+    """Change the endpoint and the processing options of an entry.
+
+    Saving reloads the entry, so changes apply without a restart.
+    """
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> ConfigFlowResult:
+        errors = {}
+        entry = self.config_entry
+
+        if user_input is not None:
+            url_suffix = user_input.pop(API_URL_SUFFIX_KEY)
+            connection = {
+                API_URL_SUFFIX_KEY: url_suffix,
+                API_HEADER_NAME_KEY: user_input.pop(API_HEADER_NAME_KEY, ""),
+                API_HEADER_VALUE_KEY: user_input.pop(API_HEADER_VALUE_KEY, ""),
+            }
+
+            try:
+                user_input[RATE_LIMITS_KEY] = RATE_LIMITS_SCHEMA(
+                    user_input.get(RATE_LIMITS_KEY, {})
+                )
+            except vol.Invalid:
+                errors[RATE_LIMITS_KEY] = "invalid_rate_limits"
+            try:
+                user_input[DEADBANDS_KEY] = DEADBANDS_SCHEMA(
+                    user_input.get(DEADBANDS_KEY, {})
+                )
+            except vol.Invalid:
+                errors[DEADBANDS_KEY] = "invalid_deadbands"
+
+            if url_suffix_in_use(self.hass, url_suffix, entry.entry_id):
+                errors[API_URL_SUFFIX_KEY] = "already_configured"
+            elif not errors:
+                # Keep options that are not part of the form
+                options = {**entry.options, **user_input}
+                if connection == {k: entry.data.get(k, "") for k in connection}:
+                    return self.async_create_entry(data=options)
+
+                # Update data and options at once, so the entry reloads once
+                self.hass.config_entries.async_update_entry(
+                    entry,
+                    title=f"{API_URL_PREFIX}/{url_suffix}",
+                    data={**entry.data, **connection},
+                    options=options,
+                )
+                return self.async_abort(reason="reconfigure_successful")
+
+        options = entry.options
+        schema = vol.Schema(
+            {
+                vol.Required(
+                    API_URL_SUFFIX_KEY, default=entry.data[API_URL_SUFFIX_KEY]
+                ): str,
+                vol.Optional(
+                    API_HEADER_NAME_KEY,
+                    default=entry.data.get(API_HEADER_NAME_KEY, ""),
+                ): str,
+                vol.Optional(
+                    API_HEADER_VALUE_KEY,
+                    default=entry.data.get(API_HEADER_VALUE_KEY, ""),
+                ): str,
+                vol.Required(
+                    PAYLOAD_ENCODING_KEY,
+                    default=options.get(PAYLOAD_ENCODING_KEY, PAYLOAD_ENCODING_AUTO),
+                ): vol.In(
+                    [
+                        PAYLOAD_ENCODING_AUTO,
+                        PAYLOAD_ENCODING_JSON,
+                        PAYLOAD_ENCODING_PROTOBUF,
+                    ]
+                ),
+                vol.Required(
+                    MAX_BODY_SIZE_KEY,
+                    default=options.get(MAX_BODY_SIZE_KEY, MAX_BODY_SIZE_DEFAULT),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Required(
+                    STATE_WRITE_WINDOW_KEY,
+                    default=options.get(
+                        STATE_WRITE_WINDOW_KEY, STATE_WRITE_WINDOW_DEFAULT
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=10000)),
+                vol.Required(
+                    REGISTRATION_WINDOW_KEY,
+                    default=options.get(
+                        REGISTRATION_WINDOW_KEY, REGISTRATION_WINDOW_DEFAULT
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=10000)),
+                vol.Required(
+                    HEARTBEAT_INTERVAL_KEY,
+                    default=options.get(
+                        HEARTBEAT_INTERVAL_KEY, HEARTBEAT_INTERVAL_DEFAULT
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Optional(
+                    DEADBANDS_KEY,
+                    default=options.get(DEADBANDS_KEY, DEADBANDS_DEFAULT),
+                ): ObjectSelector(),
+                vol.Required(
+                    DEDUP_ENABLED_KEY, default=options.get(DEDUP_ENABLED_KEY, True)
+                ): bool,
+                vol.Required(
+                    DEDUP_WINDOW_KEY,
+                    default=options.get(DEDUP_WINDOW_KEY, DEDUP_WINDOW_DEFAULT),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Required(
+                    DEDUP_MAX_DEVICES_KEY,
+                    default=options.get(
+                        DEDUP_MAX_DEVICES_KEY, DEDUP_MAX_DEVICES_DEFAULT
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Required(
+                    DEDUP_USE_DEDUPLICATION_ID_KEY,
+                    default=options.get(DEDUP_USE_DEDUPLICATION_ID_KEY, False),
+                ): bool,
+                vol.Required(
+                    QUEUE_ENABLED_KEY, default=options.get(QUEUE_ENABLED_KEY, False)
+                ): bool,
+                vol.Required(
+                    QUEUE_SIZE_KEY,
+                    default=options.get(QUEUE_SIZE_KEY, QUEUE_SIZE_DEFAULT),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Required(
+                    QUEUE_OVERFLOW_KEY,
+                    default=options.get(QUEUE_OVERFLOW_KEY, QUEUE_OVERFLOW_REJECT),
+                ): vol.In(QUEUE_OVERFLOW_POLICIES),
+                vol.Required(
+                    LINK_QUALITY_ENABLED_KEY,
+                    default=options.get(LINK_QUALITY_ENABLED_KEY, False),
+                ): bool,
+                vol.Required(
+                    LINK_QUALITY_WINDOW_KEY,
+                    default=options.get(
+                        LINK_QUALITY_WINDOW_KEY, LINK_QUALITY_WINDOW_DEFAULT
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Required(
+                    DIAGNOSTIC_SENSORS_KEY,
+                    default=options.get(DIAGNOSTIC_SENSORS_KEY, False),
+                ): bool,
+                vol.Required(
+                    AVAILABILITY_FACTOR_KEY,
+                    default=options.get(
+                        AVAILABILITY_FACTOR_KEY, AVAILABILITY_FACTOR_DEFAULT
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Required(
+                    AVAILABILITY_MIN_TIMEOUT_KEY,
+                    default=options.get(
+                        AVAILABILITY_MIN_TIMEOUT_KEY, AVAILABILITY_MIN_TIMEOUT_DEFAULT
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Required(
+                    MAX_DEVICES_KEY,
+                    default=options.get(MAX_DEVICES_KEY, MAX_DEVICES_DEFAULT),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Required(
+                    MAX_KEYS_PER_DEVICE_KEY,
+                    default=options.get(
+                        MAX_KEYS_PER_DEVICE_KEY, MAX_KEYS_PER_DEVICE_DEFAULT
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Required(
+                    MAX_FLATTEN_DEPTH_KEY,
+                    default=options.get(
+                        MAX_FLATTEN_DEPTH_KEY, MAX_FLATTEN_DEPTH_DEFAULT
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Required(
+                    DEVICE_IDLE_TTL_KEY,
+                    default=options.get(DEVICE_IDLE_TTL_KEY, DEVICE_IDLE_TTL_DEFAULT),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(
+                    SCHEMAS_KEY, default=options.get(SCHEMAS_KEY, {})
+                ): ObjectSelector(),
+                vol.Optional(
+                    DECODERS_KEY, default=options.get(DECODERS_KEY, {})
+                ): ObjectSelector(),
+                vol.Optional(
+                    RATE_LIMITS_KEY, default=options.get(RATE_LIMITS_KEY, {})
+                ): ObjectSelector(),
+            }
+        )
+
+        return self.async_show_form(step_id="init", data_schema=schema, errors=errors)
@@ -1,11 +1,43 @@
 DOMAIN = "chirpstack_http"
 
 STORE_KEY = "store"
-STORAGE_KEY = f"{DOMAIN}.device_states"
+ROUTER_KEY = "router"
+STORAGE_KEY = f"{DOMAIN}.devices"
+# Single store of all entries written by earlier versions, removed on setup
+LEGACY_STORAGE_KEY = f"{DOMAIN}.device_states"
+LEGACY_STORE_REMOVED_KEY = "legacy_store_removed"
+
+RECORD_PLATFORM_KEY = "platform"
+RECORD_NAME_KEY = "name"
+RECORD_DEVICE_CLASS_KEY = "device_class"
+RECORD_UNIT_KEY = "unit"
+RECORD_STATE_CLASS_KEY = "state_class"
+RECORD_STATE_KEY = "state"
 
 SENSORS_KEY = "sensors"
 BINARY_SENSORS_KEY = "binary_sensors"
 DEVICES_KEY = "devices"
+DEVICE_METADATA_KEY = "device_metadata"
+INGEST_PLANS_KEY = "ingest_plans"
+COALESCER_KEY = "coalescer"
+CHANGE_FILTER_KEY = "change_filter"
+INGEST_QUEUE_KEY = "ingest_queue"
+DEDUP_KEY = "dedup"
+METRICS_KEY = "metrics"
+LINK_QUALITY_KEY = "link_quality"
+DOWNSAMPLER_KEY = "downsampler"
+SCHEMA_TABLE_KEY = "schema_table"
+SERIES_IMPORTER_KEY = "series_importer"
+AVAILABILITY_KEY = "availability"
+LIMITS_KEY = "limits"
+PAYLOAD_DECODERS_KEY = "payload_decoders"
+REGISTRAR_KEY = "registrar"
+IDLE_EVICTOR_KEY = "idle_evictor"
+YAML_SCHEMAS_KEY = "yaml_schemas"
+YAML_DECODERS_KEY = "yaml_decoders"
+YAML_RATE_LIMITS_KEY = "yaml_rate_limits"
+
+ATTR_EVENT_TIME = "event_time"
 PENDING_SENSORS_KEY = "pending_sensors"
 PENDING_BINARY_SENSORS_KEY = "pending_binary_sensors"
 
@@ -22,11 +54,140 @@ CS_TENANT_NAME_KEY = "tenantName"
 CS_DEVICE_INFO_KEY = "deviceInfo"
 CS_DEVICE_EUI_KEY = "devEui"
 CS_OBJECT_KEY = "object"
+CS_DATA_KEY = "data"
 CS_RX_INFO_KEY = "rxInfo"
+CS_TX_INFO_KEY = "txInfo"
+CS_RSSI_KEY = "rssi"
+CS_SNR_KEY = "snr"
+CS_MODULATION_KEY = "modulation"
+CS_MODULATION_LORA_KEY = "lora"
+CS_SPREADING_FACTOR_KEY = "spreadingFactor"
 CS_TYPE_REF_KEY = "type_ref"
+CS_TIME_KEY = "time"
+CS_F_CNT_KEY = "fCnt"
+CS_DEDUPLICATION_ID_KEY = "deduplicationId"
+CS_MARGIN_KEY = "margin"
+CS_EXTERNAL_POWER_SOURCE_KEY = "externalPowerSource"
+CS_BATTERY_LEVEL_UNAVAILABLE_KEY = "batteryLevelUnavailable"
+CS_BATTERY_LEVEL_KEY = "batteryLevel"
+
+CS_EVENT_QUERY_KEY = "event"
+CS_EVENT_UP = "up"
+CS_EVENT_STATUS = "status"
+CS_EVENT_JOIN = "join"
+
+CS_STATUS_MARGIN_KEY = "margin"
+CS_STATUS_BATTERY_LEVEL_KEY = "battery_level"
 
 API_HEADER_NAME_KEY = "header_name"
 API_HEADER_VALUE_KEY = "header_value"
 API_URL_PREFIX = "/api/chirpstack_http"
 API_URL_SUFFIX_DEFAULT = "chirpstack"
 API_URL_SUFFIX_KEY = "url_suffix"
+API_BATCH_URL_SUFFIX = "/batch"
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl")
+
+PAYLOAD_ENCODING_KEY = "payload_encoding"
+PAYLOAD_ENCODING_AUTO = "auto"
+PAYLOAD_ENCODING_JSON = "json"
+PAYLOAD_ENCODING_PROTOBUF = "protobuf"
+PROTOBUF_CONTENT_TYPES = (
+    "application/octet-stream",
+    "application/protobuf",
+    "application/x-protobuf",
+)
+
+STATE_WRITE_WINDOW_KEY = "state_write_window_ms"
+STATE_WRITE_WINDOW_DEFAULT = 100
+
+# Largest accepted event body in kB, 0 disables the limit
+MAX_BODY_SIZE_KEY = "max_body_size_kb"
+MAX_BODY_SIZE_DEFAULT = 64
+# A JSON array batch may be this many times the size of one event
+MAX_BATCH_BODY_SIZE_FACTOR = 100
+
+# Window in which new entities are collected and registered together
+REGISTRATION_WINDOW_KEY = "registration_window_ms"
+REGISTRATION_WINDOW_DEFAULT = 250
+
+DEADBANDS_KEY = "deadbands"
+DEADBANDS_DEFAULT = {"temperature": 0.1, "humidity": 1.0}
+HEARTBEAT_INTERVAL_KEY = "heartbeat_minutes"
+HEARTBEAT_INTERVAL_DEFAULT = 30
+
+QUEUE_ENABLED_KEY = "queue_enabled"
+QUEUE_SIZE_KEY = "queue_size"
+QUEUE_SIZE_DEFAULT = 1000
+QUEUE_OVERFLOW_KEY = "queue_overflow"
+QUEUE_OVERFLOW_DROP_OLDEST = "drop_oldest"
+QUEUE_OVERFLOW_DROP_NEWEST = "drop_newest"
+QUEUE_OVERFLOW_REJECT = "reject"
+QUEUE_OVERFLOW_POLICIES = (
+    QUEUE_OVERFLOW_REJECT,
+    QUEUE_OVERFLOW_DROP_OLDEST,
+    QUEUE_OVERFLOW_DROP_NEWEST,
+)
+
+DEDUP_ENABLED_KEY = "dedup_enabled"
+DEDUP_WINDOW_KEY = "dedup_window"
+DEDUP_WINDOW_DEFAULT = 16
+DEDUP_MAX_DEVICES_KEY = "dedup_max_devices"
+DEDUP_MAX_DEVICES_DEFAULT = 10000
+DEDUP_USE_DEDUPLICATION_ID_KEY = "dedup_use_deduplication_id"
+
+DIAGNOSTIC_SENSORS_KEY = "diagnostic_sensors"
+
+LINK_QUALITY_ENABLED_KEY = "link_quality_enabled"
+LINK_QUALITY_WINDOW_KEY = "link_quality_window"
+LINK_QUALITY_WINDOW_DEFAULT = 32
+
+# Silent devices are unavailable after factor x their learned uplink interval
+AVAILABILITY_FACTOR_KEY = "availability_factor"
+AVAILABILITY_FACTOR_DEFAULT = 3.0
+AVAILABILITY_MIN_TIMEOUT_KEY = "availability_min_timeout"
+AVAILABILITY_MIN_TIMEOUT_DEFAULT = 300
+
+# Limits against codecs that create a new key per uplink, 0 disables a limit
+MAX_DEVICES_KEY = "max_devices"
+MAX_DEVICES_DEFAULT = 5000
+MAX_KEYS_PER_DEVICE_KEY = "max_keys_per_device"
+MAX_KEYS_PER_DEVICE_DEFAULT = 200
+MAX_FLATTEN_DEPTH_KEY = "max_flatten_depth"
+MAX_FLATTEN_DEPTH_DEFAULT = 5
+# Evict devices without a state write for this long, keep it well above the
+# heartbeat interval, 0 disables eviction
+DEVICE_IDLE_TTL_KEY = "device_idle_ttl_days"
+DEVICE_IDLE_TTL_DEFAULT = 0
+
+# {"<devEui or device profile name>": {"interval": seconds, "mode": "mean"}}
+RATE_LIMITS_KEY = "rate_limits"
+RATE_LIMIT_INTERVAL_KEY = "interval"
+RATE_LIMIT_MODE_KEY = "mode"
+DOWNSAMPLE_MODE_LAST = "last"
+DOWNSAMPLE_MODE_MEAN = "mean"
+DOWNSAMPLE_MODE_MIN = "min"
+DOWNSAMPLE_MODE_MAX = "max"
+DOWNSAMPLE_MODES = (
+    DOWNSAMPLE_MODE_LAST,
+    DOWNSAMPLE_MODE_MEAN,
+    DOWNSAMPLE_MODE_MIN,
+    DOWNSAMPLE_MODE_MAX,
+)
+
+# {"<device profile name>": {"<key>": {"device_class": "temperature",
+#   "unit": "°C", "state_class": "measurement", "scale": 0.1, "ignore": false,
+#   "sample_interval": seconds between the samples of an array}}}
+SCHEMAS_KEY = "schemas"
+SCHEMA_DEVICE_CLASS_KEY = "device_class"
+SCHEMA_UNIT_KEY = "unit"
+SCHEMA_STATE_CLASS_KEY = "state_class"
+SCHEMA_SCALE_KEY = "scale"
+SCHEMA_IGNORE_KEY = "ignore"
+SCHEMA_SAMPLE_INTERVAL_KEY = "sample_interval"
+
+# {"<device profile name>": "cayenne_lpp" or {"format": ">hHB",
+#   "fields": ["temperature", "humidity", null]}}
+DECODERS_KEY = "decoders"
+DECODER_CAYENNE_LPP = "cayenne_lpp"
+DECODER_FORMAT_KEY = "format"
+DECODER_FIELDS_KEY = "fields"
@@ -0,0 +1,174 @@
+"""Binary payload decoders for the ChirpStack HTTP integration.
+
+Uplinks that ChirpStack did not decode with a codec carry no `object`, only
+the raw payload as base64 in `data`. For the device profiles with a decoder
+in the `decoders` option or in configuration.yaml, the payload is decoded
+here instead, and the result takes the place of `object`:
+
+    chirpstack_http:
+      decoders:
+        "Cayenne Device": cayenne_lpp
+        "Soil Sensor":
+          format: ">hHB"
+          fields: [temperature, humidity, battery]
+
+A template is a struct format string with one field name per unpacked
+value, null skips a value. Scales and units are set with the schema of the
+profile, see schema.py. Templates are compiled into a struct.Struct once.
+"""
+
+import base64
+import binascii
+from collections.abc import Callable
+import logging
+import struct
+
+from .const import DECODER_CAYENNE_LPP, DECODER_FIELDS_KEY, DECODER_FORMAT_KEY
+
+_LOGGER = logging.getLogger(__name__)
+
+# Size of the base64 payload from which it is decoded in the executor
+DECODE_EXECUTOR_MIN_SIZE = 4096
+
+# Cayenne LPP data types: name, value layout, divisor per value, and the
+# field names of types with more than one value
+_LPP_TYPES: dict[int, tuple[str, struct.Struct, tuple, tuple | None]] = {
+    lpp_type: (name, struct.Struct(fmt), divisors, fields)
+    for lpp_type, name, fmt, divisors, fields in (
+        (0, "digital_input", ">B", (1,), None),
+        (1, "digital_output", ">B", (1,), None),
+        (2, "analog_input", ">h", (100,), None),
+        (3, "analog_output", ">h", (100,), None),
+        (100, "generic", ">I", (1,), None),
+        (101, "illuminance", ">H", (1,), None),
+        (102, "presence", ">B", (1,), None),
+        (103, "temperature", ">h", (10,), None),
+        (104, "humidity", ">B", (2,), None),
+        (113, "accelerometer", ">hhh", (1000, 1000, 1000), ("x", "y", "z")),
+        (115, "barometer", ">H", (10,), None),
+        (116, "voltage", ">H", (100,), None),
+        (117, "current", ">H", (1000,), None),
+        (118, "frequency", ">I", (1,), None),
+        (120, "percentage", ">B", (1,), None),
+        (121, "altitude", ">h", (1,), None),
+        (125, "concentration", ">H", (1,), None),
+        (128, "power", ">H", (1,), None),
+        (130, "distance", ">I", (1000,), None),
+        (131, "energy", ">I", (1000,), None),
+        (132, "direction", ">H", (1,), None),
+        (133, "unixtime", ">I", (1,), None),
+        (134, "gyrometer", ">hhh", (100, 100, 100), ("x", "y", "z")),
+        (135, "colour", ">BBB", (1, 1, 1), ("r", "g", "b")),
+        (
+            136,
+            "gps",
+            ">3s3s3s",
+            (10000, 10000, 100),
+            ("latitude", "longitude", "altitude"),
+        ),
+        (142, "switch", ">B", (1,), None),
+    )
+}
+
+
+def _lpp_value(raw: int | bytes, divisor: int) -> int | float:
+    if isinstance(raw, bytes):
+        # 24 bit values of the GPS type
+        raw = int.from_bytes(raw, "big", signed=True)
+    return raw / divisor if divisor != 1 else raw
+
+
+def decode_cayenne_lpp(payload: bytes) -> dict:
+    """Decode a Cayenne LPP payload into `<type>_<channel>` keys."""
+    object_data = {}
+    offset = 0
+    while offset < len(payload):
+        channel, lpp_type = payload[offset], payload[offset + 1]
+        offset += 2
+        entry = _LPP_TYPES.get(lpp_type)
+        if entry is None:
+            raise ValueError(f"Unknown Cayenne LPP type {lpp_type}")
+
+        name, layout, divisors, fields = entry
+        values = [
+            _lpp_value(raw, divisor)
+            for raw, divisor in zip(layout.unpack_from(payload, offset), divisors)
+        ]
+        offset += layout.size
+        object_data[f"{name}_{channel}"] = (
+            values[0] if fields is None else dict(zip(fields, values))
+        )
+    return object_data
+
+
+class StructTemplate:
+    """A struct format with one field name per value, compiled once."""
+
+    __slots__ = ("layout", "fields")
+
+    def __init__(self, fmt: str, fields: list[str | None]):
+        self.layout = struct.Struct(fmt)
+        values = len(self.layout.unpack(bytes(self.layout.size)))
+        if len(fields) != values:
+            raise ValueError(
+                f"{fmt!r} unpacks {values} values, got {len(fields)} fields"
+            )
+        self.fields = tuple(fields)
+
+    def __call__(self, payload: bytes) -> dict:
+        return {
+            field: value
+            for field, value in zip(self.fields, self.layout.unpack_from(payload))
+            if field
+        }
+
+
+def compile_decoder(profile_name: str, spec) -> Callable[[bytes], dict] | None:
+    """Compile the decoder of a device profile, None if it is invalid."""
+    if spec == DECODER_CAYENNE_LPP:
+        return decode_cayenne_lpp
+    try:
+        return StructTemplate(spec[DECODER_FORMAT_KEY], spec[DECODER_FIELDS_KEY])
+    except (KeyError, TypeError, ValueError, struct.error) as e:
+        _LOGGER.warning(f"Invalid decoder for {profile_name}: {spec!r} ({e})")
+        return None
+
+
+class PayloadDecoders:
+    """Compiled payload decoders of all device profiles."""
+
+    def __init__(self, decoders: dict):
+        self._decoders: dict[str, Callable[[bytes], dict]] = {}
+        for profile_name, spec in decoders.items():
+            decoder = compile_decoder(profile_name, spec)
+            if decoder is not None:
+                self._decoders[profile_name] = decoder
+
+        # metrics
+        self.decoded = 0
+        self.failed = 0
+        self.offloaded = 0
+
+    def get(self, profile_name: str) -> Callable[[bytes], dict] | None:
+        """Return the decoder of a device profile, if it has one."""
+        return self._decoders.get(profile_name)
+
+    def decode(self, decoder: Callable[[bytes], dict], data: str) -> dict:
+        """Decode a base64 payload, an empty object if it does not decode."""
+        try:
+            object_data = decoder(base64.b64decode(data))
+        except (binascii.Error, IndexError, ValueError, struct.error) as e:
+            self.failed += 1
+            _LOGGER.debug("Could not decode payload %s: %s", data, e)
+            return {}
+        self.decoded += 1
+        return object_data
+
+    def stats(self) -> dict[str, int]:
+        """Return decoder counters."""
+        return {
+            "profiles": len(self._decoders),
+            "decoded": self.decoded,
+            "failed": self.failed,
+            "offloaded": self.offloaded,
+        }
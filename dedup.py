@@ -0,0 +1,95 @@
+"""Uplink deduplication for the ChirpStack HTTP integration.
+
+ChirpStack retries an event when the webhook times out, and redundant
+integrations deliver the same uplink twice. Each device keeps a small
+fixed-size ring of the frame counters (and optionally deduplication ids)
+it has seen recently; devices that have been idle longest are evicted
+once the global cap is reached.
+"""
+
+from array import array
+from collections import OrderedDict
+
+
+class _DeviceWindow:
+    """Fixed-size, array-backed ring of recently seen uplinks of a device."""
+
+    __slots__ = ("f_cnts", "ids", "position")
+
+    def __init__(self, size: int):
+        # -1 never matches a frame counter, which is an uint32
+        self.f_cnts = array("q", [-1] * size)
+        self.ids = array("q", [0] * size)
+        self.position = 0
+
+    def contains(self, f_cnt: int, id_hash: int | None) -> bool:
+        if f_cnt not in self.f_cnts:
+            return False
+        if id_hash is None:
+            return True
+        return any(
+            seen_f_cnt == f_cnt and seen_id == id_hash
+            for seen_f_cnt, seen_id in zip(self.f_cnts, self.ids)
+        )
+
+    def add(self, f_cnt: int, id_hash: int | None):
+        self.f_cnts[self.position] = f_cnt
+        self.ids[self.position] = id_hash or 0
+        self.position = (self.position + 1) % len(self.f_cnts)
+
+
+class UplinkDeduplicator:
+    """Detect repeated uplinks by devEui and frame counter."""
+
+    def __init__(
+        self, window_size: int, max_devices: int, use_deduplication_id: bool = False
+    ):
+        self.window_size = window_size
+        self.max_devices = max_devices
+        self.use_deduplication_id = use_deduplication_id
+        self._devices: OrderedDict[str, _DeviceWindow] = OrderedDict()
+
+        # metrics
+        self.duplicates_dropped = 0
+        self.evicted_devices = 0
+
+    def is_duplicate(
+        self, dev_eui: str, f_cnt: int | None, deduplication_id: str | None = None
+    ) -> bool:
+        """Return True if the uplink was seen before, else remember it."""
+        if f_cnt is None:
+            return False
+
+        id_hash = None
+        if self.use_deduplication_id and deduplication_id:
+            id_hash = hash(deduplication_id)
+
+        window = self._devices.get(dev_eui)
+        if window is None:
+            window = _DeviceWindow(self.window_size)
+            self._devices[dev_eui] = window
+            if len(self._devices) > self.max_devices:
+                self._devices.popitem(last=False)
+                self.evicted_devices += 1
+        else:
+            self._devices.move_to_end(dev_eui)
+            if window.contains(f_cnt, id_hash):
+                self.duplicates_dropped += 1
+                return True
+
+        window.add(f_cnt, id_hash)
+        return False
+
+    def reset(self, dev_eui: str):
+        """Forget a device's frame counters, e.g. after it (re)joined."""
+        self._devices.pop(dev_eui, None)
+
+    def stats(self) -> dict[str, int]:
+        """Return deduplication counters."""
+        return {
+            "devices": len(self._devices),
+            "max_devices": self.max_devices,
+            "window_size": self.window_size,
+            "duplicates_dropped": self.duplicates_dropped,
+            "evicted_devices": self.evicted_devices,
+        }
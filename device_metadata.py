@@ -0,0 +1,83 @@
+"""Shared per-device metadata for the ChirpStack HTTP integration.
+
+All entities of a device reference the same DeviceMetadata instead of each
+holding its own DeviceInfo, so the name, tenant and profile of a device are
+stored once. The strings are interned, tenant and profile names repeat
+across many devices. The metadata is compared with every event and only
+rebuilt, and pushed to the device registry, when it actually changed.
+"""
+
+import sys
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.entity import DeviceInfo
+
+from .const import (
+    CS_DEVICE_NAME_KEY,
+    CS_DEVICE_PROFILE_NAME_DEFAULT,
+    CS_DEVICE_PROFILE_NAME_KEY,
+    CS_TENANT_NAME_DEFAULT,
+    CS_TENANT_NAME_KEY,
+    DOMAIN,
+)
+
+
+def _name_or(value, default: str) -> str:
+    # missing, null or non-string names fall back, sys.intern only takes str
+    return value if isinstance(value, str) and value else default
+
+
+class DeviceMetadata:
+    """Name, tenant and profile of a device, shared by its entities."""
+
+    __slots__ = ("device_id", "name", "tenant", "profile", "device_info")
+
+    def __init__(self, device_id: str, device_info_raw: dict):
+        self.device_id = sys.intern(device_id)
+        self._set(*self._parse(device_info_raw))
+
+    def _parse(self, device_info_raw: dict) -> tuple[str, str, str]:
+        return (
+            _name_or(
+                device_info_raw.get(CS_DEVICE_NAME_KEY), f"Device {self.device_id}"
+            ),
+            _name_or(device_info_raw.get(CS_TENANT_NAME_KEY), CS_TENANT_NAME_DEFAULT),
+            _name_or(
+                device_info_raw.get(CS_DEVICE_PROFILE_NAME_KEY),
+                CS_DEVICE_PROFILE_NAME_DEFAULT,
+            ),
+        )
+
+    def _set(self, name: str, tenant: str, profile: str):
+        self.name = sys.intern(name)
+        self.tenant = sys.intern(tenant)
+        self.profile = sys.intern(profile)
+        self.device_info = DeviceInfo(
+            identifiers={(DOMAIN, self.device_id)},
+            name=self.name,
+            manufacturer=self.tenant,
+            model=self.profile,
+        )
+
+    def update(self, device_info_raw: dict) -> bool:
+        """Apply the deviceInfo of an event, returning True if it changed."""
+        parsed = self._parse(device_info_raw)
+        if parsed == (self.name, self.tenant, self.profile):
+            return False
+        self._set(*parsed)
+        return True
+
+
+@callback
+def async_update_device_registry(hass: HomeAssistant, metadata: DeviceMetadata):
+    """Push changed metadata to the device registry entry of the device."""
+    registry = dr.async_get(hass)
+    device = registry.async_get_device(identifiers={(DOMAIN, metadata.device_id)})
+    if device is not None:
+        registry.async_update_device(
+            device.id,
+            name=metadata.name,
+            manufacturer=metadata.tenant,
+            model=metadata.profile,
+        )
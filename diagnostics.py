@@ -0,0 +1,72 @@
+"""Diagnostics support for the ChirpStack HTTP integration."""
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    API_HEADER_VALUE_KEY,
+    AVAILABILITY_KEY,
+    CHANGE_FILTER_KEY,
+    COALESCER_KEY,
+    DEDUP_KEY,
+    DEVICES_KEY,
+    DOMAIN,
+    DOWNSAMPLER_KEY,
+    INGEST_PLANS_KEY,
+    INGEST_QUEUE_KEY,
+    LIMITS_KEY,
+    LINK_QUALITY_KEY,
+    METRICS_KEY,
+    PAYLOAD_DECODERS_KEY,
+    REGISTRAR_KEY,
+    ROUTER_KEY,
+    SCHEMA_TABLE_KEY,
+    SERIES_IMPORTER_KEY,
+    STORE_KEY,
+)
+from .helpers import classification_cache_stats
+
+TO_REDACT = {API_HEADER_VALUE_KEY}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    hass_data: dict = hass.data[DOMAIN][entry.entry_id]
+
+    optional = {}
+    for name, key in (
+        ("dedup", DEDUP_KEY),
+        ("ingest_queue", INGEST_QUEUE_KEY),
+        ("link_quality", LINK_QUALITY_KEY),
+        ("downsampling", DOWNSAMPLER_KEY),
+        ("series_import", SERIES_IMPORTER_KEY),
+        ("availability", AVAILABILITY_KEY),
+        ("limits", LIMITS_KEY),
+        ("decoders", PAYLOAD_DECODERS_KEY),
+    ):
+        if hass_data.get(key) is not None:
+            optional[name] = hass_data[key].stats()
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "devices": len(hass_data[DEVICES_KEY]),
+        "entities": sum(len(keys) for keys in hass_data[DEVICES_KEY].values()),
+        "routing": hass.data[DOMAIN][ROUTER_KEY].stats(),
+        "pipeline": hass_data[METRICS_KEY].as_dict(),
+        "classification_cache": classification_cache_stats(),
+        "ingest_plans": hass_data[INGEST_PLANS_KEY].stats(),
+        "schemas": hass_data[SCHEMA_TABLE_KEY].stats(),
+        "state_writes": hass_data[COALESCER_KEY].stats(),
+        "registration": hass_data[REGISTRAR_KEY].stats(),
+        "change_filter": hass_data[CHANGE_FILTER_KEY].stats(),
+        "store": hass_data[STORE_KEY].stats(),
+        **optional,
+    }
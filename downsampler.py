@@ -0,0 +1,216 @@
+"""Per-entity rate limiting and downsampling for the ChirpStack HTTP integration.
+
+Devices that uplink every few seconds would write (and record) every value.
+A rate limit configured per devEui or device profile gives their sensors a
+minimum write interval: the first value after a quiet interval is written
+right away, values arriving faster are aggregated and written once the
+interval has passed. All pending aggregates share a single timer.
+"""
+
+import heapq
+import itertools
+import logging
+import time
+
+import voluptuous as vol
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    DOWNSAMPLE_MODE_LAST,
+    DOWNSAMPLE_MODE_MEAN,
+    DOWNSAMPLE_MODE_MIN,
+    DOWNSAMPLE_MODES,
+    RATE_LIMIT_INTERVAL_KEY,
+    RATE_LIMIT_MODE_KEY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# {"<devEui or device profile name>": {"interval": seconds, "mode": "mean"}}
+RATE_LIMIT_SCHEMA = vol.Schema(
+    {
+        vol.Required(RATE_LIMIT_INTERVAL_KEY): vol.All(
+            vol.Coerce(float), vol.Range(min=0, min_included=False)
+        ),
+        vol.Optional(RATE_LIMIT_MODE_KEY, default=DOWNSAMPLE_MODE_LAST): vol.In(
+            DOWNSAMPLE_MODES
+        ),
+    }
+)
+RATE_LIMITS_SCHEMA = vol.Schema({str: RATE_LIMIT_SCHEMA})
+
+
+class RateLimit:
+    """Minimum write interval and aggregation mode of a device or profile."""
+
+    __slots__ = ("interval", "mode")
+
+    def __init__(self, interval: float, mode: str = DOWNSAMPLE_MODE_LAST):
+        self.interval = interval
+        self.mode = mode
+
+
+class _Bucket:
+    """Incremental aggregate of the values deferred within one interval."""
+
+    __slots__ = ("count", "sum", "min", "max", "last", "event_time")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+        self.event_time = None
+
+    def add(self, value, event_time: str | None = None):
+        self.last = value
+        self.event_time = event_time
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def value(self, mode: str):
+        """Return the aggregate, falling back to the last value if not numeric."""
+        if not self.count or mode == DOWNSAMPLE_MODE_LAST:
+            return self.last
+        if mode == DOWNSAMPLE_MODE_MEAN:
+            return round(self.sum / self.count, 3)
+        if mode == DOWNSAMPLE_MODE_MIN:
+            return self.min
+        return self.max
+
+
+def parse_rate_limits(options: dict) -> dict[str, RateLimit]:
+    """Build the rate limits from the options, keyed by devEui or profile name."""
+    rate_limits = {}
+    for target, config in options.items():
+        try:
+            config = RATE_LIMIT_SCHEMA(config)
+        except vol.Invalid as e:
+            _LOGGER.warning(f"Invalid rate limit for {target}: {config!r} ({e})")
+            continue
+        rate_limits[target] = RateLimit(
+            config[RATE_LIMIT_INTERVAL_KEY], config[RATE_LIMIT_MODE_KEY]
+        )
+    return rate_limits
+
+
+class Downsampler:
+    """Defer and aggregate sensor values of rate limited devices."""
+
+    def __init__(self, hass: HomeAssistant, rate_limits: dict[str, RateLimit]):
+        self.hass = hass
+        self.rate_limits = rate_limits
+        self._buckets: dict[Entity, tuple[_Bucket, RateLimit]] = {}
+        # (due, sequence, entity) of every bucket, the shared timer fires for
+        # the earliest one
+        self._due: list[tuple[float, int, Entity]] = []
+        self._sequence = itertools.count()
+        self._cancel_flush: CALLBACK_TYPE | None = None
+        self._scheduled_due: float | None = None
+
+        # metrics
+        self.deferred = 0
+        self.flushed = 0
+
+    def rate_limit_for(self, device_id: str, profile_name: str | None):
+        """Return the rate limit of a device, the devEui taking precedence."""
+        rate_limit = self.rate_limits.get(device_id)
+        if rate_limit is None and profile_name is not None:
+            rate_limit = self.rate_limits.get(profile_name)
+        return rate_limit
+
+    @callback
+    def defer(
+        self,
+        entity: Entity,
+        rate_limit: RateLimit,
+        value,
+        last_write: float | None,
+        event_time: str | None = None,
+    ) -> bool:
+        """Aggregate the value if the entity was written too recently.
+
+        Returns False if the value should be written right away.
+        """
+        pending = self._buckets.get(entity)
+        if pending is None:
+            now = time.monotonic()
+            if last_write is None or now - last_write >= rate_limit.interval:
+                return False
+
+            pending = self._buckets[entity] = (_Bucket(), rate_limit)
+            due = last_write + rate_limit.interval
+            heapq.heappush(self._due, (due, next(self._sequence), entity))
+            if self._scheduled_due is None or due < self._scheduled_due:
+                self._schedule(due, now)
+
+        pending[0].add(value, event_time)
+        self.deferred += 1
+        return True
+
+    def _schedule(self, due: float, now: float):
+        if self._cancel_flush is not None:
+            self._cancel_flush()
+        self._scheduled_due = due
+        self._cancel_flush = async_call_later(
+            self.hass, max(0.0, due - now), self._async_scheduled_flush
+        )
+
+    @callback
+    def _async_scheduled_flush(self, _now=None):
+        self._cancel_flush = None
+        self._scheduled_due = None
+
+        now = time.monotonic()
+        while self._due and self._due[0][0] <= now:
+            _, _, entity = heapq.heappop(self._due)
+            self._write(entity)
+
+        if self._due:
+            self._schedule(self._due[0][0], now)
+
+    def _write(self, entity: Entity):
+        pending = self._buckets.pop(entity, None)
+        if pending is None:
+            # dropped by forget
+            return
+        bucket, rate_limit = pending
+        self.flushed += 1
+        entity.apply_state(bucket.value(rate_limit.mode), bucket.event_time)
+
+    @callback
+    def async_flush(self):
+        """Write all pending aggregates now, e.g. on unload."""
+        if self._cancel_flush is not None:
+            self._cancel_flush()
+            self._cancel_flush = None
+            self._scheduled_due = None
+
+        due, self._due = self._due, []
+        for _, _, entity in due:
+            self._write(entity)
+
+    def forget(self, dev_eui: str):
+        """Drop the pending aggregates of an evicted device unwritten."""
+        for entity in [e for e in self._buckets if e.device_id == dev_eui]:
+            del self._buckets[entity]
+
+    def stats(self) -> dict[str, int]:
+        """Return downsampling counters."""
+        return {
+            "rate_limits": len(self.rate_limits),
+            "pending": len(self._buckets),
+            "values_deferred": self.deferred,
+            "aggregates_written": self.flushed,
+            "writes_saved": self.deferred - self.flushed - len(self._buckets),
+        }
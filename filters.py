@@ -0,0 +1,88 @@
+"""State write filters for the ChirpStack HTTP integration."""
+
+import logging
+import time
+from datetime import timedelta
+
+import voluptuous as vol
+
+from homeassistant.helpers.typing import StateType
+
+_LOGGER = logging.getLogger(__name__)
+
+# {"<device class>": smallest change that is written}
+DEADBANDS_SCHEMA = vol.Schema({str: vol.All(vol.Coerce(float), vol.Range(min=0))})
+
+
+class ChangeFilter:
+    """Decide whether an updated entity state is worth writing.
+
+    Unchanged values and numeric changes within the deadband of the entity's
+    device class are suppressed, unless the last write is older than the
+    heartbeat interval. Heartbeat writes of an unchanged state are forced by
+    the entity, so last_updated still tells when the device last reported.
+    """
+
+    def __init__(self, deadbands: dict[str, float], heartbeat: timedelta):
+        self.deadbands = deadbands
+        self.heartbeat = heartbeat.total_seconds()
+
+        # metrics
+        self.written = 0
+        self.suppressed = 0
+        self.heartbeats = 0
+
+    def should_write(
+        self,
+        device_class: str | None,
+        last_state: StateType | bool,
+        last_write: float | None,
+        state: StateType | bool,
+    ) -> bool:
+        """Return True if state should be written given the last written one."""
+        if last_write is None:
+            self.written += 1
+            return True
+
+        if not self._is_unchanged(device_class, last_state, state):
+            self.written += 1
+            return True
+
+        if time.monotonic() - last_write >= self.heartbeat:
+            self.heartbeats += 1
+            self.written += 1
+            return True
+
+        self.suppressed += 1
+        return False
+
+    def _is_unchanged(
+        self,
+        device_class: str | None,
+        last_state: StateType | bool,
+        state: StateType | bool,
+    ) -> bool:
+        if type(last_state) is type(state) and last_state == state:
+            return True
+
+        deadband = self.deadbands.get(device_class)
+        if (
+            deadband is None
+            or isinstance(state, bool)
+            or isinstance(last_state, bool)
+            or not isinstance(state, (int, float))
+            or not isinstance(last_state, (int, float))
+        ):
+            return False
+
+        # round away float noise so e.g. 21.2 -> 21.1 counts as a 0.1 change
+        return round(abs(state - last_state), 9) < deadband
+
+    def stats(self) -> dict[str, int | float]:
+        """Return filter counters."""
+        return {
+            "heartbeat_s": self.heartbeat,
+            "written": self.written,
+            "suppressed": self.suppressed,
+            "heartbeats": self.heartbeats,
+        }
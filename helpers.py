@@ -1,5 +1,6 @@
 import re
 import logging
+import functools
 
 from homeassistant.const import (
     UnitOfConductivity,
@@ -61,63 +62,162 @@ BINARY_SENSOR_DETECTION_MAP: list[tuple[str, BinarySensorDeviceClass]] = [
 ]
 
 
+CLASSIFICATION_CACHE_SIZE = 4096
+
+
+def _compile_detection_map(detection_map, prefix: str) -> re.Pattern:
+    """Compile a detection map into a single prioritized alternation.
+
+    Every pattern is wrapped in a lookahead anchored at the start of the key,
+    so the alternation is tried in map order (first match wins, like the
+    original loop) instead of picking the leftmost match in the key.
+    """
+    branches = [
+        f"(?=.*?(?P<{prefix}{index}>{entry[0]}))"
+        for index, entry in enumerate(detection_map)
+    ]
+    return re.compile("(?s)" + "|".join(branches))
+
+
+def _matched_index(match: re.Match, prefix: str) -> int:
+    """Return the index of the detection map entry that produced the match."""
+    for name, value in match.groupdict().items():
+        if value is not None and name.startswith(prefix):
+            return int(name[len(prefix) :])
+    return -1
+
+
+_SENSOR_PATTERN = _compile_detection_map(SENSOR_DETECTION_MAP, "s")
+_BINARY_SENSOR_PATTERN = _compile_detection_map(BINARY_SENSOR_DETECTION_MAP, "b")
+
+# Only the upper case names in the class dict can ever match `key.upper()`
+_SENSOR_DEVICE_CLASSES = {
+    name: value
+    for name, value in SensorDeviceClass.__dict__.items()
+    if name == name.upper()
+}
+_BINARY_SENSOR_DEVICE_CLASSES = {
+    name: value
+    for name, value in BinarySensorDeviceClass.__dict__.items()
+    if name == name.upper()
+}
+
+
+def _classify_sensor_key(key):
+    """Classify a single key, returning None if the next key should be tried."""
+    found_class = None
+    found_unit = None
+
+    if "," in key:
+        found_class, found_unit = key.split(",")
+
+    if found_class or found_unit:
+        found_class = found_class.strip()
+        found_unit = found_unit.strip()
+        if found_class.upper() in _SENSOR_DEVICE_CLASSES:
+            return (found_unit, SensorDeviceClass.__dict__[found_class])
+        return (found_unit, None)
+
+    match = _SENSOR_PATTERN.match(key.lower())
+    if match:
+        _, device_class, unit = SENSOR_DETECTION_MAP[_matched_index(match, "s")]
+        _LOGGER.debug(
+            "Detected sensor unit: %s and device class: %s for key: %s",
+            unit,
+            device_class,
+            key,
+        )
+        return (unit, device_class)
+
+    key_u = key.upper()
+    if key_u in _SENSOR_DEVICE_CLASSES:
+        return (None, _SENSOR_DEVICE_CLASSES[key_u])
+
+    return None
+
+
+def _classify_binary_sensor_key(key):
+    """Classify a single key, returning None if the next key should be tried."""
+    match = _BINARY_SENSOR_PATTERN.match(key.lower())
+    if match:
+        _, device_class = BINARY_SENSOR_DETECTION_MAP[_matched_index(match, "b")]
+        _LOGGER.debug(
+            "Detected binary sensor device class: %s for key: %s", device_class, key
+        )
+        return device_class
+
+    key_u = key.upper()
+    if key_u in _BINARY_SENSOR_DEVICE_CLASSES:
+        _LOGGER.debug(
+            "Detected binary sensor device class: %s for key: %s",
+            _BINARY_SENSOR_DEVICE_CLASSES[key_u],
+            key,
+        )
+        return _BINARY_SENSOR_DEVICE_CLASSES[key_u]
+
+    return None
+
+
+_cached_sensor_key = functools.lru_cache(maxsize=CLASSIFICATION_CACHE_SIZE)(
+    _classify_sensor_key
+)
+_cached_binary_sensor_key = functools.lru_cache(maxsize=CLASSIFICATION_CACHE_SIZE)(
+    _classify_binary_sensor_key
+)
+
+
+def classification_cache_stats() -> dict[str, dict[str, int]]:
+    """Return hit/miss counters of the key classification caches."""
+    stats = {}
+    for name, cached in (
+        ("sensor", _cached_sensor_key),
+        ("binary_sensor", _cached_binary_sensor_key),
+    ):
+        info = cached.cache_info()
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+        }
+    return stats
+
+
+def clear_classification_cache():
+    """Drop all cached key classifications."""
+    _cached_sensor_key.cache_clear()
+    _cached_binary_sensor_key.cache_clear()
+
+
 def detect_sensor_unit(*args) -> tuple[str, SensorDeviceClass]:
     """Detect unit of measurement based on key name."""
-    logging.debug(f"Detecting sensor unit from keys: {args}")
-
     for key in args:
-        found_class = None
-        found_unit = None
-
         if key is None:
             continue
 
-        if "," in key:
-            found_class, found_unit = key.split(",")
+        if isinstance(key, str):
+            result = _cached_sensor_key(key)
+        else:
+            result = _classify_sensor_key(key)
 
-        if found_class or found_unit:
-            found_class = found_class.strip()
-            found_unit = found_unit.strip()
-            if found_class.upper() in SensorDeviceClass.__dict__:
-                return [found_unit, SensorDeviceClass.__dict__[found_class]]
-            else:
-                return [found_unit, None]
+        if result is not None:
+            return result
 
-        key_l = key.lower()
-        for pattern, device_class, unit in SENSOR_DETECTION_MAP:
-            if re.search(pattern, key_l):
-                _LOGGER.debug(
-                    f"Detected sensor unit: {unit} and device class: {device_class} for key: {key}"
-                )
-                return [unit, device_class]
-
-        key_u = key.upper()
-        if key_u in SensorDeviceClass.__dict__:
-            return [None, SensorDeviceClass.__dict__[key_u]]
-
-    return [None, None]
+    return (None, None)
 
 
 def detect_binary_sensor_device_class(*args) -> BinarySensorDeviceClass:
     """Detect unit of measurement based on key name."""
     for key in args:
-
         if key is None:
             continue
-        key_l = key.lower()
-        key_u = key.upper()
-
-        for pattern, device_class in BINARY_SENSOR_DETECTION_MAP:
-            if re.search(pattern, key_l):
-                _LOGGER.debug(
-                    f"Detected binary sensor device class: {device_class} for key: {key}"
-                )
-                return device_class
-
-        if key_u in BinarySensorDeviceClass.__dict__:
-            _LOGGER.debug(
-                f"Detected binary sensor device class: {BinarySensorDeviceClass.__dict__[key_u]} for key: {key}"
-            )
-            return BinarySensorDeviceClass.__dict__[key_u]
+
+        if isinstance(key, str):
+            result = _cached_binary_sensor_key(key)
+        else:
+            result = _classify_binary_sensor_key(key)
+
+        if result is not None:
+            return result
 
     return None
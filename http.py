@@ -2,54 +2,225 @@
 
 import logging
 import json
+import time
+from datetime import datetime
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.components.http import HomeAssistantView
-from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 from homeassistant.helpers.typing import StateType
+from homeassistant.util import dt as dt_util
+from homeassistant.util.json import json_loads
 
 from .sensor import ChirpstackSensor
 from .binary_sensor import ChirpstackBinarySensor
+from .availability import AvailabilityTracker
+from .coalescer import StateWriteCoalescer
+from .dedup import UplinkDeduplicator
+from .decoders import DECODE_EXECUTOR_MIN_SIZE, PayloadDecoders
+from .device_metadata import DeviceMetadata, async_update_device_registry
+from .downsampler import Downsampler
+from .filters import ChangeFilter
 from .helpers import detect_sensor_unit, detect_binary_sensor_device_class
+from .ingest import IngestPlanCache, KeyPlan, split_payload
+from .ingest_queue import IngestQueue, QueuedEvent
+from .limits import EntityLimits
+from .link_quality import LINK_TYPE_HINTS, LinkQualityTracker
+from .metrics import (
+    STAGE_CLASSIFY,
+    STAGE_CREATE_OR_UPDATE,
+    STAGE_FLATTEN,
+    STAGE_PARSE,
+    STAGE_READ,
+    STAGE_TOTAL,
+    REJECT_INVALID_OBJECT,
+    REJECT_INVALID_PAYLOAD,
+    REJECT_NO_DEV_EUI,
+    REJECT_NO_DEVICE_INFO,
+    REJECT_QUEUE_FULL,
+    REJECT_TOO_LARGE,
+    REJECT_UNAUTHORIZED,
+    PipelineMetrics,
+)
+from .protobuf import (
+    decode_join_event,
+    decode_status_event,
+    decode_uplink_event,
+)
+from .schema import KeySchema, SchemaTable
+from .series import SeriesImporter, is_sample_array
 from .const import (
-    ADD_BINARY_SENSOR_ENTITIES_FUNC_KEY,
-    ADD_SENSOR_ENTITIES_FUNC_KEY,
+    API_BATCH_URL_SUFFIX,
     API_URL_PREFIX,
+    AVAILABILITY_KEY,
+    CS_BATTERY_LEVEL_KEY,
+    CS_BATTERY_LEVEL_UNAVAILABLE_KEY,
+    CS_DEDUPLICATION_ID_KEY,
     CS_DEVICE_EUI_KEY,
+    CS_DATA_KEY,
     CS_DEVICE_INFO_KEY,
-    CS_DEVICE_NAME_KEY,
-    CS_DEVICE_PROFILE_NAME_DEFAULT,
     CS_DEVICE_PROFILE_NAME_KEY,
-    CS_GATEWAY_ID_DEFAULT,
-    CS_GATEWAY_ID_KEY,
+    CS_EVENT_JOIN,
+    CS_EVENT_QUERY_KEY,
+    CS_EVENT_STATUS,
+    CS_EVENT_UP,
+    CS_EXTERNAL_POWER_SOURCE_KEY,
+    CS_F_CNT_KEY,
+    CS_MARGIN_KEY,
     CS_OBJECT_KEY,
     CS_RX_INFO_KEY,
-    CS_TENANT_NAME_DEFAULT,
-    CS_TENANT_NAME_KEY,
+    CS_STATUS_BATTERY_LEVEL_KEY,
+    CS_STATUS_MARGIN_KEY,
+    CS_TIME_KEY,
+    CS_TX_INFO_KEY,
     CS_TYPE_REF_KEY,
+    CHANGE_FILTER_KEY,
+    COALESCER_KEY,
+    DEDUP_KEY,
     DEVICES_KEY,
+    DEVICE_METADATA_KEY,
     DOMAIN,
-    PENDING_BINARY_SENSORS_KEY,
-    PENDING_SENSORS_KEY,
+    DOWNSAMPLER_KEY,
+    INGEST_PLANS_KEY,
+    INGEST_QUEUE_KEY,
+    LIMITS_KEY,
+    LINK_QUALITY_KEY,
+    MAX_BATCH_BODY_SIZE_FACTOR,
+    METRICS_KEY,
+    PAYLOAD_DECODERS_KEY,
+    NDJSON_CONTENT_TYPES,
+    PAYLOAD_ENCODING_AUTO,
+    PAYLOAD_ENCODING_PROTOBUF,
+    PROTOBUF_CONTENT_TYPES,
+    REGISTRAR_KEY,
+    ROUTER_KEY,
+    SCHEMA_TABLE_KEY,
+    SERIES_IMPORTER_KEY,
+    STORE_KEY,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+# Events that are processed, with their Protobuf decoder. All other event
+# types (ack, txack, log, location, integration) are acknowledged unread.
+EVENT_DECODERS = {
+    CS_EVENT_UP: decode_uplink_event,
+    CS_EVENT_STATUS: decode_status_event,
+    CS_EVENT_JOIN: decode_join_event,
+}
+
+STATUS_TYPE_HINTS = {
+    CS_STATUS_MARGIN_KEY: "SIGNAL_STRENGTH,dB",
+    CS_STATUS_BATTERY_LEVEL_KEY: "BATTERY,%",
+}
+
+REJECT_MESSAGES = {
+    REJECT_INVALID_PAYLOAD: "Invalid payload",
+    REJECT_NO_DEVICE_INFO: "No deviceInfo in payload",
+    REJECT_NO_DEV_EUI: "No devEui in deviceInfo",
+    REJECT_INVALID_OBJECT: "Object is not a JSON object",
+}
+
+
+def check_event(data) -> str | None:
+    """Return why a decoded event is rejected, or None if it is well-formed.
+
+    Only the types of the required fields are checked, nothing is copied.
+    """
+    if not isinstance(data, dict):
+        return REJECT_INVALID_PAYLOAD
+    device_info = data.get(CS_DEVICE_INFO_KEY)
+    if not device_info or not isinstance(device_info, dict):
+        return REJECT_NO_DEVICE_INFO
+    dev_eui = device_info.get(CS_DEVICE_EUI_KEY)
+    if not dev_eui or not isinstance(dev_eui, str):
+        return REJECT_NO_DEV_EUI
+    object_data = data.get(CS_OBJECT_KEY)
+    if object_data is not None and not isinstance(object_data, dict):
+        return REJECT_INVALID_OBJECT
+    return None
 
-def flatten_dict(d, parent_key="", sep="_"):
-    """Flatten a nested dictionary."""
+
+def parse_event_time(data: dict) -> datetime | None:
+    """Return the UTC time of an event from its `time` field, if it has one."""
+    value = data.get(CS_TIME_KEY)
+    event_time = dt_util.parse_datetime(value) if isinstance(value, str) else None
+    return dt_util.as_utc(event_time) if event_time is not None else None
+
+
+def flatten_dict(d, parent_key="", sep="_", max_depth: int | None = None, dropped=None):
+    """Flatten a nested dictionary.
+
+    Objects nested deeper than max_depth levels are left out, their keys are
+    appended to dropped.
+    """
     items = []
     for k, v in d.items():
         new_key = f"{parent_key}{sep}{k}" if parent_key else k
         if isinstance(v, dict):
-            items.extend(flatten_dict(v, new_key, sep=sep).items())
+            if max_depth is not None and max_depth <= 1:
+                if dropped is not None:
+                    dropped.append(new_key)
+                continue
+            items.extend(
+                flatten_dict(
+                    v,
+                    new_key,
+                    sep=sep,
+                    max_depth=max_depth - 1 if max_depth is not None else None,
+                    dropped=dropped,
+                ).items()
+            )
         else:
             items.append((new_key, v))
     return dict(items)
 
 
-def sanitize_value(value, key=None) -> StateType | bool:
+def sanitize_value(
+    value, key=None, key_schema: KeySchema | None = None
+) -> StateType | bool:
     """Convert value to proper type and format."""
+    value = _sanitize_value(value, _is_binary_key(key, key_schema))
+    if key_schema is not None and key_schema.scale is not None:
+        return _scale_value(value, key_schema.scale)
+    return value
+
+
+def make_value_converter(key: str, key_schema: KeySchema | None = None):
+    """Return sanitize_value with the classification of key precomputed.
+
+    Returns None if the schema of the key ignores it.
+    """
+    if key_schema is not None and key_schema.ignore:
+        return None
+
+    is_binary_key = _is_binary_key(key, key_schema)
+    scale = key_schema.scale if key_schema is not None else None
+    if scale is not None:
+
+        def convert(value) -> StateType | bool:
+            return _scale_value(_sanitize_value(value, is_binary_key), scale)
+
+    else:
+
+        def convert(value) -> StateType | bool:
+            return _sanitize_value(value, is_binary_key)
+
+    return convert
+
+
+def _is_binary_key(key, key_schema: KeySchema | None) -> bool:
+    if key_schema is not None and key_schema.classified:
+        return key_schema.binary
+    return bool(detect_binary_sensor_device_class(key))
+
+
+def _scale_value(value, scale: float):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value * scale
+    return value
+
+
+def _sanitize_value(value, is_binary_key: bool) -> StateType | bool:
     if isinstance(value, bool):
         # Already boolean
         return value
@@ -62,7 +233,7 @@ def sanitize_value(value, key=None) -> StateType | bool:
 
     # Handle numeric values
     if isinstance(value, (int, float)):
-        if detect_binary_sensor_device_class(key):
+        if is_binary_key:
             # special case: somehow chirpstack converts a 1 to a 1.0
             return value != 0.0
         return value
@@ -93,6 +264,8 @@ class ChirpstackHttpView(HomeAssistantView):
         url_suffix,
         header_name=None,
         header_value=None,
+        payload_encoding=PAYLOAD_ENCODING_AUTO,
+        max_body_size: int | None = None,
     ):
         """Initialize the webhook view."""
         self.hass = hass
@@ -107,90 +280,473 @@ class ChirpstackHttpView(HomeAssistantView):
         self.header_name = header_name
         self.header_value = header_value
 
+        # json, protobuf or auto (by content type)
+        self.payload_encoding = payload_encoding
+
+        # bytes, None or 0 for no limit
+        self.max_body_size = max_body_size
+
     async def post(self, request):
         """Handle POST requests for ChirpStack uplinks."""
+        start = time.perf_counter()
         try:
-            await self.handle(request)
+            response = await self.handle(request)
         except Exception as e:
             _LOGGER.exception(f"Error processing webhook: {e}")
-            return self.json(
+            response = self.json(
                 {"status": "error", "message": f"Internal error: {str(e)}"},
                 status_code=500,
             )
 
+        metrics: PipelineMetrics = self.hass.data[DOMAIN][self.entry_id][METRICS_KEY]
+        metrics.observe(STAGE_TOTAL, time.perf_counter() - start)
+        metrics.count_response(response.status)
+        return response
+
     async def handle(self, request):
+        hass_data: dict = self.hass.data[DOMAIN][self.entry_id]
+        metrics: PipelineMetrics = hass_data[METRICS_KEY]
+
         # Check for authentication header if configured
         if self.header_name and self.header_value:
             errors = self.ensure_authenticated(request.headers)
             if errors:
+                metrics.count_rejection(REJECT_UNAUTHORIZED)
                 return errors
 
-        # Parse the JSON data
-        data: dict = await request.json()
-        _LOGGER.debug(f"Received webhook data: '{json.dumps(data)}'")
+        # Dispatch on the event type before the body is read
+        event_type = request.query.get(CS_EVENT_QUERY_KEY, CS_EVENT_UP)
+        if event_type not in EVENT_DECODERS:
+            _LOGGER.debug("Ignoring %s event", event_type)
+            return self.json({"status": "ignored", "event": event_type})
+
+        start = time.perf_counter()
+        body: bytes | None = await self.read_body(request)
+        metrics.observe(STAGE_READ, time.perf_counter() - start)
+        if body is None:
+            metrics.count_rejection(REJECT_TOO_LARGE)
+            _LOGGER.warning(
+                f"Rejecting {event_type} event larger than {self.max_body_size} bytes"
+            )
+            return self.json(
+                {"status": "error", "message": "Payload too large"},
+                status_code=413,
+            )
+
+        # Queue mode: acknowledge right away, the workers process the event
+        ingest_queue: IngestQueue | None = hass_data.get(INGEST_QUEUE_KEY)
+        if ingest_queue is not None:
+            if not ingest_queue.put(
+                QueuedEvent(event_type, request.content_type, body)
+            ):
+                metrics.count_rejection(REJECT_QUEUE_FULL)
+                return self.json(
+                    {"status": "error", "message": "Ingest queue full"},
+                    status_code=503,
+                )
+            return self.json({"status": "queued"}, status_code=202)
+
+        # Parse the JSON or Protobuf data
+        start = time.perf_counter()
+        try:
+            data: dict = self.decode_payload(event_type, request.content_type, body)
+            metrics.observe(STAGE_PARSE, time.perf_counter() - start)
+        except ValueError as e:
+            metrics.count_rejection(REJECT_INVALID_PAYLOAD)
+            _LOGGER.warning(f"Invalid {event_type} payload: {e}")
+            return self.json(
+                {"status": "error", "message": "Invalid payload"},
+                status_code=400,
+            )
+
+        await self.async_decode_object(hass_data, event_type, data)
+        result = self.process_event(hass_data, event_type, data)
+        return self.json(
+            result, status_code=400 if result["status"] == "error" else 200
+        )
+
+    async def read_body(self, request, max_size: int | None = None) -> bytes | None:
+        """Read the request body, None if it exceeds the maximum body size."""
+        if max_size is None:
+            max_size = self.max_body_size
+        if not max_size:
+            return await request.read()
+
+        # Reject oversized bodies before reading them
+        if request.content_length is not None:
+            if request.content_length > max_size:
+                return None
+            return await request.read()
+
+        # Without a Content-Length, enforce the limit while streaming
+        chunks: list[bytes] = []
+        size = 0
+        async for chunk in request.content.iter_any():
+            size += len(chunk)
+            if size > max_size:
+                return None
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def process_queued(self, event: QueuedEvent):
+        """Decode and process an event taken from the ingest queue."""
+        hass_data: dict = self.hass.data[DOMAIN][self.entry_id]
+        try:
+            start = time.perf_counter()
+            data = self.decode_payload(event.event_type, event.content_type, event.body)
+            hass_data[METRICS_KEY].observe(STAGE_PARSE, time.perf_counter() - start)
+            await self.async_decode_object(hass_data, event.event_type, data)
+            self.process_event(hass_data, event.event_type, data)
+        except Exception as e:
+            _LOGGER.exception(f"Error processing queued {event.event_type} event: {e}")
+
+    def process_event(
+        self,
+        hass_data: dict,
+        event_type: str,
+        data: dict,
+        event_time: str | None = None,
+    ) -> dict:
+        """Process a decoded event, returning the result for the response.
+
+        event_time is the original time of a replayed event, it is attached to
+        the entities whose state the event updates.
+        """
+        # Check the structure before any entity work
+        reason = check_event(data)
+        if reason is not None:
+            hass_data[METRICS_KEY].count_rejection(reason)
+            _LOGGER.debug("Rejecting %s event: %s", event_type, reason)
+            return {"status": "error", "message": REJECT_MESSAGES[reason]}
+
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Received webhook data: '%s'", json.dumps(data))
 
-        # Extract device info
         device_info_raw: dict = data[CS_DEVICE_INFO_KEY]
-        if not device_info_raw:
-            return self.json({"status": "error", "message": "No deviceInfo in payload"})
+        dev_eui: str = device_info_raw[CS_DEVICE_EUI_KEY]
+
+        # Drop retried or redundantly delivered uplinks before any entity work
+        dedup: UplinkDeduplicator | None = hass_data.get(DEDUP_KEY)
+        if dedup is not None:
+            if event_type == CS_EVENT_JOIN:
+                # the frame counters restart after a join
+                dedup.reset(dev_eui)
+            elif event_type == CS_EVENT_UP and dedup.is_duplicate(
+                dev_eui, data.get(CS_F_CNT_KEY), data.get(CS_DEDUPLICATION_ID_KEY)
+            ):
+                _LOGGER.debug("Dropping duplicate uplink of %s", dev_eui)
+                return {"status": "duplicate", "device": dev_eui}
 
-        dev_eui: str = device_info_raw.get(CS_DEVICE_EUI_KEY)
-        if not dev_eui:
-            return self.json({"status": "error", "message": "No devEui in deviceInfo"})
+        if event_type == CS_EVENT_STATUS:
+            return self.handle_status(hass_data, data, device_info_raw, dev_eui)
+        if event_type == CS_EVENT_JOIN:
+            return self.handle_join(hass_data, data, device_info_raw, dev_eui)
+        self.decode_object(hass_data, data, device_info_raw)
+        result = self.handle_uplink(
+            hass_data, data, device_info_raw, dev_eui, event_time
+        )
+
+        # Learn the uplink interval, status events ride along with uplinks.
+        # Devices rejected by the device limit have no metadata and are not
+        # tracked, so a flood of new devEuis does not grow the tracker.
+        availability: AvailabilityTracker | None = hass_data.get(AVAILABILITY_KEY)
+        if availability is not None and dev_eui in hass_data[DEVICE_METADATA_KEY]:
+            seen_at = parse_event_time(data)
+            availability.seen(
+                dev_eui, seen_at.timestamp() if seen_at is not None else None
+            )
+        return result
 
+    def payload_decoder(self, hass_data: dict, data: dict, device_info_raw: dict):
+        """Return the decoders and the profile's decoder for an uplink to decode."""
+        decoders: PayloadDecoders | None = hass_data.get(PAYLOAD_DECODERS_KEY)
+        if decoders is None or data.get(CS_OBJECT_KEY) is not None:
+            return None, None
+        if not isinstance(data.get(CS_DATA_KEY), str):
+            return None, None
+        return decoders, decoders.get(device_info_raw.get(CS_DEVICE_PROFILE_NAME_KEY))
+
+    def decode_object(self, hass_data: dict, data: dict, device_info_raw: dict):
+        """Decode the raw payload of an uplink without object into its object."""
+        decoders, decoder = self.payload_decoder(hass_data, data, device_info_raw)
+        if decoder is not None:
+            data[CS_OBJECT_KEY] = decoders.decode(decoder, data[CS_DATA_KEY])
+
+    async def async_decode_object(self, hass_data: dict, event_type: str, data):
+        """Decode large raw payloads in the executor, before the event is processed."""
+        if event_type != CS_EVENT_UP or check_event(data) is not None:
+            return
+        decoders, decoder = self.payload_decoder(
+            hass_data, data, data[CS_DEVICE_INFO_KEY]
+        )
+        if decoder is None or len(data[CS_DATA_KEY]) < DECODE_EXECUTOR_MIN_SIZE:
+            return
+        decoders.offloaded += 1
+        data[CS_OBJECT_KEY] = await self.hass.async_add_executor_job(
+            decoders.decode, decoder, data[CS_DATA_KEY]
+        )
+
+    def handle_uplink(
+        self,
+        hass_data: dict,
+        data: dict,
+        device_info_raw: dict,
+        dev_eui: str,
+        event_time: str | None = None,
+    ) -> dict:
+        """Create or update the entities of an uplink's decoded object."""
         # Extract object data (sensor readings)
         object_data: dict = data.get(CS_OBJECT_KEY, {})
         if not object_data or not isinstance(object_data, dict):
-            return self.json({"status": "ignored", "message": "No valid object data"})
-
-        # Flatten the object data
-        flat_data: dict = flatten_dict(object_data)
+            return {"status": "ignored", "message": "No valid object data"}
 
         # Get device metadata
-        rx_info: dict = data.get(CS_RX_INFO_KEY, [{}])[0]
-        device_info: dict[str, str] = {
-            CS_DEVICE_NAME_KEY: device_info_raw.get(
-                CS_DEVICE_NAME_KEY, f"Device {dev_eui}"
-            ),
-            CS_TENANT_NAME_KEY: device_info_raw.get(
-                CS_TENANT_NAME_KEY, CS_TENANT_NAME_DEFAULT
-            ),
-            CS_DEVICE_PROFILE_NAME_KEY: device_info_raw.get(
-                CS_DEVICE_PROFILE_NAME_KEY, CS_DEVICE_PROFILE_NAME_DEFAULT
-            ),
-            CS_GATEWAY_ID_KEY: rx_info.get(CS_GATEWAY_ID_KEY, CS_GATEWAY_ID_DEFAULT),
+        device = self.get_device_metadata(hass_data, device_info_raw, dev_eui)
+        if device is None:
+            return {"status": "ignored", "message": "Device limit reached"}
+
+        # Type hints of the codec, keyed like the flattened object
+        type_hints = None
+        if CS_TYPE_REF_KEY in object_data:
+            object_data = dict(object_data)
+            type_ref = object_data.pop(CS_TYPE_REF_KEY)
+            type_hints = flatten_dict(type_ref) if isinstance(type_ref, dict) else {}
+
+        ingest_plans: IngestPlanCache = hass_data[INGEST_PLANS_KEY]
+        metrics: PipelineMetrics = hass_data[METRICS_KEY]
+
+        # Steady state: the payload has a known shape, update entities directly
+        start = time.perf_counter()
+        values: list = []
+        shape = split_payload(object_data, values)
+        device_plan = ingest_plans.get(dev_eui, shape)
+        # Arrays of samples, the entities get the newest sample as state
+        series: dict[str, list] = {}
+        if device_plan is not None:
+            if list in map(type, values):
+                for key_plan in device_plan.key_plans:
+                    samples = values[key_plan.index]
+                    if is_sample_array(samples):
+                        series[key_plan.key] = samples
+                        values[key_plan.index] = samples[-1]
+            metrics.observe(STAGE_FLATTEN, time.perf_counter() - start)
+            start = time.perf_counter()
+            device_plan.apply(values, event_time)
+            new_sensors, new_binary_sensors = [], []
+        else:
+            # Flatten the object data, up to the depth limit
+            limits: EntityLimits | None = hass_data.get(LIMITS_KEY)
+            dropped: list[str] = []
+            flat_data: dict = flatten_dict(
+                object_data,
+                max_depth=limits.max_depth if limits is not None else None,
+                dropped=dropped,
+            )
+            if dropped:
+                limits.dropped_subtrees(dev_eui, dropped)
+            for key, samples in flat_data.items():
+                if is_sample_array(samples):
+                    series[key] = samples
+                    flat_data[key] = samples[-1]
+            metrics.observe(STAGE_FLATTEN, time.perf_counter() - start)
+            start = time.perf_counter()
+
+            new_sensors, new_binary_sensors = self.create_or_update_sensor(
+                hass_data, dev_eui, device, flat_data, type_hints, event_time
+            )
+            ingest_plans.bind(
+                dev_eui,
+                device.profile,
+                shape,
+                hass_data[DEVICES_KEY][dev_eui],
+            )
+        metrics.observe(STAGE_CREATE_OR_UPDATE, time.perf_counter() - start)
+
+        self.add_new_entities(hass_data, new_sensors, new_binary_sensors)
+
+        if series:
+            self.import_series(hass_data, data, device, dev_eui, series)
+
+        link_quality: LinkQualityTracker | None = hass_data.get(LINK_QUALITY_KEY)
+        if link_quality is not None and data.get(CS_RX_INFO_KEY):
+            self.update_link_quality(
+                hass_data, link_quality, data, device, dev_eui, event_time
+            )
+
+        return {
+            "status": "ok",
+            "device": device.name,
+            "sensors_added": len(new_sensors),
+            "binary_sensors_added": len(new_binary_sensors),
         }
 
-        hass_data: dict = self.hass.data[DOMAIN][self.entry_id]
-        new_sensors, new_binary_sensors = self.create_or_update_sensor(
-            hass_data, dev_eui, device_info, flat_data
-        )
+    def import_series(
+        self,
+        hass_data: dict,
+        data: dict,
+        device: DeviceMetadata,
+        dev_eui: str,
+        series: dict[str, list],
+    ):
+        """Import the sample arrays of an uplink as statistics of their sensors."""
+        importer: SeriesImporter | None = hass_data.get(SERIES_IMPORTER_KEY)
+        if importer is None:
+            return
 
-        # Add new sensors to Home Assistant
-        self.add_sensor(
-            "sensors",
-            hass_data,
-            new_sensors,
-            ADD_SENSOR_ENTITIES_FUNC_KEY,
-            PENDING_SENSORS_KEY,
+        end = parse_event_time(data) or dt_util.utcnow()
+        schemas: SchemaTable | None = hass_data.get(SCHEMA_TABLE_KEY)
+        entities: dict = hass_data[DEVICES_KEY].get(dev_eui, {})
+        for key, samples in series.items():
+            entity = entities.get(key)
+            if not isinstance(entity, ChirpstackSensor):
+                continue
+            key_schema = schemas.lookup(device.profile, key) if schemas else None
+            importer.add(
+                entity,
+                [sanitize_value(sample, key, key_schema) for sample in samples],
+                end,
+                key_schema.sample_interval if key_schema is not None else None,
+            )
+
+    def update_link_quality(
+        self,
+        hass_data: dict,
+        link_quality: LinkQualityTracker,
+        data: dict,
+        device: DeviceMetadata,
+        dev_eui: str,
+        event_time: str | None = None,
+    ):
+        """Update the rolling link statistics sensors of a device."""
+        states = link_quality.observe(
+            dev_eui, data[CS_RX_INFO_KEY], data.get(CS_TX_INFO_KEY, {})
         )
 
-        self.add_sensor(
-            "binary sensors",
-            hass_data,
-            new_binary_sensors,
-            ADD_BINARY_SENSOR_ENTITIES_FUNC_KEY,
-            PENDING_BINARY_SENSORS_KEY,
+        entities: dict = hass_data[DEVICES_KEY][dev_eui]
+        missing = {}
+        for key, state in states.items():
+            entity = entities.get(key)
+            if entity is None:
+                missing[key] = state
+            else:
+                entity.update_state(state, event_time)
+
+        if missing:
+            new_sensors, new_binary_sensors = self.create_or_update_sensor(
+                hass_data, dev_eui, device, missing, LINK_TYPE_HINTS, event_time
+            )
+            self.add_new_entities(hass_data, new_sensors, new_binary_sensors)
+
+    def handle_status(
+        self, hass_data: dict, data: dict, device_info_raw: dict, dev_eui: str
+    ) -> dict:
+        """Turn the margin and battery level of a status event into sensors."""
+        status_data = {CS_STATUS_MARGIN_KEY: data.get(CS_MARGIN_KEY, 0)}
+        if not data.get(CS_EXTERNAL_POWER_SOURCE_KEY) and not data.get(
+            CS_BATTERY_LEVEL_UNAVAILABLE_KEY
+        ):
+            status_data[CS_STATUS_BATTERY_LEVEL_KEY] = data.get(
+                CS_BATTERY_LEVEL_KEY, 0.0
+            )
+
+        device = self.get_device_metadata(hass_data, device_info_raw, dev_eui)
+        if device is None:
+            return {"status": "ignored", "message": "Device limit reached"}
+        new_sensors, new_binary_sensors = self.create_or_update_sensor(
+            hass_data, dev_eui, device, status_data, STATUS_TYPE_HINTS
         )
+        self.add_new_entities(hass_data, new_sensors, new_binary_sensors)
 
-        return self.json(
-            {
-                "status": "ok",
-                "device": device_info["deviceName"],
-                "sensors_added": len(new_sensors),
-                "binary_sensors_added": len(new_binary_sensors),
-            }
+        return {
+            "status": "ok",
+            "device": device.name,
+            "sensors_added": len(new_sensors),
+        }
+
+    def handle_join(
+        self, hass_data: dict, data: dict, device_info_raw: dict, dev_eui: str
+    ) -> dict:
+        """Pre-warm the entities of a new device from a device of its profile."""
+        device = self.get_device_metadata(hass_data, device_info_raw, dev_eui)
+        if device is None:
+            return {"status": "ignored", "message": "Device limit reached"}
+        profile_name = device.profile
+
+        ingest_plans: IngestPlanCache = hass_data[INGEST_PLANS_KEY]
+        template = ingest_plans.template(profile_name)
+        if template is None or hass_data[DEVICES_KEY].get(dev_eui):
+            return {"status": "ok", "device": device.name, "prewarmed": 0}
+
+        _LOGGER.info(
+            f"Pre-warming {len(template.bindings)} entities for joined device {dev_eui}"
         )
+        entities = hass_data[DEVICES_KEY].setdefault(dev_eui, {})
+        new_sensors: list[ChirpstackSensor] = []
+        new_binary_sensors: list[ChirpstackBinarySensor] = []
+        for key_plan, (_, _, template_entity) in zip(
+            template.key_plans, template.bindings
+        ):
+            entity = self.create_entity_like(
+                hass_data, template_entity, dev_eui, key_plan, device
+            )
+            entities[key_plan.key] = entity
+            if isinstance(entity, ChirpstackBinarySensor):
+                new_binary_sensors.append(entity)
+            else:
+                new_sensors.append(entity)
+
+        ingest_plans.bind(dev_eui, profile_name, template.shape, entities)
+        hass_data[STORE_KEY].mark_dirty(dev_eui)
+        self.add_new_entities(hass_data, new_sensors, new_binary_sensors)
+
+        return {
+            "status": "ok",
+            "device": device.name,
+            "prewarmed": len(entities),
+        }
+
+    def get_device_metadata(
+        self,
+        hass_data: dict,
+        device_info_raw: dict,
+        dev_eui: str,
+    ) -> DeviceMetadata | None:
+        """Return the metadata shared by all entities of a device.
+
+        The metadata is only rebuilt, persisted and pushed to the device
+        registry if the deviceInfo of the event differs from it. Returns None
+        for a new device over the device limit of the entry.
+        """
+        devices_metadata: dict[str, DeviceMetadata] = hass_data[DEVICE_METADATA_KEY]
+        device = devices_metadata.get(dev_eui)
+        if device is None:
+            limits: EntityLimits | None = hass_data.get(LIMITS_KEY)
+            if limits is not None and not limits.allow_device(
+                devices_metadata, dev_eui
+            ):
+                return None
+            device = DeviceMetadata(dev_eui, device_info_raw)
+            devices_metadata[dev_eui] = device
+        else:
+            old_name = device.name
+            if device.update(device_info_raw):
+                _LOGGER.info(f"Metadata of device {dev_eui} changed")
+                async_update_device_registry(self.hass, device)
+                if device.name != old_name:
+                    # the entity names start with the device name
+                    for entity in hass_data[DEVICES_KEY].get(dev_eui, {}).values():
+                        entity.rename_device(old_name, device.name)
+                hass_data[STORE_KEY].mark_dirty(dev_eui)
+        return device
+
+    def decode_payload(self, event_type: str, content_type: str, body: bytes) -> dict:
+        """Decode the event body according to the payload encoding."""
+        if self.payload_encoding == PAYLOAD_ENCODING_PROTOBUF or (
+            self.payload_encoding == PAYLOAD_ENCODING_AUTO
+            and content_type in PROTOBUF_CONTENT_TYPES
+        ):
+            return EVENT_DECODERS[event_type](body)
+        return json_loads(body)
 
     def ensure_authenticated(self, headers):
         if self.header_name not in headers:
@@ -213,96 +769,374 @@ class ChirpstackHttpView(HomeAssistantView):
         self,
         hass_data: dict,
         device_id: str,
-        device_info: dict[str, str],
+        device: DeviceMetadata,
         data: dict,
+        type_hints: dict[str, str] | None = None,
+        event_time: str | None = None,
     ):
         # Initialize device dictionary if needed
         if device_id not in hass_data.get(DEVICES_KEY, {}):
             hass_data[DEVICES_KEY][device_id] = {}
 
+        coalescer: StateWriteCoalescer = hass_data[COALESCER_KEY]
+        change_filter: ChangeFilter = hass_data[CHANGE_FILTER_KEY]
+        downsampler: Downsampler | None = hass_data.get(DOWNSAMPLER_KEY)
+        schemas: SchemaTable | None = hass_data.get(SCHEMA_TABLE_KEY)
+        limits: EntityLimits | None = hass_data.get(LIMITS_KEY)
+        if type_hints is None:
+            type_hints = {}
+
         # Track new entities
         new_sensors: list[ChirpstackSensor] = []
         new_binary_sensors: list[ChirpstackBinarySensor] = []
+        classify_time = 0.0
 
         # Process each data point
         for key, raw_value in data.items():
-            _LOGGER.debug(
-                f"Processing data point: {key} = {raw_value} ({type(raw_value).__name__})"
-            )
+            _LOGGER.debug("Processing data point: %s = %r", key, raw_value)
+
+            # The profile schema, if any, replaces the heuristics
+            key_schema = None
+            if schemas is not None:
+                key_schema = schemas.lookup(device.profile, key)
+                if key_schema is not None and key_schema.ignore:
+                    continue
 
             # Generate unique ID and friendly name
             unique_id = f"{device_id}_{key}"
             name_suffix = " ".join(
                 list(map(lambda x: x.capitalize(), key.replace("_", " ").split(" ")))
             )
-            name = f"{device_info[CS_DEVICE_NAME_KEY]} {name_suffix}"
+            name = f"{device.name} {name_suffix}"
 
             # Sanitize the value
-            sanitized_value = sanitize_value(raw_value, key)
-            _LOGGER.debug(
-                f"Sanitized value: {sanitized_value} ({type(sanitized_value).__name__})"
-            )
+            start = time.perf_counter()
+            sanitized_value = sanitize_value(raw_value, key, key_schema)
+            classify_time += time.perf_counter() - start
+            _LOGGER.debug("Sanitized value: %r", sanitized_value)
 
             # Check if entity already exists
             if key in hass_data[DEVICES_KEY].get(device_id, {}):
                 # Update existing entity
-                _LOGGER.debug(f"Updating existing entity: {name}")
+                _LOGGER.debug("Updating existing entity: %s", name)
                 entity = hass_data[DEVICES_KEY][device_id][key]
-                entity.update_state(sanitized_value)
+                entity.update_state(sanitized_value, event_time)
+                continue
+
+            if limits is not None and not limits.allow_key(
+                device_id, hass_data[DEVICES_KEY][device_id]
+            ):
                 continue
 
             # Determine if boolean or sensor
-            key_type_hints = [data.get(CS_TYPE_REF_KEY, {}).get(key, None), key]
+            key_type_hints = [type_hints.get(key, None), key]
+            classified = key_schema is not None and key_schema.classified
+            start = time.perf_counter()
             if isinstance(sanitized_value, bool):
                 # Create binary sensor
-                device_class = detect_binary_sensor_device_class(*key_type_hints)
+                if classified:
+                    device_class = key_schema.binary_device_class
+                else:
+                    device_class = detect_binary_sensor_device_class(*key_type_hints)
+                classify_time += time.perf_counter() - start
                 _LOGGER.info(f"Creating binary sensor: {name} = {sanitized_value}")
                 entity = ChirpstackBinarySensor(
-                    device_id, unique_id, name, device_class, device_info
+                    device,
+                    unique_id,
+                    name,
+                    device_class,
+                    coalescer,
+                    change_filter,
                 )
                 new_binary_sensors.append(entity)
             else:
                 # Create sensor with appropriate unit
-                unit, device_class = detect_sensor_unit(*key_type_hints)
+                if classified:
+                    unit, device_class = (
+                        key_schema.unit,
+                        key_schema.sensor_device_class,
+                    )
+                else:
+                    unit, device_class = detect_sensor_unit(*key_type_hints)
+                classify_time += time.perf_counter() - start
                 _LOGGER.info(f"Creating sensor: {name} = {sanitized_value} {unit}")
                 entity = ChirpstackSensor(
-                    device_id, unique_id, name, device_class, device_info, unit
+                    device,
+                    unique_id,
+                    name,
+                    device_class,
+                    unit,
+                    coalescer,
+                    change_filter,
+                    downsampler,
+                    key_schema.state_class if key_schema is not None else None,
                 )
                 new_sensors.append(entity)
 
-            entity.set_initial_state(sanitized_value)
+            entity.set_initial_state(sanitized_value, event_time)
 
             # Store in devices dict
             hass_data[DEVICES_KEY].setdefault(device_id, {})[key] = entity
 
+        hass_data[METRICS_KEY].observe(STAGE_CLASSIFY, classify_time)
+
+        if new_sensors or new_binary_sensors:
+            hass_data[STORE_KEY].mark_dirty(device_id)
+
         return (new_sensors, new_binary_sensors)
 
-    def add_sensor(
+    def create_entity_like(
+        self,
+        hass_data: dict,
+        template: ChirpstackSensor | ChirpstackBinarySensor,
+        device_id: str,
+        key_plan: KeyPlan,
+        device: DeviceMetadata,
+    ) -> ChirpstackSensor | ChirpstackBinarySensor:
+        """Create an entity of another device's kind and class for device_id."""
+        unique_id = f"{device_id}_{key_plan.key}"
+        name = f"{device.name} {key_plan.name_suffix}"
+        if isinstance(template, ChirpstackBinarySensor):
+            return ChirpstackBinarySensor(
+                device,
+                unique_id,
+                name,
+                template.device_class,
+                hass_data[COALESCER_KEY],
+                hass_data[CHANGE_FILTER_KEY],
+            )
+        return ChirpstackSensor(
+            device,
+            unique_id,
+            name,
+            template.device_class,
+            template.native_unit_of_measurement,
+            hass_data[COALESCER_KEY],
+            hass_data[CHANGE_FILTER_KEY],
+            hass_data.get(DOWNSAMPLER_KEY),
+            template.state_class,
+        )
+
+    def add_new_entities(
         self,
-        type: str,
         hass_data: dict,
-        new_sensors: list[ChirpstackSensor | ChirpstackBinarySensor],
-        func_key: str,
-        pending_key: str,
+        new_sensors: list[ChirpstackSensor],
+        new_binary_sensors: list[ChirpstackBinarySensor],
     ):
-        if not new_sensors:
-            return
+        """Queue new sensors and binary sensors for registration."""
+        hass_data[REGISTRAR_KEY].add(new_sensors, new_binary_sensors)
 
-        add_entities_func: AddConfigEntryEntitiesCallback = hass_data.get(func_key)
-        if add_entities_func:
-            _LOGGER.info(f"Adding {len(new_sensors)} {type}")
-            try:
-                add_entities_func(new_sensors)
-                _LOGGER.info(
-                    f"Successfully added {type}: {[s.name for s in new_sensors]}"
-                )
-                return
-            except Exception as e:
-                _LOGGER.error(f"Error adding {type}: {e}")
-                _LOGGER.info(f"Falling back to queuing {type}")
-                # fallthrough
 
-        _LOGGER.info(f"Queueing {len(new_sensors)} {type} for later addition")
-        hass_data.setdefault(pending_key, []).extend(new_sensors)
+class ChirpstackBatchView(ChirpstackHttpView):
+    """View to replay buffered ChirpStack uplink events in bulk."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the batch view."""
+        super().__init__(*args, **kwargs)
+
+        # view
+        self.name = f"{self.name}{API_BATCH_URL_SUFFIX}"
+        self.url = f"{self.url}{API_BATCH_URL_SUFFIX}"
+
+    async def handle(self, request):
+        hass_data: dict = self.hass.data[DOMAIN][self.entry_id]
+
+        # Check for authentication header if configured
+        if self.header_name and self.header_value:
+            errors = self.ensure_authenticated(request.headers)
+            if errors:
+                hass_data[METRICS_KEY].count_rejection(REJECT_UNAUTHORIZED)
+                return errors
+
+        results: list[dict] = []
+        try:
+            if request.content_type in NDJSON_CONTENT_TYPES:
+                # Process the events line by line as they are streamed in
+                async for line in request.content:
+                    line = line.strip()
+                    if line:
+                        results.append(self.process_item(hass_data, len(results), line))
+            else:
+                max_size = self.max_body_size * MAX_BATCH_BODY_SIZE_FACTOR
+                body: bytes | None = await self.read_body(request, max_size)
+                if body is None:
+                    hass_data[METRICS_KEY].count_rejection(REJECT_TOO_LARGE)
+                    _LOGGER.warning(f"Rejecting batch larger than {max_size} bytes")
+                    return self.json(
+                        {"status": "error", "message": "Payload too large"},
+                        status_code=413,
+                    )
+                try:
+                    events = json_loads(body)
+                except ValueError as e:
+                    _LOGGER.warning(f"Invalid batch payload: {e}")
+                    events = None
+                if not isinstance(events, list):
+                    return self.json(
+                        {"status": "error", "message": "Expected a JSON array"},
+                        status_code=400,
+                    )
+                for index, event in enumerate(events):
+                    results.append(self.process_item(hass_data, index, event))
+        finally:
+            self.flush_new_entities(hass_data)
+
+        return self.json(
+            {
+                "status": "ok",
+                "processed": len(results),
+                "failed": sum(1 for r in results if r["status"] == "error"),
+                "results": results,
+            }
+        )
+
+    def process_item(self, hass_data: dict, index: int, event) -> dict:
+        """Process one uplink event of a batch, returning its result."""
+        try:
+            if isinstance(event, (bytes, str)):
+                # the size limit applies to every line of an NDJSON batch
+                if self.max_body_size and len(event) > self.max_body_size:
+                    hass_data[METRICS_KEY].count_rejection(REJECT_TOO_LARGE)
+                    return {
+                        "index": index,
+                        "status": "error",
+                        "message": "Event too large",
+                    }
+                event = json_loads(event)
+            if not isinstance(event, dict):
+                return {"index": index, "status": "error", "message": "Not an object"}
+
+            # Stamp the updated entities with the original event time
+            event_time = event.get(CS_TIME_KEY)
+            result = self.process_event(
+                hass_data,
+                CS_EVENT_UP,
+                event,
+                event_time if isinstance(event_time, str) else None,
+            )
+        except Exception as e:
+            _LOGGER.warning(f"Error processing batch item {index}: {e}")
+            return {"index": index, "status": "error", "message": str(e)}
+
+        return {"index": index, **result}
+
+    def flush_new_entities(self, hass_data: dict):
+        """Register all entities created by the batch in a single pass."""
+        hass_data[REGISTRAR_KEY].async_flush()
+
+
+class _Route:
+    """The views of a config entry, reachable under its URL suffix."""
+
+    __slots__ = ("entry_id", "view", "batch_view", "requests")
+
+    def __init__(
+        self,
+        entry_id: str,
+        view: ChirpstackHttpView,
+        batch_view: ChirpstackBatchView,
+    ):
+        self.entry_id = entry_id
+        self.view = view
+        self.batch_view = batch_view
+        self.requests = 0
+
+
+class ChirpstackRouter:
+    """Maps URL suffixes to the views of the loaded config entries.
+
+    Home Assistant cannot unregister views, so a single pair of dispatcher
+    views is registered once and entries are added to and removed from this
+    table as they are set up and unloaded.
+    """
+
+    def __init__(self):
+        self._routes: dict[str, _Route] = {}
+        self._suffixes: dict[str, str] = {}  # entry id -> url suffix
+
+        # metrics
+        self.routed = 0
+        self.not_found = 0
+
+    def register(
+        self,
+        url_suffix: str,
+        view: ChirpstackHttpView,
+        batch_view: ChirpstackBatchView,
+    ):
+        """Route a URL suffix to the views of a config entry."""
+        route = self._routes.get(url_suffix)
+        if route is not None and route.entry_id != view.entry_id:
+            raise ValueError(f"URL suffix {url_suffix} is already in use")
+
+        self.unregister(view.entry_id)
+        self._routes[url_suffix] = _Route(view.entry_id, view, batch_view)
+        self._suffixes[view.entry_id] = url_suffix
+
+    def unregister(self, entry_id: str):
+        """Stop routing requests to a config entry."""
+        url_suffix = self._suffixes.pop(entry_id, None)
+        if url_suffix is not None:
+            self._routes.pop(url_suffix, None)
+
+    def get(self, url_suffix: str) -> _Route | None:
+        """Return the route of a URL suffix, counting the lookup."""
+        route = self._routes.get(url_suffix)
+        if route is None:
+            self.not_found += 1
+            return None
+        self.routed += 1
+        route.requests += 1
+        return route
+
+    def stats(self) -> dict:
+        """Return routing counters."""
+        return {
+            "routes": {
+                url_suffix: route.requests for url_suffix, route in self._routes.items()
+            },
+            "routed": self.routed,
+            "not_found": self.not_found,
+        }
+
+
+@callback
+def async_get_router(hass: HomeAssistant) -> ChirpstackRouter:
+    """Return the router, registering the dispatcher views on first use."""
+    domain_data: dict = hass.data.setdefault(DOMAIN, {})
+    router: ChirpstackRouter | None = domain_data.get(ROUTER_KEY)
+    if router is None:
+        router = domain_data[ROUTER_KEY] = ChirpstackRouter()
+        hass.http.register_view(ChirpstackDispatchView(router))
+        hass.http.register_view(ChirpstackDispatchView(router, batch=True))
+    return router
+
+
+class ChirpstackDispatchView(HomeAssistantView):
+    """Single view that dispatches requests to the entry of the URL suffix."""
+
+    requires_auth = False
+
+    def __init__(self, router: ChirpstackRouter, batch: bool = False):
+        """Initialize the dispatcher view."""
+        self._router = router
+        self._batch = batch
+
+        # view
+        url = f"{API_URL_PREFIX}/{{url_suffix}}"
+        self.name = "api:chirpstack_http"
+        self.url = url
+        if batch:
+            self.name = f"{self.name}:batch"
+            self.url = f"{url}{API_BATCH_URL_SUFFIX}"
+
+    async def post(self, request, url_suffix: str):
+        """Hand the request to the view of the config entry."""
+        route = self._router.get(url_suffix)
+        if route is None:
+            return self.json(
+                {"status": "error", "message": "Unknown endpoint"}, status_code=404
+            )
 
-        _LOGGER.debug(f"Current hass_data keys: {list(hass_data.keys())}")
+        view = route.batch_view if self._batch else route.view
+        return await view.post(request)
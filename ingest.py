@@ -0,0 +1,187 @@
+"""Cached ingest plans for the ChirpStack HTTP integration.
+
+The shape of the decoded `object` of a device (or a whole device profile)
+almost never changes between uplinks. An ingest plan is compiled once per
+payload shape and maps each leaf of the payload straight to its flattened
+key, a precomputed value converter and, once bound to a device, the entity
+that receives the value. Keys a profile schema ignores get no plan.
+"""
+
+import logging
+from collections.abc import Callable
+
+from .schema import KeySchema, SchemaTable
+
+_LOGGER = logging.getLogger(__name__)
+
+INGEST_PLAN_CACHE_SIZE = 1024
+
+
+def split_payload(d: dict, values: list) -> tuple:
+    """Walk a nested dict once, returning its shape and collecting leaf values.
+
+    The shape is a hashable fingerprint of the keys. Leaf values are appended
+    to `values` in the same order `flatten_dict` visits them.
+    """
+    shape = []
+    for k, v in d.items():
+        if isinstance(v, dict):
+            shape.append((k, split_payload(v, values)))
+        else:
+            shape.append(k)
+            values.append(v)
+    return tuple(shape)
+
+
+def _flat_keys(shape: tuple, parent_key="", sep="_") -> list[str]:
+    """Return the flattened key of every leaf of a shape, in leaf order."""
+    keys = []
+    for item in shape:
+        if isinstance(item, tuple):
+            k, sub_shape = item
+            new_key = f"{parent_key}{sep}{k}" if parent_key else k
+            keys.extend(_flat_keys(sub_shape, new_key, sep=sep))
+        else:
+            keys.append(f"{parent_key}{sep}{item}" if parent_key else item)
+    return keys
+
+
+class KeyPlan:
+    """Precomputed per-key work shared by all devices of a profile."""
+
+    __slots__ = ("key", "index", "name_suffix", "convert")
+
+    def __init__(self, key: str, index: int, convert: Callable):
+        self.key = key
+        self.index = index
+        self.name_suffix = " ".join(
+            list(map(lambda x: x.capitalize(), key.replace("_", " ").split(" ")))
+        )
+        self.convert = convert
+
+
+class ProfilePlan:
+    """Ingest plan for one payload shape of one device profile."""
+
+    __slots__ = ("shape", "keys")
+
+    def __init__(
+        self,
+        shape: tuple,
+        make_converter: Callable[[str, KeySchema | None], Callable | None],
+        schema_for: Callable[[str], KeySchema | None],
+    ):
+        self.shape = shape
+
+        # Like flatten_dict: a key keeps its first position but its last value
+        leaf_index: dict[str, int] = {}
+        for index, key in enumerate(_flat_keys(shape)):
+            leaf_index[key] = index
+
+        keys = []
+        for key, index in leaf_index.items():
+            convert = make_converter(key, schema_for(key))
+            if convert is not None:
+                keys.append(KeyPlan(key, index, convert))
+        self.keys: tuple[KeyPlan, ...] = tuple(keys)
+
+
+class DevicePlan:
+    """A profile plan bound to the entities of a single device.
+
+    Keys without an entity, e.g. over the limits of the entry, are not bound
+    and their values are skipped.
+    """
+
+    __slots__ = ("shape", "profile_plan", "key_plans", "bindings")
+
+    def __init__(self, profile_plan: ProfilePlan, entities: dict):
+        self.shape = profile_plan.shape
+        self.profile_plan = profile_plan
+        self.key_plans = tuple(
+            key_plan for key_plan in profile_plan.keys if key_plan.key in entities
+        )
+        self.bindings = tuple(
+            (key_plan.index, key_plan.convert, entities[key_plan.key])
+            for key_plan in self.key_plans
+        )
+
+    def apply(self, values: list, event_time: str | None = None):
+        """Push the leaf values of an uplink to the bound entities."""
+        for index, convert, entity in self.bindings:
+            entity.update_state(convert(values[index]), event_time)
+
+
+class IngestPlanCache:
+    """Profile plans shared across devices plus the per-device bindings."""
+
+    def __init__(
+        self,
+        make_converter: Callable[[str, KeySchema | None], Callable | None],
+        schemas: SchemaTable | None = None,
+    ):
+        self._make_converter = make_converter
+        self._schemas = schemas
+        self._profile_plans: dict[tuple[str, tuple], ProfilePlan] = {}
+        self._device_plans: dict[str, DevicePlan] = {}
+        # most recently bound device plan of each profile, used to pre-warm
+        self._profile_templates: dict[str, DevicePlan] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, device_id: str, shape: tuple) -> DevicePlan | None:
+        """Return the device plan if it matches the shape of this uplink."""
+        device_plan = self._device_plans.get(device_id)
+        if device_plan is not None and device_plan.shape == shape:
+            self.hits += 1
+            return device_plan
+        self.misses += 1
+        return None
+
+    def bind(
+        self, device_id: str, profile_name: str, shape: tuple, entities: dict
+    ) -> DevicePlan:
+        """Compile (or reuse) the profile plan and bind it to a device."""
+        profile_key = (profile_name, shape)
+        profile_plan = self._profile_plans.get(profile_key)
+        if profile_plan is None:
+            if len(self._profile_plans) >= INGEST_PLAN_CACHE_SIZE:
+                _LOGGER.debug("Ingest plan cache full, dropping all profile plans")
+                self._profile_plans.clear()
+            _LOGGER.debug("Compiling ingest plan for profile %s", profile_name)
+            profile_plan = ProfilePlan(
+                shape, self._make_converter, self._schema_lookup(profile_name)
+            )
+            self._profile_plans[profile_key] = profile_plan
+
+        device_plan = DevicePlan(profile_plan, entities)
+        self._device_plans[device_id] = device_plan
+        self._profile_templates[profile_name] = device_plan
+        return device_plan
+
+    def _schema_lookup(self, profile_name: str) -> Callable[[str], KeySchema | None]:
+        if self._schemas is None:
+            return lambda key: None
+        return lambda key: self._schemas.lookup(profile_name, key)
+
+    def template(self, profile_name: str) -> DevicePlan | None:
+        """Return a device plan of another device with the same profile."""
+        return self._profile_templates.get(profile_name)
+
+    def invalidate(self, device_id: str):
+        """Forget the plan bound to a device."""
+        device_plan = self._device_plans.pop(device_id, None)
+        if device_plan is None:
+            return
+        for profile_name, template in list(self._profile_templates.items()):
+            if template is device_plan:
+                del self._profile_templates[profile_name]
+
+    def stats(self) -> dict[str, int]:
+        """Return cache counters."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "profile_plans": len(self._profile_plans),
+            "device_plans": len(self._device_plans),
+        }
@@ -0,0 +1,104 @@
+"""Bounded ingest queue for the ChirpStack HTTP integration.
+
+In queue mode the view only authenticates and enqueues the raw body, so
+ChirpStack gets its response right away even when Home Assistant is busy.
+One worker task drains the queue in batches. Processing runs on the event
+loop either way, so more workers would not add throughput, only the risk
+of processing the uplinks of a device out of order.
+"""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from .const import (
+    QUEUE_OVERFLOW_DROP_NEWEST,
+    QUEUE_OVERFLOW_DROP_OLDEST,
+    QUEUE_OVERFLOW_REJECT,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class QueuedEvent:
+    """A raw event waiting to be decoded and processed."""
+
+    event_type: str
+    content_type: str
+    body: bytes
+
+
+class IngestQueue:
+    """Bounded queue of raw events with an overflow policy."""
+
+    def __init__(
+        self,
+        process: Callable[[QueuedEvent], Awaitable[None]],
+        max_size: int,
+        overflow: str = QUEUE_OVERFLOW_REJECT,
+        batch_size: int = 50,
+    ):
+        self._process = process
+        self._queue: asyncio.Queue[QueuedEvent] = asyncio.Queue(max_size)
+        self.overflow = overflow
+        self.batch_size = batch_size
+
+        # metrics
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.max_depth = 0
+
+    def put(self, event: QueuedEvent) -> bool:
+        """Enqueue an event, returning False if it was rejected."""
+        if self._queue.full():
+            if self.overflow == QUEUE_OVERFLOW_DROP_NEWEST:
+                self.dropped += 1
+                return True
+            if self.overflow == QUEUE_OVERFLOW_DROP_OLDEST:
+                self._queue.get_nowait()
+                self.dropped += 1
+            else:
+                self.rejected += 1
+                return False
+
+        self._queue.put_nowait(event)
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    async def run_worker(self):
+        """Drain the queue in batches until cancelled."""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            for event in batch:
+                await self._process(event)
+            self.processed += len(batch)
+            _LOGGER.debug("Processed batch of %d queued events", len(batch))
+
+            # let the request handlers run between batches
+            await asyncio.sleep(0)
+
+    @property
+    def depth(self) -> int:
+        """Number of events waiting in the queue."""
+        return self._queue.qsize()
+
+    def stats(self) -> dict[str, int | str]:
+        """Return queue counters."""
+        return {
+            "depth": self.depth,
+            "max_size": self._queue.maxsize,
+            "max_depth": self.max_depth,
+            "overflow": self.overflow,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,180 @@
+"""Limits on the entities a ChirpStack HTTP entry creates.
+
+A misbehaving codec that puts timestamps or counters into its keys, or
+nests objects deeply, would otherwise create a new entity for every uplink.
+The limits are only checked where new devices and keys are created, so the
+steady state of known devices and keys does not pay for them.
+
+Devices that have not written a state for longer than the idle TTL are
+evicted: their entities are removed, their in-memory state dropped and
+their stored record deleted. A device that comes back is set up again from
+its next uplink, under the same entity ids.
+"""
+
+from datetime import timedelta
+import logging
+import time
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import (
+    AVAILABILITY_KEY,
+    DEDUP_KEY,
+    DEVICE_METADATA_KEY,
+    DEVICES_KEY,
+    DOWNSAMPLER_KEY,
+    INGEST_PLANS_KEY,
+    LINK_QUALITY_KEY,
+    REGISTRAR_KEY,
+    SERIES_IMPORTER_KEY,
+    STORE_KEY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+IDLE_SWEEP_INTERVAL = timedelta(hours=1)
+
+
+class EntityLimits:
+    """Caps on devices per entry, keys per device and nesting depth."""
+
+    def __init__(self, max_devices: int, max_keys_per_device: int, max_depth: int):
+        # 0 disables a limit
+        self.max_devices = max_devices
+        self.max_keys_per_device = max_keys_per_device
+        self.max_depth = max_depth or None
+        # devices already warned about, so a chatty device logs once
+        self._warned: set[str] = set()
+
+        # metrics
+        self.devices_rejected = 0
+        self.keys_rejected = 0
+        self.subtrees_dropped = 0
+        self.devices_evicted = 0
+
+    def _warn_once(self, dev_eui: str, message: str):
+        if dev_eui in self._warned:
+            _LOGGER.debug(message)
+            return
+        if self.max_devices and len(self._warned) >= self.max_devices:
+            self._warned.clear()
+        self._warned.add(dev_eui)
+        _LOGGER.warning(message)
+
+    def allow_device(self, known_devices: dict, dev_eui: str) -> bool:
+        """Check if a device that is not known yet may be added."""
+        if not self.max_devices or len(known_devices) < self.max_devices:
+            return True
+        self.devices_rejected += 1
+        self._warn_once(
+            dev_eui,
+            f"Ignoring device {dev_eui}, the limit of "
+            f"{self.max_devices} devices is reached",
+        )
+        return False
+
+    def allow_key(self, dev_eui: str, entities: dict) -> bool:
+        """Check if a device may get an entity for a new key."""
+        if not self.max_keys_per_device or len(entities) < self.max_keys_per_device:
+            return True
+        self.keys_rejected += 1
+        self._warn_once(
+            dev_eui,
+            f"Ignoring new keys of device {dev_eui}, the limit of "
+            f"{self.max_keys_per_device} keys per device is reached",
+        )
+        return False
+
+    def dropped_subtrees(self, dev_eui: str, keys: list[str]):
+        """Record the objects flattening dropped for being nested too deep."""
+        self.subtrees_dropped += len(keys)
+        self._warn_once(
+            dev_eui,
+            f"Ignoring {', '.join(keys)} of device {dev_eui}, nested deeper "
+            f"than {self.max_depth} levels",
+        )
+
+    def forget(self, dev_eui: str):
+        """Drop what is known about an evicted device."""
+        self._warned.discard(dev_eui)
+
+    def stats(self) -> dict[str, int | None]:
+        """Return limit counters."""
+        return {
+            "max_devices": self.max_devices,
+            "max_keys_per_device": self.max_keys_per_device,
+            "max_depth": self.max_depth,
+            "devices_rejected": self.devices_rejected,
+            "keys_rejected": self.keys_rejected,
+            "subtrees_dropped": self.subtrees_dropped,
+            "devices_evicted": self.devices_evicted,
+        }
+
+
+class IdleDeviceEvictor:
+    """Periodically evict the devices that have been idle for too long."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        hass_data: dict,
+        limits: EntityLimits,
+        ttl: timedelta,
+    ):
+        self.hass = hass
+        self._hass_data = hass_data
+        self._limits = limits
+        self.ttl = ttl.total_seconds()
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Start the sweep timer, returning the callback that stops it."""
+        return async_track_time_interval(
+            self.hass, self._async_sweep, IDLE_SWEEP_INTERVAL
+        )
+
+    @callback
+    def _async_sweep(self, _now=None):
+        """Evict all devices none of whose entities was written within the TTL."""
+        deadline = time.monotonic() - self.ttl
+        idle = [
+            dev_eui
+            for dev_eui, entities in self._hass_data[DEVICES_KEY].items()
+            if max(
+                (entity.last_write or 0.0 for entity in entities.values()), default=0.0
+            )
+            < deadline
+        ]
+        for dev_eui in idle:
+            self.evict(dev_eui)
+        if idle:
+            _LOGGER.info(f"Evicted {len(idle)} devices idle for {self.ttl:.0f} s")
+
+    @callback
+    def evict(self, dev_eui: str):
+        """Remove a device's entities and drop everything kept about it."""
+        hass_data = self._hass_data
+        entities: dict = hass_data[DEVICES_KEY].pop(dev_eui, {})
+        for entity in entities.values():
+            # the registry entries stay, so a returning device keeps its ids
+            if entity.hass is not None:
+                self.hass.async_create_task(entity.async_remove())
+
+        hass_data[DEVICE_METADATA_KEY].pop(dev_eui, None)
+        hass_data[INGEST_PLANS_KEY].invalidate(dev_eui)
+        hass_data[STORE_KEY].remove_device(dev_eui)
+        if hass_data.get(DEDUP_KEY) is not None:
+            hass_data[DEDUP_KEY].reset(dev_eui)
+        for key in (
+            REGISTRAR_KEY,
+            DOWNSAMPLER_KEY,
+            LINK_QUALITY_KEY,
+            AVAILABILITY_KEY,
+            SERIES_IMPORTER_KEY,
+        ):
+            if hass_data.get(key) is not None:
+                hass_data[key].forget(dev_eui)
+        self._limits.forget(dev_eui)
+        self._limits.devices_evicted += 1
+        _LOGGER.debug("Evicted idle device %s with %d entities", dev_eui, len(entities))
@@ -0,0 +1,161 @@
+"""Rolling link-quality statistics for the ChirpStack HTTP integration.
+
+Every uplink is reported by one or more gateways in `rxInfo`. Per device, the
+best RSSI and SNR, the number of receiving gateways and the spreading factor
+are kept in fixed-size ring buffers, so the rolling min, mean and max are
+available without querying the recorder and memory does not grow with the
+number of uplinks.
+"""
+
+from array import array
+from collections import deque
+
+from .const import (
+    CS_MODULATION_KEY,
+    CS_MODULATION_LORA_KEY,
+    CS_RSSI_KEY,
+    CS_SNR_KEY,
+    CS_SPREADING_FACTOR_KEY,
+)
+
+LINK_RSSI = "rssi"
+LINK_SNR = "snr"
+LINK_GATEWAYS = "gateways"
+LINK_SPREADING_FACTOR = "spreading_factor"
+
+LINK_METRICS = (LINK_RSSI, LINK_SNR, LINK_GATEWAYS, LINK_SPREADING_FACTOR)
+
+# "CLASS,unit" hints of the link quality keys, see detect_sensor_unit
+LINK_TYPE_HINTS = {
+    f"link_{metric}_{stat}": hint
+    for metric, hint in (
+        (LINK_RSSI, "SIGNAL_STRENGTH,dBm"),
+        (LINK_SNR, "SIGNAL_STRENGTH,dB"),
+    )
+    for stat in ("min", "mean", "max")
+}
+
+
+class RollingStats:
+    """Rolling min, mean and max over the last `size` samples.
+
+    The samples live in an array ring, the mean comes from a running sum and
+    min/max from monotonic queues, so adding a sample is amortized O(1).
+    """
+
+    __slots__ = ("_values", "_count", "_sum", "_mins", "_maxs")
+
+    def __init__(self, size: int):
+        self._values = array("d", [0.0] * size)
+        self._count = 0
+        self._sum = 0.0
+        # (sequence number, value), increasing resp. decreasing by value
+        self._mins: deque[tuple[int, float]] = deque()
+        self._maxs: deque[tuple[int, float]] = deque()
+
+    def add(self, value: float):
+        """Add a sample, dropping the oldest one once the window is full."""
+        value = float(value)
+        size = len(self._values)
+        sequence = self._count
+        position = sequence % size
+        if sequence >= size:
+            self._sum -= self._values[position]
+        self._values[position] = value
+        self._count += 1
+
+        if position == size - 1:
+            # resum once per round so float errors cannot accumulate
+            self._sum = sum(self._values)
+        else:
+            self._sum += value
+
+        oldest = sequence - size
+        for queue, worse in (
+            (self._mins, value.__le__),
+            (self._maxs, value.__ge__),
+        ):
+            while queue and worse(queue[-1][1]):
+                queue.pop()
+            queue.append((sequence, value))
+            if queue[0][0] <= oldest:
+                queue.popleft()
+
+    def __len__(self) -> int:
+        return min(self._count, len(self._values))
+
+    @property
+    def min(self) -> float | None:
+        return self._mins[0][1] if self._mins else None
+
+    @property
+    def max(self) -> float | None:
+        return self._maxs[0][1] if self._maxs else None
+
+    @property
+    def mean(self) -> float | None:
+        return self._sum / len(self) if self._count else None
+
+
+class DeviceLinkQuality:
+    """Rolling link statistics of one device."""
+
+    __slots__ = LINK_METRICS
+
+    def __init__(self, size: int):
+        for metric in LINK_METRICS:
+            setattr(self, metric, RollingStats(size))
+
+    def as_states(self) -> dict[str, float]:
+        """Return the min, mean and max of every metric with samples."""
+        states = {}
+        for metric in LINK_METRICS:
+            stats: RollingStats = getattr(self, metric)
+            if len(stats):
+                states[f"link_{metric}_min"] = stats.min
+                states[f"link_{metric}_mean"] = round(stats.mean, 1)
+                states[f"link_{metric}_max"] = stats.max
+        return states
+
+
+class LinkQualityTracker:
+    """Track the link quality of all devices from their uplinks' rx/tx info."""
+
+    def __init__(self, window_size: int):
+        self.window_size = window_size
+        self._devices: dict[str, DeviceLinkQuality] = {}
+        self.observed = 0
+
+    def observe(self, dev_eui: str, rx_infos: list[dict], tx_info: dict) -> dict:
+        """Record an uplink and return the device's current link statistics."""
+        device = self._devices.get(dev_eui)
+        if device is None:
+            device = self._devices[dev_eui] = DeviceLinkQuality(self.window_size)
+
+        rssis = [rx[CS_RSSI_KEY] for rx in rx_infos if CS_RSSI_KEY in rx]
+        if rssis:
+            device.rssi.add(max(rssis))
+        snrs = [rx[CS_SNR_KEY] for rx in rx_infos if CS_SNR_KEY in rx]
+        if snrs:
+            device.snr.add(max(snrs))
+        device.gateways.add(len(rx_infos))
+
+        lora = tx_info.get(CS_MODULATION_KEY, {}).get(CS_MODULATION_LORA_KEY, {})
+        spreading_factor = lora.get(CS_SPREADING_FACTOR_KEY)
+        if spreading_factor is not None:
+            device.spreading_factor.add(spreading_factor)
+
+        self.observed += 1
+        return device.as_states()
+
+    def forget(self, dev_eui: str):
+        """Drop the statistics of an evicted device."""
+        self._devices.pop(dev_eui, None)
+
+    def stats(self) -> dict[str, int]:
+        """Return tracker counters."""
+        return {
+            "devices": len(self._devices),
+            "window_size": self.window_size,
+            "observed": self.observed,
+        }
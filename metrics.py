@@ -0,0 +1,138 @@
+"""Lightweight pipeline instrumentation for the ChirpStack HTTP integration.
+
+Latencies are counted into fixed buckets, so recording a sample is a
+bisect and an increment, and memory does not grow with the request rate.
+Percentiles are estimated as the upper bound of the bucket they fall in.
+"""
+
+import math
+from bisect import bisect_left
+from collections import Counter
+
+# Bucket upper bounds in milliseconds
+BUCKETS_MS = (
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    25.0,
+    50.0,
+    100.0,
+    250.0,
+    500.0,
+    1000.0,
+    2500.0,
+    math.inf,
+)
+
+STAGE_READ = "read"
+STAGE_PARSE = "parse"
+STAGE_FLATTEN = "flatten"
+STAGE_CLASSIFY = "classify"
+STAGE_CREATE_OR_UPDATE = "create_or_update"
+STAGE_ADD_ENTITIES = "add_entities"
+STAGE_STATE_WRITE = "state_write"
+STAGE_TOTAL = "total"
+
+STAGES = (
+    STAGE_READ,
+    STAGE_PARSE,
+    STAGE_FLATTEN,
+    STAGE_CLASSIFY,
+    STAGE_CREATE_OR_UPDATE,
+    STAGE_ADD_ENTITIES,
+    STAGE_STATE_WRITE,
+    STAGE_TOTAL,
+)
+
+PERCENTILES = (50, 95, 99)
+
+# Reasons requests and events are rejected for
+REJECT_UNAUTHORIZED = "unauthorized"
+REJECT_TOO_LARGE = "too_large"
+REJECT_INVALID_PAYLOAD = "invalid_payload"
+REJECT_NO_DEVICE_INFO = "no_device_info"
+REJECT_NO_DEV_EUI = "no_dev_eui"
+REJECT_INVALID_OBJECT = "invalid_object"
+REJECT_QUEUE_FULL = "queue_full"
+
+
+class Histogram:
+    """Fixed-bucket latency histogram."""
+
+    __slots__ = ("counts", "count", "sum_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float):
+        """Record a duration given in seconds."""
+        ms = seconds * 1000
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, percent: float) -> float | None:
+        """Return the bucket bound below which percent of the samples fall."""
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bound, bucket_count in zip(BUCKETS_MS, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.max_ms if bound == math.inf else bound
+        return self.max_ms
+
+    def as_dict(self) -> dict:
+        """Return a summary of the histogram."""
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum_ms / self.count, 3) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            **{f"p{p}_ms": self.percentile(p) for p in PERCENTILES},
+            "buckets": {
+                ("inf" if bound == math.inf else str(bound)): bucket_count
+                for bound, bucket_count in zip(BUCKETS_MS, self.counts)
+            },
+        }
+
+
+class PipelineMetrics:
+    """Per-stage latency histograms, response and rejection counts of an entry."""
+
+    def __init__(self):
+        self.stages: dict[str, Histogram] = {stage: Histogram() for stage in STAGES}
+        self.responses: Counter[int] = Counter()
+        self.rejections: Counter[str] = Counter()
+
+    def observe(self, stage: str, seconds: float):
+        """Record the duration of a pipeline stage."""
+        self.stages[stage].observe(seconds)
+
+    def count_response(self, status: int):
+        """Count a response by HTTP status."""
+        self.responses[status] += 1
+
+    def count_rejection(self, reason: str):
+        """Count a rejected request or event by reason."""
+        self.rejections[reason] += 1
+
+    def as_dict(self) -> dict:
+        """Return all metrics as plain data."""
+        return {
+            "responses": {str(status): n for status, n in self.responses.items()},
+            "rejections": dict(self.rejections),
+            "stages": {
+                stage: histogram.as_dict() for stage, histogram in self.stages.items()
+            },
+        }
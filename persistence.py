@@ -0,0 +1,154 @@
+"""Incremental persistence of device metadata for the ChirpStack HTTP integration.
+
+Every config entry gets its own store holding plain device and key metadata
+plus the last values. Only devices marked dirty are re-serialized, and the
+file is written through Home Assistant's delayed save, so bursts of uplinks
+result in a single write (and a final write on shutdown).
+"""
+
+import logging
+import time
+from collections.abc import Iterable, Iterator
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.json import json_bytes
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    CS_DEVICE_NAME_KEY,
+    CS_DEVICE_PROFILE_NAME_KEY,
+    CS_TENANT_NAME_KEY,
+    LEGACY_STORAGE_KEY,
+    RECORD_PLATFORM_KEY,
+    STORAGE_KEY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 15 * 60  # seconds between the first change and the write
+
+RECORD_INFO_KEY = "info"
+RECORD_KEYS_KEY = "keys"
+
+
+class DeviceStore:
+    """Per-entry persistence of device metadata with dirty tracking."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, entities: dict):
+        self._store = Store(hass, STORAGE_VERSION, f"{STORAGE_KEY}.{entry_id}")
+        # live entities by device, the source of the records
+        self._entities = entities
+        # dev_eui -> {"info": {...}, "keys": {key: {...}}}
+        self.devices: dict[str, dict] = {}
+        self._dirty: set[str] = set()
+        # serialized size of every record, updated when a record is rebuilt
+        self._record_sizes: dict[str, int] = {}
+
+        # metrics
+        self.saves = 0
+        self.last_save_devices = 0
+        self.last_build_duration = 0.0
+        self.last_save_size = 0
+        self.last_flush_duration = 0.0
+
+    async def async_load(self):
+        """Load the stored device records."""
+        data = await self._store.async_load() or {}
+        self.devices = data.get("devices", {})
+        self._record_sizes = {
+            device_id: len(json_bytes(record))
+            for device_id, record in self.devices.items()
+        }
+        _LOGGER.debug(f"Loaded {len(self.devices)} stored devices")
+
+    @callback
+    def mark_dirty(self, device_id: str):
+        """Schedule a save including the current state of a device."""
+        if not self._dirty:
+            # Only schedule on the first change, async_delay_save restarts the
+            # timer on every call and would never fire under constant load
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+        self._dirty.add(device_id)
+
+    @callback
+    def mark_entities_dirty(self, entities: Iterable[Entity]):
+        """Mark the devices of the given entities dirty."""
+        for entity in entities:
+            self.mark_dirty(entity.device_id)
+
+    @callback
+    def _data_to_save(self) -> dict:
+        start = time.perf_counter()
+        dirty, self._dirty = self._dirty, set()
+        for device_id in dirty:
+            entities = self._entities.get(device_id)
+            if entities:
+                record = self.devices[device_id] = self._build_record(entities)
+                self._record_sizes[device_id] = len(json_bytes(record))
+
+        self.saves += 1
+        self.last_save_devices = len(dirty)
+        self.last_save_size = sum(self._record_sizes.values())
+        self.last_build_duration = time.perf_counter() - start
+        return {"devices": self.devices}
+
+    @staticmethod
+    def _build_record(entities: dict) -> dict:
+        device_info = next(iter(entities.values())).device_info or {}
+        info = {
+            CS_DEVICE_NAME_KEY: device_info.get("name"),
+            CS_TENANT_NAME_KEY: device_info.get("manufacturer"),
+            CS_DEVICE_PROFILE_NAME_KEY: device_info.get("model"),
+        }
+        return {
+            RECORD_INFO_KEY: {k: v for k, v in info.items() if v is not None},
+            RECORD_KEYS_KEY: {
+                key: entity.to_record() for key, entity in entities.items()
+            },
+        }
+
+    @callback
+    def remove_device(self, device_id: str):
+        """Delete the record of a device, e.g. after it was evicted."""
+        self._dirty.discard(device_id)
+        self._record_sizes.pop(device_id, None)
+        if self.devices.pop(device_id, None) is not None:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def iter_records(self, platform: str) -> Iterator[tuple[str, dict, str, dict]]:
+        """Yield (device id, device info, key, key record) of a platform."""
+        for device_id, record in self.devices.items():
+            info = record.get(RECORD_INFO_KEY, {})
+            for key, key_record in record.get(RECORD_KEYS_KEY, {}).items():
+                if key_record.get(RECORD_PLATFORM_KEY) == platform:
+                    yield device_id, info, key, key_record
+
+    async def async_flush(self):
+        """Write pending changes now, e.g. on unload."""
+        if self._dirty:
+            start = time.perf_counter()
+            await self._store.async_save(self._data_to_save())
+            self.last_flush_duration = time.perf_counter() - start
+
+    async def async_remove(self):
+        """Remove the store file."""
+        await self._store.async_remove()
+
+    def stats(self) -> dict[str, int | float]:
+        """Return persistence counters."""
+        return {
+            "devices": len(self.devices),
+            "dirty_devices": len(self._dirty),
+            "saves": self.saves,
+            "last_save_devices": self.last_save_devices,
+            "last_build_ms": round(self.last_build_duration * 1000, 3),
+            "last_save_bytes": self.last_save_size,
+            "last_flush_ms": round(self.last_flush_duration * 1000, 3),
+        }
+
+
+async def async_remove_legacy_store(hass: HomeAssistant):
+    """Remove the store that earlier versions shared between all entries."""
+    await Store(hass, STORAGE_VERSION, LEGACY_STORAGE_KEY).async_remove()
@@ -0,0 +1,318 @@
+"""Minimal Protobuf decoder for ChirpStack integration events.
+
+ChirpStack's HTTP integration can marshal events as Protobuf instead of
+JSON. This module decodes the `integration.UplinkEvent` message into the
+same dict structure the JSON marshaler produces (camelCase keys, base64
+bytes, RFC 3339 timestamps, `object` as plain JSON values), so the rest of
+the pipeline does not care which encoding was used.
+
+Only the wire format and the fields this integration uses are implemented,
+which avoids a dependency on the protobuf runtime and generated classes.
+Unknown fields are skipped.
+"""
+
+import base64
+import struct
+from datetime import datetime, timezone
+
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_LEN = 2
+WIRE_FIXED32 = 5
+
+_DOUBLE = struct.Struct("<d")
+_FLOAT = struct.Struct("<f")
+
+# Largest integer a double holds exactly
+_MAX_SAFE_INTEGER = 2**53
+
+
+class ProtobufDecodeError(ValueError):
+    """Raised when a payload is not a valid Protobuf message."""
+
+
+def _read_varint(buf: bytes, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise ProtobufDecodeError("Varint too long")
+
+
+def _skip(buf: bytes, pos: int, wire_type: int) -> int:
+    if wire_type == WIRE_VARINT:
+        return _read_varint(buf, pos)[1]
+    if wire_type == WIRE_FIXED64:
+        return pos + 8
+    if wire_type == WIRE_LEN:
+        length, pos = _read_varint(buf, pos)
+        return pos + length
+    if wire_type == WIRE_FIXED32:
+        return pos + 4
+    raise ProtobufDecodeError(f"Unsupported wire type {wire_type}")
+
+
+def _iter_fields(buf: bytes, pos: int, end: int):
+    """Yield (field number, wire type, value or (start, end)) of a message."""
+    while pos < end:
+        tag, pos = _read_varint(buf, pos)
+        field_number = tag >> 3
+        wire_type = tag & 0x07
+        if wire_type == WIRE_VARINT:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == WIRE_LEN:
+            length, pos = _read_varint(buf, pos)
+            value = (pos, pos + length)
+            pos += length
+        elif wire_type == WIRE_FIXED64:
+            value = (pos, pos + 8)
+            pos += 8
+        elif wire_type == WIRE_FIXED32:
+            value = (pos, pos + 4)
+            pos += 4
+        else:
+            pos = _skip(buf, pos, wire_type)
+            continue
+        if pos > end:
+            raise ProtobufDecodeError("Truncated message")
+        yield field_number, wire_type, value
+
+
+def _int32(value: int) -> int:
+    # negative int32/int64 are sign extended to 64 bit varints
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+# Field kinds
+_STRING = "string"
+_BYTES = "bytes"
+_UINT = "uint"
+_INT = "int"
+_BOOL = "bool"
+_FLOAT_KIND = "float"
+_DOUBLE_KIND = "double"
+_MESSAGE = "message"
+_STRUCT = "struct"
+_TIMESTAMP = "timestamp"
+_STRING_MAP = "string_map"
+
+# schema: field number -> (json name, kind, sub schema, repeated)
+_LOCATION = {
+    1: ("latitude", _DOUBLE_KIND, None, False),
+    2: ("longitude", _DOUBLE_KIND, None, False),
+    3: ("altitude", _DOUBLE_KIND, None, False),
+    5: ("accuracy", _FLOAT_KIND, None, False),
+}
+
+_DEVICE_INFO = {
+    1: ("tenantId", _STRING, None, False),
+    2: ("tenantName", _STRING, None, False),
+    3: ("applicationId", _STRING, None, False),
+    4: ("applicationName", _STRING, None, False),
+    5: ("deviceProfileId", _STRING, None, False),
+    6: ("deviceProfileName", _STRING, None, False),
+    7: ("deviceName", _STRING, None, False),
+    8: ("devEui", _STRING, None, False),
+    9: ("tags", _STRING_MAP, None, False),
+}
+
+_UPLINK_RX_INFO = {
+    1: ("gatewayId", _STRING, None, False),
+    2: ("uplinkId", _UINT, None, False),
+    3: ("gwTime", _TIMESTAMP, None, False),
+    6: ("rssi", _INT, None, False),
+    7: ("snr", _FLOAT_KIND, None, False),
+    8: ("channel", _UINT, None, False),
+    9: ("rfChain", _UINT, None, False),
+    10: ("board", _UINT, None, False),
+    11: ("antenna", _UINT, None, False),
+    12: ("location", _MESSAGE, _LOCATION, False),
+    14: ("metadata", _STRING_MAP, None, False),
+}
+
+_LORA_MODULATION_INFO = {
+    1: ("bandwidth", _UINT, None, False),
+    2: ("spreadingFactor", _UINT, None, False),
+}
+
+_MODULATION = {
+    3: ("lora", _MESSAGE, _LORA_MODULATION_INFO, False),
+}
+
+_UPLINK_TX_INFO = {
+    1: ("frequency", _UINT, None, False),
+    2: ("modulation", _MESSAGE, _MODULATION, False),
+}
+
+_UPLINK_EVENT = {
+    1: ("deduplicationId", _STRING, None, False),
+    2: ("time", _TIMESTAMP, None, False),
+    3: ("deviceInfo", _MESSAGE, _DEVICE_INFO, False),
+    4: ("devAddr", _STRING, None, False),
+    5: ("adr", _BOOL, None, False),
+    6: ("dr", _UINT, None, False),
+    7: ("fCnt", _UINT, None, False),
+    8: ("fPort", _UINT, None, False),
+    9: ("confirmed", _BOOL, None, False),
+    10: ("data", _BYTES, None, False),
+    11: ("object", _STRUCT, None, False),
+    12: ("rxInfo", _MESSAGE, _UPLINK_RX_INFO, True),
+    13: ("txInfo", _MESSAGE, _UPLINK_TX_INFO, False),
+    14: ("regionConfigId", _STRING, None, False),
+}
+
+_STATUS_EVENT = {
+    1: ("deduplicationId", _STRING, None, False),
+    2: ("time", _TIMESTAMP, None, False),
+    3: ("deviceInfo", _MESSAGE, _DEVICE_INFO, False),
+    5: ("margin", _INT, None, False),
+    6: ("externalPowerSource", _BOOL, None, False),
+    7: ("batteryLevelUnavailable", _BOOL, None, False),
+    8: ("batteryLevel", _FLOAT_KIND, None, False),
+}
+
+_JOIN_EVENT = {
+    1: ("deduplicationId", _STRING, None, False),
+    2: ("time", _TIMESTAMP, None, False),
+    3: ("deviceInfo", _MESSAGE, _DEVICE_INFO, False),
+    4: ("devAddr", _STRING, None, False),
+}
+
+
+def _decode_timestamp(buf: bytes, pos: int, end: int) -> str:
+    seconds = 0
+    nanos = 0
+    for field_number, _, value in _iter_fields(buf, pos, end):
+        if field_number == 1:
+            seconds = _int32(value)
+        elif field_number == 2:
+            nanos = value
+    dt = datetime.fromtimestamp(seconds, timezone.utc)
+    if nanos:
+        return f"{dt.strftime('%Y-%m-%dT%H:%M:%S')}.{nanos:09d}Z"
+    return f"{dt.strftime('%Y-%m-%dT%H:%M:%S')}Z"
+
+
+def _decode_string_map(buf: bytes, pos: int, end: int) -> tuple[str, str]:
+    key = ""
+    value = ""
+    for field_number, _, (start, stop) in _iter_fields(buf, pos, end):
+        if field_number == 1:
+            key = buf[start:stop].decode()
+        elif field_number == 2:
+            value = buf[start:stop].decode()
+    return key, value
+
+
+def _decode_value(buf: bytes, pos: int, end: int):
+    """Decode a google.protobuf.Value into a plain JSON value."""
+    result = None
+    for field_number, wire_type, value in _iter_fields(buf, pos, end):
+        if field_number == 1:
+            result = None
+        elif field_number == 2 and wire_type == WIRE_FIXED64:
+            result = _DOUBLE.unpack_from(buf, value[0])[0]
+            # Value only has doubles, JSON marshals integral ones as integers
+            if result.is_integer() and abs(result) <= _MAX_SAFE_INTEGER:
+                result = int(result)
+        elif field_number == 3:
+            result = buf[value[0] : value[1]].decode()
+        elif field_number == 4:
+            result = bool(value)
+        elif field_number == 5:
+            result = _decode_struct(buf, *value)
+        elif field_number == 6:
+            result = [
+                _decode_value(buf, *item)
+                for number, _, item in _iter_fields(buf, *value)
+                if number == 1
+            ]
+    return result
+
+
+def _decode_struct(buf: bytes, pos: int, end: int) -> dict:
+    """Decode a google.protobuf.Struct into a dict."""
+    result = {}
+    for field_number, _, (start, stop) in _iter_fields(buf, pos, end):
+        if field_number != 1:
+            continue
+        key = ""
+        value = None
+        for entry_number, _, entry in _iter_fields(buf, start, stop):
+            if entry_number == 1:
+                key = buf[entry[0] : entry[1]].decode()
+            elif entry_number == 2:
+                value = _decode_value(buf, *entry)
+        result[key] = value
+    return result
+
+
+def _decode_message(buf: bytes, pos: int, end: int, schema: dict) -> dict:
+    result = {}
+    for field_number, wire_type, value in _iter_fields(buf, pos, end):
+        field = schema.get(field_number)
+        if field is None:
+            continue
+        name, kind, sub_schema, repeated = field
+
+        if kind == _STRING:
+            decoded = buf[value[0] : value[1]].decode()
+        elif kind == _UINT:
+            decoded = value
+        elif kind == _INT:
+            decoded = _int32(value)
+        elif kind == _BOOL:
+            decoded = bool(value)
+        elif kind == _FLOAT_KIND and wire_type == WIRE_FIXED32:
+            # float32 has ~7 significant digits, drop the widening noise
+            decoded = float(f"{_FLOAT.unpack_from(buf, value[0])[0]:.7g}")
+        elif kind == _DOUBLE_KIND and wire_type == WIRE_FIXED64:
+            decoded = _DOUBLE.unpack_from(buf, value[0])[0]
+        elif kind == _BYTES:
+            decoded = base64.b64encode(buf[value[0] : value[1]]).decode()
+        elif kind == _MESSAGE:
+            decoded = _decode_message(buf, value[0], value[1], sub_schema)
+        elif kind == _STRUCT:
+            decoded = _decode_struct(buf, *value)
+        elif kind == _TIMESTAMP:
+            decoded = _decode_timestamp(buf, *value)
+        elif kind == _STRING_MAP:
+            key, map_value = _decode_string_map(buf, *value)
+            result.setdefault(name, {})[key] = map_value
+            continue
+        else:
+            continue
+
+        if repeated:
+            result.setdefault(name, []).append(decoded)
+        else:
+            result[name] = decoded
+    return result
+
+
+def _decode_event(payload: bytes, schema: dict, message_name: str) -> dict:
+    try:
+        return _decode_message(payload, 0, len(payload), schema)
+    except (IndexError, TypeError, UnicodeDecodeError, struct.error) as e:
+        raise ProtobufDecodeError(f"Invalid {message_name} payload: {e}") from e
+
+
+def decode_uplink_event(payload: bytes) -> dict:
+    """Decode a Protobuf `integration.UplinkEvent` into its JSON structure."""
+    return _decode_event(payload, _UPLINK_EVENT, "UplinkEvent")
+
+
+def decode_status_event(payload: bytes) -> dict:
+    """Decode a Protobuf `integration.StatusEvent` into its JSON structure."""
+    return _decode_event(payload, _STATUS_EVENT, "StatusEvent")
+
+
+def decode_join_event(payload: bytes) -> dict:
+    """Decode a Protobuf `integration.JoinEvent` into its JSON structure."""
+    return _decode_event(payload, _JOIN_EVENT, "JoinEvent")
@@ -0,0 +1,183 @@
+"""Batched registration of new entities for the ChirpStack HTTP integration."""
+
+import logging
+import time
+from datetime import timedelta
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    ADD_BINARY_SENSOR_ENTITIES_FUNC_KEY,
+    ADD_SENSOR_ENTITIES_FUNC_KEY,
+    PENDING_BINARY_SENSORS_KEY,
+    PENDING_SENSORS_KEY,
+)
+from .metrics import STAGE_ADD_ENTITIES, Histogram, PipelineMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class EntityRegistrar:
+    """Collect new entities and register them once per platform and window.
+
+    When many devices join at once, e.g. after a network server restart,
+    every uplink creates entities. Registering them per uplink means one
+    async_add_entities call per uplink and platform. Instead they are queued,
+    keyed by unique id so an entity is only registered once, and added with
+    one call per platform when the window closes.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        hass_data: dict,
+        window: timedelta,
+        metrics: PipelineMetrics | None = None,
+    ):
+        self.hass = hass
+        self._hass_data = hass_data
+        self.window = window
+        self._metrics = metrics
+        # unique id -> entity, per platform
+        self._sensors: dict[str, Entity] = {}
+        self._binary_sensors: dict[str, Entity] = {}
+        self._queued_since: float | None = None
+        self._cancel_flush: CALLBACK_TYPE | None = None
+
+        # metrics
+        self.entities_queued = 0
+        self.entities_registered = 0
+        self.duplicates_dropped = 0
+        self.flushes = 0
+        self.max_queue_size = 0
+        self.flush_latency = Histogram()
+
+    @property
+    def queue_size(self) -> int:
+        """Number of entities waiting for registration."""
+        return len(self._sensors) + len(self._binary_sensors)
+
+    @callback
+    def add(self, new_sensors: list[Entity], new_binary_sensors: list[Entity]):
+        """Queue new entities for the next registration."""
+        if not new_sensors and not new_binary_sensors:
+            return
+
+        self._queue(self._sensors, new_sensors)
+        self._queue(self._binary_sensors, new_binary_sensors)
+        self.max_queue_size = max(self.max_queue_size, self.queue_size)
+
+        if self._queued_since is None:
+            self._queued_since = time.monotonic()
+        if not self.window:
+            self.async_flush()
+        elif self._cancel_flush is None:
+            self._cancel_flush = async_call_later(
+                self.hass, self.window, self._async_scheduled_flush
+            )
+
+    def _queue(self, queue: dict[str, Entity], entities: list[Entity]):
+        for entity in entities:
+            self.entities_queued += 1
+            if entity.unique_id in queue:
+                # the newer entity is the one the device's uplinks update
+                self.duplicates_dropped += 1
+            queue[entity.unique_id] = entity
+
+    @callback
+    def _async_scheduled_flush(self, _now=None):
+        self._cancel_flush = None
+        self.async_flush()
+
+    @callback
+    def async_flush(self):
+        """Register all queued entities now."""
+        if self._cancel_flush is not None:
+            self._cancel_flush()
+            self._cancel_flush = None
+
+        sensors, self._sensors = self._sensors, {}
+        binary_sensors, self._binary_sensors = self._binary_sensors, {}
+        queued_since, self._queued_since = self._queued_since, None
+        if not sensors and not binary_sensors:
+            return
+
+        self.flushes += 1
+        start = time.perf_counter()
+        self._register(
+            "sensors",
+            [entity for entity in sensors.values() if entity.hass is None],
+            ADD_SENSOR_ENTITIES_FUNC_KEY,
+            PENDING_SENSORS_KEY,
+        )
+        self._register(
+            "binary sensors",
+            [entity for entity in binary_sensors.values() if entity.hass is None],
+            ADD_BINARY_SENSOR_ENTITIES_FUNC_KEY,
+            PENDING_BINARY_SENSORS_KEY,
+        )
+        if self._metrics is not None:
+            self._metrics.observe(STAGE_ADD_ENTITIES, time.perf_counter() - start)
+        if queued_since is not None:
+            self.flush_latency.observe(time.monotonic() - queued_since)
+
+    def _register(
+        self,
+        type: str,
+        new_entities: list[Entity],
+        func_key: str,
+        pending_key: str,
+    ):
+        if not new_entities:
+            return
+
+        add_entities_func: AddConfigEntryEntitiesCallback = self._hass_data.get(
+            func_key
+        )
+        if add_entities_func:
+            _LOGGER.info(f"Adding {len(new_entities)} {type}")
+            try:
+                add_entities_func(new_entities)
+                self.entities_registered += len(new_entities)
+                if _LOGGER.isEnabledFor(logging.DEBUG):
+                    _LOGGER.debug(
+                        f"Successfully added {type}: {[e.name for e in new_entities]}"
+                    )
+                return
+            except Exception as e:
+                _LOGGER.error(f"Error adding {type}: {e}")
+                _LOGGER.info(f"Falling back to queuing {type}")
+                # fallthrough
+
+        _LOGGER.info(f"Queueing {len(new_entities)} {type} for later addition")
+        self._hass_data.setdefault(pending_key, []).extend(new_entities)
+
+    def forget(self, dev_eui: str):
+        """Drop the queued entities of an evicted device."""
+        for queue in (self._sensors, self._binary_sensors):
+            for unique_id in [
+                unique_id
+                for unique_id, entity in queue.items()
+                if entity.device_id == dev_eui
+            ]:
+                del queue[unique_id]
+
+    def stats(self) -> dict[str, int | float | None]:
+        """Return registration counters."""
+        return {
+            "window_ms": self.window.total_seconds() * 1000,
+            "queue_size": self.queue_size,
+            "max_queue_size": self.max_queue_size,
+            "entities_queued": self.entities_queued,
+            "entities_registered": self.entities_registered,
+            "duplicates_dropped": self.duplicates_dropped,
+            "flushes": self.flushes,
+            "flush_latency_ms": {
+                f"p{percent}": self.flush_latency.percentile(percent)
+                for percent in (50, 99)
+            },
+            "max_flush_latency_ms": round(self.flush_latency.max_ms, 3),
+        }
@@ -0,0 +1,174 @@
+"""Per device profile schemas for the ChirpStack HTTP integration.
+
+The heuristics in helpers.py guess the device class and unit of a key from
+its name. A schema states them instead, per deviceProfileName, in the
+`schemas` option or in configuration.yaml:
+
+    chirpstack_http:
+      schemas:
+        "Dragino LHT65":
+          TempC_SHT: {device_class: temperature, unit: "°C"}
+          BatV: {device_class: voltage, unit: V, state_class: measurement}
+          ILL_lx: {device_class: illuminance, unit: lx, scale: 10}
+          temperatures: {device_class: temperature, unit: "°C", sample_interval: 60}
+          Ext_sensor: {ignore: true}
+          ext:
+            co2: {device_class: carbon_dioxide, unit: ppm}
+
+Nested keys are flattened like the payload, `ext: {co2: ...}` applies to
+`ext_co2`. `sample_interval` spaces the samples of array values, see
+series.py. The schemas are compiled once into a lookup table, keys without
+an entry fall back to the heuristics.
+"""
+
+import logging
+
+from homeassistant.components.binary_sensor import BinarySensorDeviceClass
+from homeassistant.components.sensor import SensorDeviceClass, SensorStateClass
+
+from .const import (
+    SCHEMA_DEVICE_CLASS_KEY,
+    SCHEMA_IGNORE_KEY,
+    SCHEMA_SAMPLE_INTERVAL_KEY,
+    SCHEMA_SCALE_KEY,
+    SCHEMA_STATE_CLASS_KEY,
+    SCHEMA_UNIT_KEY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+SCHEMA_FIELDS = (
+    SCHEMA_DEVICE_CLASS_KEY,
+    SCHEMA_UNIT_KEY,
+    SCHEMA_STATE_CLASS_KEY,
+    SCHEMA_SCALE_KEY,
+    SCHEMA_IGNORE_KEY,
+    SCHEMA_SAMPLE_INTERVAL_KEY,
+)
+
+
+def _enum_or_none(enum, value):
+    if value is None:
+        return None
+    try:
+        return enum(str(value).lower())
+    except ValueError:
+        return None
+
+
+class KeySchema:
+    """Compiled schema of one key of a device profile."""
+
+    __slots__ = (
+        "sensor_device_class",
+        "binary_device_class",
+        "unit",
+        "state_class",
+        "scale",
+        "ignore",
+        "sample_interval",
+    )
+
+    def __init__(self, profile_name: str, key: str, spec: dict):
+        device_class = spec.get(SCHEMA_DEVICE_CLASS_KEY)
+        self.sensor_device_class = _enum_or_none(SensorDeviceClass, device_class)
+        self.binary_device_class = _enum_or_none(BinarySensorDeviceClass, device_class)
+        if device_class is not None and not (
+            self.sensor_device_class or self.binary_device_class
+        ):
+            _LOGGER.warning(
+                f"Unknown device class {device_class} for {key} of {profile_name}"
+            )
+
+        self.unit = spec.get(SCHEMA_UNIT_KEY)
+        state_class = spec.get(SCHEMA_STATE_CLASS_KEY)
+        self.state_class = _enum_or_none(SensorStateClass, state_class)
+        if state_class is not None and self.state_class is None:
+            _LOGGER.warning(
+                f"Unknown state class {state_class} for {key} of {profile_name}"
+            )
+
+        scale = spec.get(SCHEMA_SCALE_KEY)
+        self.scale = float(scale) if scale is not None and scale != 1 else None
+        self.ignore = bool(spec.get(SCHEMA_IGNORE_KEY, False))
+
+        sample_interval = spec.get(SCHEMA_SAMPLE_INTERVAL_KEY)
+        self.sample_interval = (
+            float(sample_interval) if sample_interval is not None else None
+        )
+
+    @property
+    def classified(self) -> bool:
+        """Whether the schema replaces the heuristics for this key."""
+        return bool(self.sensor_device_class or self.binary_device_class or self.unit)
+
+    @property
+    def binary(self) -> bool:
+        """Whether numeric values of this key are binary states."""
+        return self.binary_device_class is not None and (
+            self.sensor_device_class is None
+        )
+
+
+def _is_key_spec(spec: dict) -> bool:
+    """Tell the schema of a key from a nested object with more keys."""
+    return all(
+        field in SCHEMA_FIELDS and not isinstance(value, dict)
+        for field, value in spec.items()
+    )
+
+
+def compile_profile_schema(
+    profile_name: str, spec: dict, parent_key="", sep="_"
+) -> dict[str, KeySchema]:
+    """Compile the schema of one profile, flattening nested keys."""
+    table = {}
+    for k, v in spec.items():
+        key = f"{parent_key}{sep}{k}" if parent_key else k
+        if not isinstance(v, dict):
+            _LOGGER.warning(f"Invalid schema for {key} of {profile_name}: {v!r}")
+        elif v and _is_key_spec(v):
+            table[key] = KeySchema(profile_name, key, v)
+        else:
+            table.update(compile_profile_schema(profile_name, v, key, sep=sep))
+    return table
+
+
+def merge_schemas(*sources: dict) -> dict[str, dict]:
+    """Merge schemas per profile, later sources taking precedence per key."""
+    merged: dict[str, dict] = {}
+    for source in sources:
+        for profile_name, spec in (source or {}).items():
+            merged[profile_name] = {**merged.get(profile_name, {}), **spec}
+    return merged
+
+
+class SchemaTable:
+    """Compiled schemas of all device profiles, looked up by profile and key."""
+
+    def __init__(self, schemas: dict[str, dict]):
+        self._profiles: dict[str, dict[str, KeySchema]] = {
+            profile_name: compile_profile_schema(profile_name, spec)
+            for profile_name, spec in schemas.items()
+        }
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, profile_name: str, key: str) -> KeySchema | None:
+        """Return the schema of a key, or None to fall back to the heuristics."""
+        profile = self._profiles.get(profile_name)
+        key_schema = profile.get(key) if profile is not None else None
+        if key_schema is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return key_schema
+
+    def stats(self) -> dict[str, int]:
+        """Return table counters."""
+        return {
+            "profiles": len(self._profiles),
+            "keys": sum(len(profile) for profile in self._profiles.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -2,25 +2,47 @@
 
 import re
 import logging
+import time
 
-from homeassistant.components.sensor import SensorEntity, SensorDeviceClass
+from homeassistant.components.sensor import (
+    SensorEntity,
+    SensorDeviceClass,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, Platform, UnitOfTime
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.helpers.typing import StateType
 
+from .coalescer import StateWriteCoalescer
+from .device_metadata import DeviceMetadata
+from .downsampler import Downsampler, RateLimit
+from .filters import ChangeFilter
 from .const import (
+    ATTR_EVENT_TIME,
+    CHANGE_FILTER_KEY,
+    COALESCER_KEY,
+    DEVICES_KEY,
+    DEVICE_METADATA_KEY,
+    DIAGNOSTIC_SENSORS_KEY,
     DOMAIN,
+    DOWNSAMPLER_KEY,
+    METRICS_KEY,
+    STORE_KEY,
     PENDING_SENSORS_KEY,
     ADD_SENSOR_ENTITIES_FUNC_KEY,
-    CS_DEVICE_NAME_KEY,
-    CS_TENANT_NAME_KEY,
     CS_TENANT_NAME_DEFAULT,
-    CS_DEVICE_PROFILE_NAME_KEY,
-    CS_DEVICE_PROFILE_NAME_DEFAULT,
+    RECORD_DEVICE_CLASS_KEY,
+    RECORD_NAME_KEY,
+    RECORD_PLATFORM_KEY,
+    RECORD_STATE_CLASS_KEY,
+    RECORD_STATE_KEY,
+    RECORD_UNIT_KEY,
 )
+from .metrics import PERCENTILES, STAGE_TOTAL, PipelineMetrics
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -31,18 +53,75 @@ async def async_setup_entry(
     async_add_entities: AddConfigEntryEntitiesCallback,
 ):
     """Set up the sensor platform."""
+    start = time.perf_counter()
     entry_id = entry.entry_id
     _LOGGER.debug(f"Setting up ChirpStack sensor platform for entry {entry_id}")
+    hass_data: dict = hass.data[DOMAIN][entry_id]
 
     # Store the add_entities function
-    hass.data[DOMAIN][entry_id][ADD_SENSOR_ENTITIES_FUNC_KEY] = async_add_entities
+    hass_data[ADD_SENSOR_ENTITIES_FUNC_KEY] = async_add_entities
+
+    # Rebuild all known sensors and add them with any pending ones in one go
+    pending_sensors = hass_data.get(PENDING_SENSORS_KEY, [])
+    hass_data[PENDING_SENSORS_KEY] = []
+    restored_sensors = restore_sensors(hass_data)
+    if pending_sensors or restored_sensors:
+        async_add_entities([*pending_sensors, *restored_sensors])
+
+    # Optional diagnostic sensors with the webhook latency percentiles
+    if entry.options.get(DIAGNOSTIC_SENSORS_KEY, False):
+        async_add_entities(
+            ChirpstackLatencySensor(entry, hass_data[METRICS_KEY], percentile)
+            for percentile in PERCENTILES
+        )
+
+    _LOGGER.info(
+        f"Sensor platform ready in {(time.perf_counter() - start) * 1000:.1f} ms: "
+        f"{len(restored_sensors)} restored, {len(pending_sensors)} pending"
+    )
 
-    # Add any pending sensors
-    pending_sensors = hass.data[DOMAIN][entry_id].get(PENDING_SENSORS_KEY, [])
-    if pending_sensors:
-        _LOGGER.debug(f"Adding {len(pending_sensors)} pending sensors")
-        async_add_entities(pending_sensors)
-        hass.data[DOMAIN][entry_id][PENDING_SENSORS_KEY] = []
+
+def restore_sensors(hass_data: dict) -> list["ChirpstackSensor"]:
+    """Rebuild the sensors of all persisted devices with their last values."""
+    devices: dict = hass_data[DEVICES_KEY]
+    devices_metadata: dict[str, DeviceMetadata] = hass_data[DEVICE_METADATA_KEY]
+    restored: list[ChirpstackSensor] = []
+    for device_id, device_info, key, record in hass_data[STORE_KEY].iter_records(
+        Platform.SENSOR
+    ):
+        # An uplink may have created the entity before the platform was set up
+        if key in devices.get(device_id, {}):
+            continue
+
+        try:
+            device_class = SensorDeviceClass(record.get(RECORD_DEVICE_CLASS_KEY))
+        except ValueError:
+            device_class = None
+        try:
+            state_class = SensorStateClass(record.get(RECORD_STATE_CLASS_KEY))
+        except ValueError:
+            state_class = None
+
+        device = devices_metadata.get(device_id)
+        if device is None:
+            device = DeviceMetadata(device_id, device_info)
+            devices_metadata[device_id] = device
+
+        entity = ChirpstackSensor(
+            device,
+            f"{device_id}_{key}",
+            record.get(RECORD_NAME_KEY),
+            device_class,
+            record.get(RECORD_UNIT_KEY),
+            hass_data[COALESCER_KEY],
+            hass_data[CHANGE_FILTER_KEY],
+            hass_data.get(DOWNSAMPLER_KEY),
+            state_class,
+        )
+        entity.set_initial_state(record.get(RECORD_STATE_KEY))
+        devices.setdefault(device_id, {})[key] = entity
+        restored.append(entity)
+    return restored
 
 
 class ChirpstackSensor(SensorEntity, RestoreEntity):
@@ -50,57 +129,80 @@ class ChirpstackSensor(SensorEntity, RestoreEntity):
 
     def __init__(
         self,
-        device_id: str,
+        device: DeviceMetadata,
         unique_id: str,
         name: str,
         device_class: SensorDeviceClass,
-        device_info: dict[str, str],
         unit: str,
+        coalescer: StateWriteCoalescer | None = None,
+        change_filter: ChangeFilter | None = None,
+        downsampler: Downsampler | None = None,
+        state_class: SensorStateClass | None = None,
     ):
         """Initialize the sensor."""
-        self._device_id = device_id
+        self._device = device
+        self._coalescer = coalescer
+        self._change_filter = change_filter
+        self._downsampler = downsampler
+        self._rate_limit: RateLimit | None = None
+        if downsampler is not None:
+            self._rate_limit = downsampler.rate_limit_for(
+                device.device_id, device.profile
+            )
+        self._last_write: float | None = None
+        self._event_time: str | None = None
 
-        # common entity properties
+        # common entity properties, states are pushed by the webhook
+        self._attr_should_poll = False
         self._attr_unique_id = unique_id
         self._attr_name = name
         self._attr_device_class = device_class
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, device_id)},
-            name=device_info.get(CS_DEVICE_NAME_KEY, f"Device {device_id}"),
-            manufacturer=device_info.get(CS_TENANT_NAME_KEY, CS_TENANT_NAME_DEFAULT),
-            model=device_info.get(
-                CS_DEVICE_PROFILE_NAME_KEY, CS_DEVICE_PROFILE_NAME_DEFAULT
-            ),
-        )
 
-        # sensor entity property
+        # sensor entity properties
         self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = state_class
 
-        _LOGGER.debug(f"Created sensor: {name} with unit {unit}")
+        _LOGGER.debug("Created sensor: %s with unit %s", name, unit)
 
     # https://developers.home-assistant.io/docs/core/entity/#async_added_to_hass
     async def async_added_to_hass(self):
         """Handle entity which will be added."""
         await super().async_added_to_hass()
 
-    def set_initial_state(self, state: StateType):
+    def set_initial_state(self, state: StateType, event_time: str | None = None):
         """Set the state without triggering a state update"""
         _LOGGER.debug(
-            f"Setting initial state for {self.name}: {state} {self._attr_native_unit_of_measurement}"
+            "Setting initial state for %s: %s %s",
+            self._attr_name,
+            state,
+            self._attr_native_unit_of_measurement,
         )
 
         state = self.sanitize_state(state)
         self._attr_native_value = state  # sensor entity property
+        self.set_event_time(event_time)
+        self._last_write = time.monotonic()
 
-    def update_state(self, state: StateType):
-        """Update the sensor state."""
-        _LOGGER.debug(
-            f"Updating sensor '{self.name}' with state: {state} ({type(state).__name__})"
-        )
+    def update_state(self, state: StateType, event_time: str | None = None):
+        """Update the sensor state, event_time is set for replayed events."""
+        _LOGGER.debug("Updating sensor '%s' with state: %r", self._attr_name, state)
 
         state = self.sanitize_state(state)
+        if self._rate_limit is not None and self._downsampler.defer(
+            self, self._rate_limit, state, self._last_write, event_time
+        ):
+            return
+
+        self.apply_state(state, event_time)
+
+    def apply_state(self, state: StateType, event_time: str | None = None):
+        """Write a sanitized state unless the change filter skips it."""
+        if not self.should_write(state):
+            return
+
         self._attr_native_value = state  # sensor entity property
-        self.async_write_ha_state()
+        self.set_event_time(event_time)
+        self.write_state()
 
     def sanitize_state(self, state: StateType):
         """Sanitize the state based on its type."""
@@ -109,3 +211,105 @@ class ChirpstackSensor(SensorEntity, RestoreEntity):
             if re.match(r"^\d+(\.\d+)?$", state):
                 return float(state)
         return state
+
+    def should_write(self, state) -> bool:
+        """Check the change filter, skipping unchanged or insignificant states."""
+        if self._change_filter is None:
+            return True
+        if not self._change_filter.should_write(
+            self._attr_device_class, self._attr_native_value, self._last_write, state
+        ):
+            return False
+        # Force heartbeat writes of an unchanged state, so last_updated moves
+        self._attr_force_update = (
+            type(state) is type(self._attr_native_value)
+            and state == self._attr_native_value
+        )
+        self._last_write = time.monotonic()
+        return True
+
+    @property
+    def last_write(self) -> float | None:
+        """Return the monotonic time the state was last written."""
+        return self._last_write
+
+    @property
+    def device_id(self) -> str:
+        """Return the devEui of the device this entity belongs to."""
+        return self._device.device_id
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info, kept up to date by the device metadata."""
+        return self._device.device_info
+
+    def to_record(self) -> dict:
+        """Return the plain data needed to persist and rebuild this entity."""
+        return {
+            RECORD_PLATFORM_KEY: Platform.SENSOR,
+            RECORD_NAME_KEY: self._attr_name,
+            RECORD_DEVICE_CLASS_KEY: self._attr_device_class,
+            RECORD_UNIT_KEY: self._attr_native_unit_of_measurement,
+            RECORD_STATE_CLASS_KEY: self._attr_state_class,
+            RECORD_STATE_KEY: self._attr_native_value,
+        }
+
+    def set_event_time(self, event_time: str | None):
+        """Attach the time of the replayed event the state originates from."""
+        if event_time == self._event_time:
+            return
+        self._event_time = event_time
+        self._attr_extra_state_attributes = (
+            {ATTR_EVENT_TIME: event_time} if event_time is not None else {}
+        )
+
+    def rename_device(self, old_name: str, new_name: str):
+        """Follow a rename of the device, the name starts with the device's."""
+        if not self._attr_name.startswith(old_name):
+            return
+        self._attr_name = f"{new_name}{self._attr_name[len(old_name):]}"
+        self.write_state()
+
+    def set_available(self, available: bool):
+        """Mark the entity (un)available, e.g. when its device falls silent."""
+        self._attr_available = available
+        self.write_state()
+
+    def write_state(self):
+        """Write the state now or hand it to the write coalescer."""
+        if self._coalescer is not None:
+            self._coalescer.mark_dirty(self)
+        else:
+            self.async_write_ha_state()
+
+
+class ChirpstackLatencySensor(SensorEntity):
+    """Diagnostic sensor with a latency percentile of the webhook."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+
+    def __init__(self, entry: ConfigEntry, metrics: PipelineMetrics, percentile: int):
+        """Initialize the latency sensor."""
+        self._metrics = metrics
+        self._percentile = percentile
+
+        self._attr_unique_id = f"{entry.entry_id}_latency_p{percentile}"
+        self._attr_name = f"{entry.title} Latency P{percentile}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, entry.entry_id)},
+            name=entry.title,
+            manufacturer=CS_TENANT_NAME_DEFAULT,
+        )
+
+    async def async_update(self):
+        """Read the percentiles from the pipeline metrics."""
+        self._attr_native_value = self._metrics.stages[STAGE_TOTAL].percentile(
+            self._percentile
+        )
+        self._attr_extra_state_attributes = {
+            stage: histogram.percentile(self._percentile)
+            for stage, histogram in self._metrics.stages.items()
+        }
@@ -0,0 +1,166 @@
+"""Time series import of array-valued measurements.
+
+Some codecs pack several readings into one uplink, e.g. 10 temperature
+samples as `"temperature": [21.2, 21.3, ...]`. The entity state is set to
+the newest sample. The whole series is aggregated into hourly mean, min and
+max and written with one statistics import per series and uplink, instead
+of one state write per sample.
+
+The newest sample is taken to be measured at the uplink's time. The samples
+before it are spaced by the `sample_interval` of the key's schema. Without
+a schema, the time since the previous uplink is divided evenly among the
+samples. The statistics are external statistics (`chirpstack_http:<id>`),
+so they do not collide with the ones the recorder compiles from the states.
+"""
+
+from datetime import datetime, timedelta
+import logging
+
+from homeassistant.components.recorder.models import (
+    StatisticData,
+    StatisticMeanType,
+    StatisticMetaData,
+)
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import Entity
+from homeassistant.util import slugify
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Hours of aggregates kept per series, samples older than that restart the
+# aggregate of their hour
+SERIES_KEEP_HOURS = 3
+
+
+def is_sample_array(value) -> bool:
+    """Check if a payload value is a non-empty list of numbers."""
+    return (
+        isinstance(value, list)
+        and len(value) > 0
+        and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)
+    )
+
+
+class _HourBucket:
+    """Incremental aggregate of the samples of one hour."""
+
+    __slots__ = ("count", "sum", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+
+class _Series:
+    """Open hourly aggregates and last sample time of one statistic."""
+
+    __slots__ = ("hours", "last_end")
+
+    def __init__(self):
+        self.hours: dict[datetime, _HourBucket] = {}
+        self.last_end: datetime | None = None
+
+
+class SeriesImporter:
+    """Aggregate sample arrays into hourly statistics and import them."""
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        self._series: dict[str, _Series] = {}
+
+        # metrics
+        self.imports = 0
+        self.samples = 0
+
+    def add(
+        self,
+        entity: Entity,
+        samples: list[float],
+        end: datetime,
+        interval: float | None = None,
+    ):
+        """Import the samples of an uplink, the newest one measured at end."""
+        statistic_id = f"{DOMAIN}:{slugify(entity.unique_id)}"
+        series = self._series.get(statistic_id)
+        if series is None:
+            series = self._series[statistic_id] = _Series()
+
+        if interval is None and series.last_end is not None and end > series.last_end:
+            interval = (end - series.last_end).total_seconds() / len(samples)
+        series.last_end = end
+
+        touched: set[datetime] = set()
+        newest = len(samples) - 1
+        for index, value in enumerate(samples):
+            timestamp = end
+            if interval:
+                timestamp -= timedelta(seconds=interval * (newest - index))
+            hour = timestamp.replace(minute=0, second=0, microsecond=0)
+            bucket = series.hours.get(hour)
+            if bucket is None:
+                bucket = series.hours[hour] = _HourBucket()
+            bucket.add(value)
+            touched.add(hour)
+
+        # Forget hours that no longer receive samples
+        oldest = max(series.hours) - timedelta(hours=SERIES_KEEP_HOURS)
+        for hour in [hour for hour in series.hours if hour < oldest]:
+            del series.hours[hour]
+
+        statistics = [
+            StatisticData(
+                start=hour,
+                mean=bucket.sum / bucket.count,
+                min=bucket.min,
+                max=bucket.max,
+            )
+            for hour in sorted(touched)
+            if (bucket := series.hours.get(hour)) is not None
+        ]
+        metadata = StatisticMetaData(
+            mean_type=StatisticMeanType.ARITHMETIC,
+            has_sum=False,
+            name=entity.name,
+            source=DOMAIN,
+            statistic_id=statistic_id,
+            unit_class=None,
+            unit_of_measurement=entity.native_unit_of_measurement,
+        )
+        _LOGGER.debug(
+            "Importing %d samples of %s as %d hourly statistics",
+            len(samples),
+            statistic_id,
+            len(statistics),
+        )
+        async_add_external_statistics(self.hass, metadata, statistics)
+        self.imports += 1
+        self.samples += len(samples)
+
+    def forget(self, dev_eui: str):
+        """Drop the open aggregates of an evicted device."""
+        prefix = f"{DOMAIN}:{slugify(dev_eui)}_"
+        for statistic_id in [s for s in self._series if s.startswith(prefix)]:
+            del self._series[statistic_id]
+
+    def stats(self) -> dict[str, int]:
+        """Return import counters."""
+        return {
+            "series": len(self._series),
+            "imports": self.imports,
+            "samples": self.samples,
+        }